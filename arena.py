@@ -0,0 +1,353 @@
+"""
+This module runs many snakes on one shared board.
+
+`Arena` keeps every snake and food item in a single grid of cell owners, and
+every body as a linked list threaded through a second grid, so moving a
+snake, checking its head against every other snake and placing food are all
+O(1) per snake, however large the board and however many snakes there are.
+All the snakes move at once with a handful of NumPy operations, like
+`batch.BatchEngine`, so thousands of bots fit in one `move_interval`.
+
+Heads are checked against the board as it was before the move, except that
+a tail that moves away this step does not count, like in `Engine`. Two
+heads entering the same cell both die, and so do two heads that swap cells,
+whatever the length of the snakes, since they would pass through each other.
+"""
+
+import numpy as np
+
+from batch import DX, DY
+from engine import MoveResult
+
+# Cells of the board that are not a snake's index
+EMPTY = -1
+FOOD = -2
+
+# The outcome of a snake that is still going
+ALIVE = -1
+
+# Free cells are found by trying this many batches of random cells before
+# scanning the board
+SPAWN_TRIES = 4
+
+# Bots pick their target out of this many random food items
+TARGET_CHOICES = 4
+
+
+class Arena:
+    """
+    The rules of many snakes and food items on one grid.
+
+    Directions are codes into `engine.DIRECTIONS`. Snakes are numbered from
+    0, and `cells` holds the number of the snake covering each cell, or
+    `EMPTY` or `FOOD`. Every body cell but the head holds the next cell
+    towards the head in `links`.
+    """
+
+    __slots__ = (
+        "grid_width",
+        "grid_height",
+        "num_snakes",
+        "num_food",
+        "respawn",
+        "rng",
+        "cells",
+        "links",
+        "food_cells",
+        "food_slots",
+        "heads",
+        "tails",
+        "lengths",
+        "directions",
+        "scores",
+        "outcomes",
+        "targets",
+    )
+
+    def __init__(
+        self,
+        grid_width: int,
+        grid_height: int,
+        num_snakes: int,
+        num_food: int,
+        seed: int | None = None,
+        respawn: bool = True,
+    ) -> None:
+        """
+        Initializes an Arena object with every snake one cell long.
+
+        Args:
+            grid_width: The width of the grid.
+            grid_height: The height of the grid.
+            num_snakes: The number of snakes.
+            num_food: How many food items are on the board at once.
+            seed: The seed of the placement of snakes and food, random if
+                None.
+            respawn: Whether dead snakes start again right after the step
+                that killed them.
+
+        Raises:
+            ValueError: If the snakes and food do not fit on the grid.
+        """
+        area = grid_width * grid_height
+        if num_snakes + num_food > area:
+            raise ValueError(
+                f"{num_snakes} snakes and {num_food} food do not fit on a"
+                f" {grid_width}x{grid_height} grid"
+            )
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.num_snakes = num_snakes
+        self.num_food = num_food
+        self.respawn = respawn
+        self.rng = np.random.default_rng(seed)
+        self.cells = np.full(area, EMPTY, np.int32)
+        self.links = np.zeros(area, np.intp)
+        # Where each food item is, and the slot of the food on each cell
+        self.food_cells = np.zeros(num_food, np.intp)
+        self.food_slots = np.zeros(area, np.intp)
+        self.heads = np.zeros(num_snakes, np.intp)
+        self.tails = np.zeros(num_snakes, np.intp)
+        self.lengths = np.zeros(num_snakes, np.int32)
+        self.directions = np.zeros(num_snakes, np.int8)
+        self.scores = np.zeros(num_snakes, np.int32)
+        # A MoveResult value, or ALIVE while the snake is going
+        self.outcomes = np.full(num_snakes, ALIVE, np.int8)
+        # The food slot each bot is heading for
+        self.targets = np.zeros(num_snakes, np.intp)
+
+        slots = np.arange(num_food)
+        self._place_food(slots, self._free_cells(num_food))
+        self._spawn(np.arange(num_snakes))
+
+    @property
+    def alive(self) -> np.ndarray:
+        """A mask of the snakes that are still going."""
+        return self.outcomes == ALIVE
+
+    def _free_cells(self, count: int) -> np.ndarray:
+        """
+        Picks distinct random empty cells.
+
+        Random cells are tried a few times, which almost always succeeds
+        unless the board is nearly full, and the rest are then drawn from a
+        scan of the board.
+
+        Args:
+            count: How many cells to pick.
+
+        Returns:
+            The cell indices, fewer than count if the board is too full.
+        """
+        cells = self.cells
+        found = np.zeros(0, np.intp)
+        for _ in range(SPAWN_TRIES):
+            missing = count - found.size
+            if missing == 0:
+                return found
+            tries = self.rng.integers(cells.size, size=2 * missing)
+            tries = tries[cells[tries] == EMPTY]
+            # Keep the first of any repeated cell, in random order
+            _, first = np.unique(tries, return_index=True)
+            tries = tries[np.sort(first)]
+            tries = tries[~np.isin(tries, found)]
+            found = np.concatenate((found, tries[:missing]))
+
+        free = np.flatnonzero(cells == EMPTY)
+        free = free[~np.isin(free, found)]
+        missing = min(count - found.size, free.size)
+        return np.concatenate((found, self.rng.choice(free, missing, replace=False)))
+
+    def _place_food(self, slots: np.ndarray, cells: np.ndarray) -> None:
+        """Puts food items on cells, dropping the slots that got no cell."""
+        slots = slots[: cells.size]
+        self.cells[cells] = FOOD
+        self.food_cells[slots] = cells
+        self.food_slots[cells] = slots
+
+    def _spawn(self, snakes: np.ndarray) -> None:
+        """Starts snakes again, one cell long, on random empty cells."""
+        cells = self._free_cells(snakes.size)
+        # A board too full to spawn on leaves the rest dead
+        snakes = snakes[: cells.size]
+        self.cells[cells] = snakes
+        self.heads[snakes] = cells
+        self.tails[snakes] = cells
+        self.lengths[snakes] = 1
+        self.directions[snakes] = self.rng.integers(4, size=snakes.size)
+        self.scores[snakes] = 0
+        self.outcomes[snakes] = ALIVE
+        self._pick_targets(snakes)
+
+    def _pick_targets(self, snakes: np.ndarray) -> None:
+        """Points bots at the nearest of a few random food items."""
+        if self.num_food == 0 or snakes.size == 0:
+            return
+        width = self.grid_width
+        choices = self.rng.integers(self.num_food, size=(TARGET_CHOICES, snakes.size))
+        food = self.food_cells[choices]
+        heads = self.heads[snakes]
+        distances = np.abs(food % width - heads % width) + np.abs(
+            food // width - heads // width
+        )
+        nearest = distances.argmin(axis=0)
+        self.targets[snakes] = choices[nearest, np.arange(snakes.size)]
+
+    def steer(self, bots: np.ndarray) -> np.ndarray:
+        """
+        Picks a move for each bot.
+
+        A bot goes straight or turns, whichever reaches a free cell and gets
+        closest to its target food, and grabs any food right next to it.
+
+        Args:
+            bots: The indices of the snakes to steer.
+
+        Returns:
+            A direction code for each bot.
+        """
+        width, height = self.grid_width, self.grid_height
+        directions = self.directions[bots].astype(np.intp)
+        # Straight, right and left of each bot
+        candidates = np.stack((directions, (directions + 1) & 3, (directions + 3) & 3))
+        heads = self.heads[bots]
+        x = heads % width + DX.take(candidates)
+        y = heads // width + DY.take(candidates)
+        inside = (x.view(np.uintp) < width) & (y.view(np.uintp) < height)
+        owners = self.cells.take(np.where(inside, y * width + x, 0))
+        free = inside & (owners < 0)
+
+        target = self.food_cells.take(self.targets[bots]) if self.num_food else heads
+        cost = np.abs(x - target % width) + np.abs(y - target // width)
+        cost -= (owners == FOOD) * (width + height)
+        cost += ~free * (4 * (width + height))
+        best = cost.argmin(axis=0)
+        return candidates[best, np.arange(bots.size)]
+
+    def step(self, actions: np.ndarray | None = None) -> np.ndarray:
+        """
+        Moves every live snake one step forward.
+
+        Args:
+            actions: A direction code per snake, or -1 to keep going
+                straight. None keeps every snake going straight.
+
+        Returns:
+            The MoveResult value of each snake's move. Dead snakes that were
+            not respawned repeat their outcome.
+        """
+        width, height = self.grid_width, self.grid_height
+        cells = self.cells
+        results = self.outcomes.copy()
+        moving = np.flatnonzero(results == ALIVE)
+
+        directions = self.directions[moving]
+        if actions is not None:
+            wanted = np.asarray(actions)[moving]
+            turn = (wanted >= 0) & ((wanted & 1) != (directions & 1))
+            directions = np.where(turn, wanted, directions).astype(np.int8)
+            self.directions[moving] = directions
+
+        heads = self.heads[moving]
+        x = heads % width + DX.take(directions)
+        y = heads // width + DY.take(directions)
+        inside = (x.view(np.uintp) < width) & (y.view(np.uintp) < height)
+        next_heads = np.where(inside, y * width + x, 0)
+        owners = cells.take(next_heads)
+
+        # Heads that meet in the same cell
+        entering = np.sort(next_heads[inside])
+        repeated = entering[1:][entering[1:] == entering[:-1]]
+        clash = inside & np.isin(next_heads, repeated)
+
+        # The cell each snake is moving into, or -1 if it is not moving
+        bodies = np.maximum(owners, 0)
+        targets = np.full(self.num_snakes, -1, np.intp)
+        targets[moving] = np.where(inside, next_heads, -1)
+        # Heads that swap cells, which a snake one cell long would otherwise
+        # pass through as a tail moving away
+        swap = (
+            inside
+            & (owners >= 0)
+            & (next_heads == self.heads.take(bodies))
+            & (targets.take(bodies) == heads)
+        )
+
+        ate = inside & ~clash & ~swap & (owners == FOOD)
+        eating = np.zeros(self.num_snakes, bool)
+        eating[moving[ate]] = True
+        # The tail moves away this step if its snake moves and does not eat,
+        # so it does not count, unless that snake moves into this head
+        owner_targets = targets.take(bodies)
+        into_tail = (
+            (next_heads == self.tails.take(bodies))
+            & ~eating.take(bodies)
+            & (owner_targets >= 0)
+            & (owner_targets != heads)
+        )
+        hit_tail = inside & ((owners >= 0) & ~into_tail | clash | swap)
+        hit_border = ~inside
+        moved = ~hit_tail & ~hit_border
+
+        # Link the new heads before freeing the tails, so a snake one cell
+        # long gets its new head as its tail
+        movers = moving[moved]
+        new_heads = next_heads[moved]
+        self.links[heads[moved]] = new_heads
+        shrinking = movers[~ate[moved]]
+        old_tails = self.tails[shrinking]
+        cells[old_tails] = EMPTY
+        self.tails[shrinking] = self.links[old_tails]
+        cells[new_heads] = movers
+        self.heads[movers] = new_heads
+
+        eaters = moving[ate]
+        self.lengths[eaters] += 1
+        self.scores[eaters] += 1
+        np.copyto(results, MoveResult.OK.value, where=results == ALIVE)
+        results[eaters] = MoveResult.ATE_FOOD.value
+        results[moving[hit_tail]] = MoveResult.HIT_TAIL.value
+        results[moving[hit_border]] = MoveResult.HIT_BORDER.value
+
+        dead = moving[hit_tail | hit_border]
+        self.outcomes[dead] = results[dead]
+        for snake in dead:
+            self._clear_body(snake)
+        # Bodies are cleared first so the food can land where they were
+        eaten = next_heads[ate]
+        if eaten.size:
+            self._place_food(self.food_slots[eaten], self._free_cells(eaten.size))
+        if self.respawn and dead.size:
+            self._spawn(dead)
+        self._pick_targets(eaters)
+        return results
+
+    def body(self, snake: int) -> list[int]:
+        """
+        Gets the cells of a snake by walking its body.
+
+        Args:
+            snake: The index of the snake.
+
+        Returns:
+            The cell indices from tail to head, empty if the snake is dead.
+        """
+        if self.outcomes[snake] != ALIVE:
+            return []
+        links = self.links
+        cells = [int(self.tails[snake])]
+        for _ in range(self.lengths[snake] - 1):
+            cells.append(int(links[cells[-1]]))
+        return cells
+
+    def _clear_body(self, snake: int) -> None:
+        """Removes a dead snake's cells from the board."""
+        cells = self.cells
+        links = self.links
+        cell = self.tails[snake]
+        for _ in range(self.lengths[snake]):
+            # The tail may already belong to a head that moved in this step
+            if cells[cell] == snake:
+                cells[cell] = EMPTY
+            cell = links[cell]
+
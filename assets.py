@@ -0,0 +1,90 @@
+"""
+This module caches fonts and rendered text for the whole process.
+
+Play sessions come and go, but the fonts they load and most of the text they
+draw are the same every time, so each font is loaded once and each piece of
+text is rasterized once until it falls out of a small LRU cache.
+"""
+
+from collections import OrderedDict
+
+import pygame
+from pygame import Color, Surface
+from pygame.font import Font
+
+# How many rendered text surfaces are kept
+TEXT_CACHE_SIZE = 256
+
+
+class AssetCache:
+    """
+    Fonts keyed by (path, size) and text surfaces keyed by (text, color, path,
+    size).
+
+    The surfaces are shared between callers, so they must not be drawn on.
+    """
+
+    __slots__ = ("fonts", "texts", "max_texts")
+
+    def __init__(self, max_texts: int) -> None:
+        """
+        Initializes an empty AssetCache object.
+
+        Args:
+            max_texts: How many text surfaces to keep.
+        """
+        self.fonts: dict[tuple[str | None, int], Font] = {}
+        self.texts: OrderedDict[tuple, Surface] = OrderedDict()
+        self.max_texts = max_texts
+
+    def font(self, path: str | None, size: int) -> Font:
+        """
+        Gets a font, loading it on first use.
+
+        Args:
+            path: The font file, or None for the default font.
+            size: The size of the font.
+
+        Returns:
+            The font.
+        """
+        key = (path, size)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self.fonts[key] = Font(path, size)
+        return font
+
+    def text(self, text: str, color: Color, path: str | None, size: int) -> Surface:
+        """
+        Gets antialiased text on a transparent background, rendering it on
+        first use.
+
+        Args:
+            text: The text to render.
+            color: The color of the text.
+            path: The font file, or None for the default font.
+            size: The size of the font.
+
+        Returns:
+            The rendered text.
+        """
+        key = (text, tuple(Color(color)), path, size)
+        texts = self.texts
+        surface = texts.get(key)
+        if surface is not None:
+            texts.move_to_end(key)
+            return surface
+        surface = texts[key] = self.font(path, size).render(text, True, color)
+        if len(texts) > self.max_texts:
+            texts.popitem(last=False)
+        return surface
+
+    def clear(self) -> None:
+        """Forgets every font and text surface."""
+        self.fonts.clear()
+        self.texts.clear()
+
+
+ASSETS = AssetCache(TEXT_CACHE_SIZE)
@@ -0,0 +1,524 @@
+"""
+This module contains a bot that plays snake on its own.
+
+`Autopilot` plans a short path to the food with A* and only takes it if the
+snake could still reach its own tail after eating, and otherwise follows
+its tail until the food is safe. Once the snake covers `CYCLE_FILL` of the
+board it follows a Hamiltonian cycle instead, which cannot fail once the
+whole body lies along it. On a grid with both sides odd no cycle covers
+every cell, so the cycle leaves out a corner and the snake turns into it
+when the food is there.
+
+Planning is the expensive part, so a path is kept and followed move by
+move, and only planned again when the food moves or the next cell of the
+path is blocked. Obstacles are time-aware: every body cell is stamped with
+the move the head entered it, so whether the tail has left a cell by the
+time the head gets there is one comparison, and the body is never copied.
+"""
+
+from array import array
+from functools import lru_cache
+from heapq import heappop, heappush
+
+from engine import DIRECTIONS, Direction, Engine, Position
+
+# The share of the board the snake covers before it switches to the cycle
+CYCLE_FILL = 0.5
+
+# A flood that reaches this many free cells around the head counts as safe
+SAFETY_CELLS = 1024
+
+# A* gives up after this many cells and heads for the nearest one to the
+# food it found, so a long detour on a large board is planned over several
+# moves instead of stalling a frame
+SEARCH_CELLS = 1024
+
+
+@lru_cache(maxsize=4)
+def grid_neighbors(grid_width: int, grid_height: int) -> tuple[tuple[int, ...], ...]:
+    """
+    Lists the neighbors of every cell, in the order of `DIRECTIONS`.
+
+    Args:
+        grid_width: The width of the grid.
+        grid_height: The height of the grid.
+
+    Returns:
+        The indices of the cells next to each cell index.
+    """
+    neighbors = []
+    for y in range(grid_height):
+        for x in range(grid_width):
+            neighbors.append(
+                tuple(
+                    (y + dy) * grid_width + x + dx
+                    for dx, dy in DIRECTIONS
+                    if 0 <= x + dx < grid_width and 0 <= y + dy < grid_height
+                )
+            )
+    return tuple(neighbors)
+
+
+@lru_cache(maxsize=4)
+def hamiltonian_cycle(grid_width: int, grid_height: int) -> bytes | None:
+    """
+    Builds a Hamiltonian cycle over the grid.
+
+    With an even width, the cycle goes down column 0, up and down the other
+    columns between rows 1 and grid_height - 1, and back along row 0. With
+    only an even height it is the same cycle transposed.
+
+    A grid with both sides odd has an odd number of cells, which no cycle
+    can cover. Its cycle covers every cell but the bottom left corner: it
+    is the cycle of the grid without the last row, which runs left along
+    that row, with each pair of cells from (1, h - 2) on bent down through
+    the last row. The corner is only visited to eat, by `Autopilot`, and
+    leads up to (0, h - 2).
+
+    Args:
+        grid_width: The width of the grid.
+        grid_height: The height of the grid.
+
+    Returns:
+        The direction code to take from every cell index, or None if the
+        grid has a side shorter than 2.
+    """
+    if grid_width < 2 or grid_height < 2:
+        return None
+    right, down, left, up = range(4)
+    if grid_width % 2 and grid_height % 2:
+        codes = bytearray(hamiltonian_cycle(grid_width, grid_height - 1))
+        codes.extend(bytes(grid_width))
+        row = (grid_height - 2) * grid_width
+        for x in range(1, grid_width - 1, 2):
+            # Right to left along the row: down, left, and back up
+            codes[row + x + 1] = down
+            codes[row + grid_width + x + 1] = left
+            codes[row + grid_width + x] = up
+        codes[row + grid_width] = up
+        return bytes(codes)
+    if grid_width % 2:
+        transposed = hamiltonian_cycle(grid_height, grid_width)
+        # Right and down swap, and so do left and up
+        swap = (1, 0, 3, 2)
+        return bytes(
+            swap[transposed[x * grid_height + y]]
+            for y in range(grid_height)
+            for x in range(grid_width)
+        )
+
+    codes = bytearray(grid_width * grid_height)
+    for y in range(grid_height):
+        for x in range(grid_width):
+            if y == 0:
+                code = left if x > 0 else down
+            elif x == 0:
+                code = down if y < grid_height - 1 else right
+            elif x % 2 == 1:
+                code = up if y > 1 or x == grid_width - 1 else right
+            else:
+                code = down if y < grid_height - 1 else right
+            codes[y * grid_width + x] = code
+    return bytes(codes)
+
+
+def cycle_directions(grid_width: int, grid_height: int) -> dict[Position, Direction]:
+    """
+    Gets the Hamiltonian cycle of `hamiltonian_cycle` by position.
+
+    Args:
+        grid_width: The width of the grid.
+        grid_height: The height of the grid.
+
+    Returns:
+        The direction to take from every cell.
+
+    Raises:
+        ValueError: If the grid has no cycle.
+    """
+    codes = hamiltonian_cycle(grid_width, grid_height)
+    if codes is None:
+        raise ValueError(f"A {grid_width}x{grid_height} grid has no cycle")
+    return {
+        (i % grid_width, i // grid_width): DIRECTIONS[code]
+        for i, code in enumerate(codes)
+    }
+
+
+class Autopilot:
+    """
+    Steers an `Engine` towards the food without trapping itself.
+
+    It is a `Snake` controller, and `choose` can be used on its own as a
+    tournament policy. One Autopilot can steer game after game on the same
+    grid, since it notices when the engine is reset.
+    """
+
+    __slots__ = (
+        "grid_width",
+        "grid_height",
+        "neighbors",
+        "cycle",
+        "spare",
+        "codes",
+        "stamps",
+        "seen",
+        "parents",
+        "search",
+        "path",
+        "path_food",
+        "aligned",
+        "fed",
+        "engine",
+        "seed",
+        "moves",
+    )
+
+    def __init__(self, grid_width: int, grid_height: int) -> None:
+        """
+        Initializes an Autopilot object.
+
+        Args:
+            grid_width: The width of the grid.
+            grid_height: The height of the grid.
+        """
+        capacity = grid_width * grid_height
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.neighbors = grid_neighbors(grid_width, grid_height)
+        self.cycle = hamiltonian_cycle(grid_width, grid_height)
+        # The corner the cycle leaves out on a grid with both sides odd
+        self.spare = None
+        if grid_width % 2 and grid_height % 2:
+            self.spare = (grid_height - 1) * grid_width
+        # The direction of a move from the difference of the cell indices
+        self.codes = {1: 0, grid_width: 1, -1: 2, -grid_width: 3}
+        # The move at which the head entered each body cell
+        self.stamps = array("q", bytes(capacity * 8))
+        # The cells a search has reached are marked with its number, so the
+        # marks never have to be cleared
+        self.seen = array("l", bytes(capacity * array("l").itemsize))
+        self.parents = array("i", bytes(capacity * 4))
+        self.search = 0
+        # The cells still to visit, the next one last
+        self.path: list[int] = []
+        # The food the path was planned for
+        self.path_food: int | None = None
+        # How many moves in a row followed the cycle
+        self.aligned = 0
+        # The move the snake last grew on
+        self.fed = 0
+        self.engine: Engine | None = None
+        self.seed = 0
+        self.moves = 0
+
+    def __call__(self, engine: Engine) -> None:
+        """
+        Pushes the next direction to the engine.
+
+        Args:
+            engine: The engine to steer.
+        """
+        direction = self.choose(engine)
+        if direction is not None and direction != engine.direction:
+            engine.push_direction(direction)
+
+    def choose(self, engine: Engine) -> Direction | None:
+        """
+        Picks the direction of the next move.
+
+        Args:
+            engine: The engine to steer.
+
+        Returns:
+            The direction, or None if every move loses.
+        """
+        if not engine.alive:
+            return None
+        self._sync(engine)
+        body = engine.body
+        hx, hy = engine.head
+        head = hy * self.grid_width + hx
+        # The engine drops a move straight back, so searches never take it
+        behind = head - engine.direction[1] * self.grid_width - engine.direction[0]
+        food = None
+        if engine.food is not None:
+            food = engine.food[1] * self.grid_width + engine.food[0]
+
+        # The cycle is taken on full boards, and to break out of chasing the
+        # tail around while the food never gets safe
+        capacity = len(self.seen)
+        if self.cycle is not None and (
+            len(body) >= CYCLE_FILL * capacity or engine.moves - self.fed > capacity
+        ):
+            direction = DIRECTIONS[self.cycle[head]]
+            cell = (hy + direction[1]) * self.grid_width + hx + direction[0]
+            if food is not None and food == self.spare and head == food + 1:
+                # Food in the corner left out of the cycle is eaten from the
+                # cell next to it on the last row. Leaving it upwards gets
+                # two cells along the cycle in two moves, as the cycle does,
+                # so the body stays along the cycle
+                direction = DIRECTIONS[self.codes[food - head]]
+                cell = food
+            # Once the whole body lies along the cycle, following it is safe.
+            # Until then it is only taken when the tail stays reachable, or
+            # as a gamble when that has kept it off the cycle for too long.
+            if self.aligned >= len(body) or (
+                self._free_at(engine, cell, 1)
+                and (
+                    engine.moves - self.fed > 2 * capacity
+                    or self._safe_after(engine, head, [cell], cell == food)
+                )
+            ):
+                self.aligned += 1
+                self.path.clear()
+                return direction
+        self.aligned = 0
+
+        path = self.path
+        if not path or self.path_food != food or not self._free_at(engine, path[-1], 1):
+            path = None
+            if food is not None:
+                path = self._plan_food(engine, head, behind, food)
+                if path is not None and not self._safe_after(
+                    engine, head, path, path[0] == food
+                ):
+                    path = None
+            if path is None:
+                path = self._plan_escape(engine, head, behind, food)
+            self.path = path
+            self.path_food = food
+        if not path:
+            return None
+        return DIRECTIONS[self.codes[path.pop() - head]]
+
+    def _sync(self, engine: Engine) -> None:
+        """Stamps the new head, or every body cell after a reset."""
+        moves = engine.moves
+        if engine is self.engine and engine.seed == self.seed:
+            if moves == self.moves:
+                return
+            if moves == self.moves + 1:
+                x, y = engine.head
+                self.stamps[y * self.grid_width + x] = moves
+                if engine.vacated is None:
+                    self.fed = moves
+                self.moves = moves
+                return
+        self.engine = engine
+        self.seed = engine.seed
+        self.moves = moves
+        self.fed = moves
+        self.aligned = 0
+        self.path = []
+        first = moves - len(engine.body) + 1
+        for i, (x, y) in enumerate(engine.body):
+            self.stamps[y * self.grid_width + x] = first + i
+
+    def _free_at(self, engine: Engine, cell: int, steps: int) -> bool:
+        """Checks if a cell can be entered `steps` moves from now."""
+        if not engine.body.occupied[cell]:
+            return True
+        return self.stamps[cell] + len(engine.body) <= engine.moves + steps
+
+    def _trace(self, start: int, end: int) -> list[int]:
+        """Follows the parents of the last search back from end to start."""
+        path = []
+        parents = self.parents
+        while end != start:
+            path.append(end)
+            end = parents[end]
+        return path
+
+    def _plan_food(
+        self, engine: Engine, head: int, behind: int, food: int
+    ) -> list[int] | None:
+        """
+        Finds a path to the food with A*.
+
+        A body cell is only entered once the tail has left it, and the cell
+        behind the head is never entered. After `SEARCH_CELLS` cells the
+        path only goes as far as the cell found nearest to the food.
+
+        Returns:
+            The cells of the path, the last one first, or None if there is
+            none.
+        """
+        width = self.grid_width
+        fx, fy = food % width, food // width
+        occupied = engine.body.occupied
+        stamps = self.stamps
+        neighbors = self.neighbors
+        seen = self.seen
+        parents = self.parents
+        # A cell stamped s is free from move s + length on
+        freed = len(engine.body) - engine.moves
+        self.search += 1
+        search = self.search
+        seen[head] = search
+        first = tuple(n for n in neighbors[head] if n != behind)
+        heap = [(0, 0, head)]
+        nearest = (abs(head % width - fx) + abs(head // width - fy), head)
+        budget = SEARCH_CELLS
+        while heap and budget:
+            _, depth, cell = heappop(heap)
+            if cell == food:
+                return self._trace(head, food)
+            budget -= 1
+            steps = 1 - depth
+            for n in first if cell == head else neighbors[cell]:
+                if seen[n] == search:
+                    continue
+                if occupied[n] and stamps[n] + freed > steps:
+                    continue
+                seen[n] = search
+                parents[n] = cell
+                distance = abs(n % width - fx) + abs(n // width - fy)
+                if distance < nearest[0]:
+                    nearest = (distance, n)
+                # Ties go to the deepest cell, which heads straight for the food
+                heappush(heap, (steps + distance, -steps, n))
+        if not heap or nearest[1] == head:
+            return None
+        return self._trace(head, nearest[1])
+
+    def _flood(
+        self,
+        engine: Engine,
+        start: int,
+        behind: int,
+        path: dict[int, int],
+        moves: int,
+        length: int,
+        latest: bool = False,
+        avoid: int | None = None,
+    ) -> tuple[int | None, int]:
+        """
+        Searches breadth first for the tail from a future state of the game.
+
+        The future state is the current body, `path` more cells walked by the
+        head, `moves` moves played and `length` cells long. A body cell counts
+        as the tail if the head can enter it just as the tail leaves it.
+
+        Args:
+            engine: The engine to search.
+            start: The cell of the head.
+            behind: The cell the head came from, which is never entered.
+            path: The move each cell of the walked path was entered at.
+            moves: The number of moves played.
+            length: The length of the snake.
+            latest: Whether to keep searching for the body cell nearest the
+                head instead of stopping at the first one.
+            avoid: A free cell that is never entered.
+
+        Returns:
+            The tail cell the head can reach, or None, and the number of free
+            cells reached, which stops growing at `SAFETY_CELLS`.
+        """
+        occupied = engine.body.occupied
+        stamps = self.stamps
+        neighbors = self.neighbors
+        seen = self.seen
+        parents = self.parents
+        self.search += 1
+        search = self.search
+        seen[start] = search
+        if avoid is not None:
+            seen[avoid] = search
+        first = tuple(n for n in neighbors[start] if n != behind)
+        frontier = [start]
+        count = 0
+        steps = 0
+        # The stamp, cell and parent of the best tail cell so far
+        best = (-1, start, start)
+        while frontier and count < SAFETY_CELLS:
+            steps += 1
+            reached = []
+            for cell in frontier:
+                for n in first if cell == start else neighbors[cell]:
+                    if seen[n] == search:
+                        continue
+                    stamp = path.get(n)
+                    if stamp is None and occupied[n]:
+                        stamp = stamps[n]
+                    if stamp is not None and stamp + length > moves:
+                        if stamp + length <= moves + steps:
+                            if not latest:
+                                parents[n] = cell
+                                return n, count
+                            best = max(best, (stamp, n, cell))
+                        continue
+                    seen[n] = search
+                    parents[n] = cell
+                    reached.append(n)
+                    count += 1
+            frontier = reached
+        if best[0] >= 0:
+            _, n, parents[n] = best
+            return n, count
+        return None, count
+
+    def _safe_after(
+        self, engine: Engine, head: int, path: list[int], grows: bool
+    ) -> bool:
+        """
+        Checks if the tail can still be reached after walking a path.
+
+        Args:
+            engine: The engine to check.
+            head: The cell of the head.
+            path: The cells of the path, the last one first.
+            grows: Whether the snake eats at the end of the path.
+
+        Returns:
+            True if the tail can be reached.
+        """
+        moves = engine.moves + len(path)
+        walked = {cell: moves - i for i, cell in enumerate(path)}
+        behind = path[1] if len(path) > 1 else head
+        length = len(engine.body) + grows
+        end, count = self._flood(engine, path[0], behind, walked, moves, length)
+        return end is not None or count >= SAFETY_CELLS
+
+    def _plan_escape(
+        self, engine: Engine, head: int, behind: int, food: int | None
+    ) -> list[int]:
+        """
+        Finds a path along which the tail is followed as closely behind as
+        possible, or failing that the move with the most room, hugging the
+        walls to waste as little of it as possible.
+
+        Chasing the part of the body nearest the head keeps the snake from
+        circling around its tail forever. The food is avoided if possible,
+        since the snake growing on the way would make the tail late.
+
+        Returns:
+            The cells of the path, the last one first, empty if every
+            neighbor is blocked.
+        """
+        moves = engine.moves
+        length = len(engine.body)
+        end, _ = self._flood(engine, head, behind, {}, moves, length, True, food)
+        if end is None and food is not None:
+            # Through the food, as if the snake had already grown
+            end, _ = self._flood(engine, head, behind, {}, moves, length + 1, True)
+        if end is not None:
+            return self._trace(head, end)
+
+        # Trapped for now, or at least not near the tail, so buy time for the
+        # body to open up
+        best = []
+        most = (-1, 0)
+        for n in self.neighbors[head]:
+            if n == behind or not self._free_at(engine, n, 1):
+                continue
+            grown = length + (n == food)
+            end, count = self._flood(engine, n, head, {n: moves + 1}, moves + 1, grown)
+            if end is not None:
+                return [n]
+            walls = sum(not self._free_at(engine, m, 2) for m in self.neighbors[n])
+            walls += 4 - len(self.neighbors[n])
+            if (count, walls) > most:
+                best = [n]
+                most = (count, walls)
+        return best
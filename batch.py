@@ -0,0 +1,249 @@
+"""
+This module steps many independent snake games at once.
+
+`BatchEngine` keeps the state of every game in NumPy arrays and applies one
+move to all of them with a handful of vectorized operations, for training
+and tuning bots. The rules are those of `Engine.step`. Only the food is
+placed with a NumPy generator, so a batch game does not play out like an
+`Engine` with the same seed.
+"""
+
+import numpy as np
+
+from engine import DIRECTIONS, START_DIRECTION, MoveResult
+
+# The outcome of a game that is still going
+ALIVE = -1
+
+# The dx and dy of each direction code
+DX = np.array([dx for dx, _ in DIRECTIONS], np.intp)
+DY = np.array([dy for _, dy in DIRECTIONS], np.intp)
+
+# Food placement tries this many random cells before scanning the board
+FOOD_TRIES = 4
+
+
+class BatchEngine:
+    """
+    The rules of `num_games` snake games on grids of the same size.
+
+    Bodies are ring buffers of `y * grid_width + x` cell indices, one row per
+    game, with an occupancy grid per game next to them. Directions are codes
+    into `engine.DIRECTIONS`.
+    """
+
+    __slots__ = (
+        "num_games",
+        "grid_width",
+        "grid_height",
+        "auto_reset",
+        "rng",
+        "rings",
+        "starts",
+        "lengths",
+        "occupied",
+        "bases",
+        "head_x",
+        "head_y",
+        "food",
+        "directions",
+        "scores",
+        "moves",
+        "outcomes",
+    )
+
+    def __init__(
+        self,
+        num_games: int,
+        grid_width: int,
+        grid_height: int,
+        seed: int | None = None,
+        auto_reset: bool = True,
+    ) -> None:
+        """
+        Initializes a BatchEngine object.
+
+        Args:
+            num_games: The number of games.
+            grid_width: The width of the grids.
+            grid_height: The height of the grids.
+            seed: The seed of the food placement, random if None.
+            auto_reset: Whether games that end are started again right after
+                the step that ended them.
+        """
+        capacity = grid_width * grid_height
+        self.num_games = num_games
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+        self.rings = np.zeros((num_games, capacity), np.int32)
+        # Indices are kept as intp, so they need no conversion to index
+        self.starts = np.zeros(num_games, np.intp)
+        self.lengths = np.zeros(num_games, np.intp)
+        self.occupied = np.zeros((num_games, capacity), np.uint8)
+        # Where each game's row starts in the flattened rings and grids
+        self.bases = np.arange(num_games, dtype=np.intp) * capacity
+        self.head_x = np.zeros(num_games, np.intp)
+        self.head_y = np.zeros(num_games, np.intp)
+        # -1 once the board is full
+        self.food = np.zeros(num_games, np.intp)
+        self.directions = np.zeros(num_games, np.int8)
+        self.scores = np.zeros(num_games, np.int32)
+        self.moves = np.zeros(num_games, np.int32)
+        # A MoveResult value, or ALIVE while the game is going
+        self.outcomes = np.zeros(num_games, np.int8)
+        self.reset()
+
+    @property
+    def alive(self) -> np.ndarray:
+        """A mask of the games that are still going."""
+        return self.outcomes == ALIVE
+
+    def reset(self, games: np.ndarray | None = None) -> None:
+        """
+        Resets games to their initial state.
+
+        Args:
+            games: A mask or the indices of the games to reset, all if None.
+        """
+        if games is None:
+            games = np.arange(self.num_games)
+        elif games.dtype == bool:
+            games = np.flatnonzero(games)
+        if games.size == 0:
+            return
+
+        x, y = self.grid_width // 2, self.grid_height // 2
+        head = y * self.grid_width + x
+        self.occupied[games] = 0
+        self.occupied[games, head] = 1
+        self.rings[games, 0] = head
+        self.starts[games] = 0
+        self.lengths[games] = 1
+        self.head_x[games] = x
+        self.head_y[games] = y
+        self.directions[games] = DIRECTIONS.index(START_DIRECTION)
+        self.scores[games] = 0
+        self.moves[games] = 0
+        self.outcomes[games] = ALIVE
+        self.food[games] = self._place_food(games)
+
+    def _place_food(self, games: np.ndarray) -> np.ndarray:
+        """
+        Picks a uniformly random free cell in each of the given games.
+
+        Random cells are tried a few times, which almost always succeeds
+        unless the board is nearly full, and the games still without food
+        then pick a random rank among their free cells.
+
+        Args:
+            games: The indices of the games.
+
+        Returns:
+            The cell index for each game, -1 if its board is full.
+        """
+        capacity = self.grid_width * self.grid_height
+        cells = np.full(games.size, -1, np.intp)
+        pending = np.flatnonzero(self.lengths[games] < capacity)
+        for _ in range(FOOD_TRIES):
+            if pending.size == 0:
+                return cells
+            tries = self.rng.integers(capacity, size=pending.size)
+            free = self.occupied[games[pending], tries] == 0
+            cells[pending[free]] = tries[free]
+            pending = pending[~free]
+
+        if pending.size:
+            rows = games[pending]
+            ranks = self.rng.integers(capacity - self.lengths[rows])
+            free_before = np.cumsum(self.occupied[rows] == 0, axis=1)
+            cells[pending] = (free_before <= ranks[:, None]).sum(axis=1)
+        return cells
+
+    def step(self, actions: np.ndarray | None = None) -> np.ndarray:
+        """
+        Moves every snake one step forward.
+
+        A direction colinear with the current one is ignored, like in
+        `Engine`. Finished games that were not reset change nothing and
+        repeat their outcome.
+
+        Args:
+            actions: A direction code per game, or -1 to keep going straight.
+                None keeps every snake going straight.
+
+        Returns:
+            The MoveResult value of each game's move.
+        """
+        width, height = self.grid_width, self.grid_height
+        capacity = width * height
+        bases = self.bases
+        # Flat views, so each lookup below is a single gather
+        rings = self.rings.reshape(-1)
+        occupied = self.occupied.reshape(-1)
+
+        # Every game is stepped, and the finished ones are masked out, which
+        # is faster than gathering the live ones
+        active = self.outcomes == ALIVE
+        self.moves += active
+
+        directions = self.directions
+        if actions is not None:
+            actions = np.asarray(actions)
+            turn = active & (actions >= 0) & ((actions & 1) != (directions & 1))
+            np.copyto(directions, actions, where=turn, casting="unsafe")
+
+        # take() is faster than fancy indexing for plain gathers
+        x = self.head_x + DX.take(directions)
+        y = self.head_y + DY.take(directions)
+        # Negative coordinates wrap around to huge unsigned ones
+        inside = (x.view(np.uintp) < width) & (y.view(np.uintp) < height)
+        next_heads = np.where(inside, y * width + x, 0)
+
+        ate = active & inside & (next_heads == self.food)
+        tails = rings.take(bases + self.starts)
+        # The tail moves away this step, so it does not count
+        hit_tail = (
+            active
+            & inside
+            & ~ate
+            & (occupied.take(bases + next_heads) != 0)
+            & (next_heads != tails)
+        )
+        hit_border = active & ~inside
+        moved = active & inside & ~ate & ~hit_tail
+
+        # Free the tails first, since a head may move into its own tail
+        occupied[(bases + tails)[moved]] = 0
+        grown = np.flatnonzero(moved | ate)
+        cells = next_heads[grown]
+        ends = (self.starts[grown] + self.lengths[grown]) % capacity
+        rings[bases[grown] + ends] = cells.astype(rings.dtype)
+        occupied[bases[grown] + cells] = 1
+        np.copyto(self.head_x, x, where=moved | ate)
+        np.copyto(self.head_y, y, where=moved | ate)
+        self.starts += moved
+        self.starts[self.starts == capacity] = 0
+
+        self.lengths += ate
+        self.scores += ate
+        eaten = np.flatnonzero(ate)
+        food = self._place_food(eaten)
+        self.food[eaten] = food
+
+        results = self.outcomes.copy()
+        np.copyto(results, MoveResult.OK.value, where=active)
+        np.copyto(results, MoveResult.ATE_FOOD.value, where=ate)
+        np.copyto(results, MoveResult.HIT_TAIL.value, where=hit_tail)
+        np.copyto(results, MoveResult.HIT_BORDER.value, where=hit_border)
+        won = eaten[food < 0]
+        results[won] = MoveResult.WON.value
+
+        ended = np.flatnonzero(hit_tail | hit_border)
+        if won.size:
+            ended = np.concatenate((ended, won))
+        self.outcomes[ended] = results[ended]
+        if self.auto_reset:
+            self.reset(ended)
+        return results
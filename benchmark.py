@@ -0,0 +1,425 @@
+"""
+This module benchmarks the simulation and rendering hot paths.
+
+It runs headless under the SDL dummy video driver across a matrix of grid
+sizes and cell sizes and writes the results as JSON, so runs on different
+commits can be compared.
+
+Usage:
+    python benchmark.py [-o results.json] [--quick] [--only NAME]
+                        [--compare baseline.json] [--threshold 1.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import cycle
+from collections.abc import Callable
+from datetime import datetime
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+import high_scores
+from arena import Arena
+from autopilot import Autopilot, cycle_directions
+from batch import BatchEngine
+from engine import Direction, Engine
+from snake import CELL_MAX_PROGRESS, SPRITES, Snake
+
+GRID_SIZES = (20, 60, 200)
+CELL_SIZES = (8, 16, 30)
+BODY_LENGTHS = (1, 100, 1000, 10000)
+BATCH_SIZES = (1, 64, 1024, 8192)
+FILL_RATIOS = (0.0, 0.5, 0.9, 0.99)
+RENDERERS = ("sprites", "grid")
+# Bots on a 1000x1000 arena, with as much food as bots
+ARENA_SIZES = (500, 5000)
+
+# The largest screen boards are drawn on, larger boards are seen through the
+# camera
+VIEW_SIZE = (1280, 720)
+
+
+def snake_on_cycle(
+    snake: Snake | Engine, length: int, directions: dict[tuple[int, int], Direction]
+) -> None:
+    """
+    Lays out a snake of the given length along a cycle, with no food.
+
+    Args:
+        snake: The snake or engine to lay out.
+        length: The number of cells.
+        directions: The cycle from `autopilot.cycle_directions`.
+    """
+    engine = snake.engine if isinstance(snake, Snake) else snake
+    engine.body.clear()
+    position = (0, 0)
+    for _ in range(length):
+        engine.body.push_head(position)
+        dx, dy = directions[position]
+        position = (position[0] + dx, position[1] + dy)
+    engine.direction = directions[engine.head]
+    engine.vacated = None
+    # Without food the snake keeps its length
+    engine.food = None
+    if isinstance(snake, Snake):
+        snake.food = None
+        snake.pulses.reset(0)
+        for birth in range(1, length):
+            snake.pulses.grow(birth)
+
+
+def measure(func: Callable[[], None], min_time: float) -> dict[str, float]:
+    """
+    Times a function.
+
+    The function is called in batches until `min_time` seconds have passed,
+    at least five times.
+
+    Args:
+        func: The function to time.
+        min_time: The least total time to spend.
+
+    Returns:
+        The number of calls and the min, median and mean microseconds each.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 20 or number >= 1 << 20:
+            break
+        number *= 4
+
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < 5 or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "calls": number * len(samples),
+        "min_us": min(samples),
+        "median_us": statistics.median(samples),
+        "mean_us": statistics.fmean(samples),
+    }
+
+
+def bench_move(min_time: float) -> list[dict]:
+    """Benchmarks Snake.move at several body lengths."""
+    screen = pygame.Surface((1, 1))
+    results = []
+    for size in GRID_SIZES:
+        directions = cycle_directions(size, size)
+        for length in BODY_LENGTHS:
+            if length >= size * size:
+                continue
+            snake = Snake(size, size, screen, 1)
+            snake_on_cycle(snake, length, directions)
+            engine = snake.engine
+
+            def move() -> None:
+                engine.push_direction(directions[engine.head])
+                snake.move()
+                # Drop the input log so it does not grow across calls
+                engine.events.clear()
+
+            params = {"grid": size, "length": length}
+            results.append({"name": "snake.move", "params": params})
+            results[-1].update(measure(move, min_time))
+    return results
+
+
+def bench_food(min_time: float) -> list[dict]:
+    """Benchmarks food placement at increasing board fill ratios."""
+    results = []
+    for size in GRID_SIZES:
+        directions = cycle_directions(size, size)
+        for ratio in FILL_RATIOS:
+            engine = Engine(size, size, seed=0)
+            snake_on_cycle(engine, max(1, int(size * size * ratio)), directions)
+            params = {"grid": size, "fill": ratio}
+            results.append({"name": "food.place", "params": params})
+            results[-1].update(measure(engine._place_food, min_time))
+    return results
+
+
+def bench_snapshot(min_time: float) -> list[dict]:
+    """Benchmarks Engine.snapshot, restore and clone at several body lengths."""
+    results = []
+    for size in GRID_SIZES:
+        directions = cycle_directions(size, size)
+        for length in BODY_LENGTHS:
+            if length >= size * size:
+                continue
+            engine = Engine(size, size, seed=0)
+            snake_on_cycle(engine, length, directions)
+            snapshot = engine.snapshot()
+
+            def restore() -> None:
+                engine.restore(snapshot)
+
+            params = {"grid": size, "length": length}
+            results.append({"name": "engine.snapshot", "params": params})
+            results[-1].update(measure(engine.snapshot, min_time))
+            results[-1]["bytes"] = len(snapshot)
+            for name, func in (
+                ("engine.restore", restore),
+                ("engine.clone", engine.clone),
+            ):
+                results.append({"name": name, "params": params})
+                results[-1].update(measure(func, min_time))
+    return results
+
+
+def bench_draw(min_time: float) -> list[dict]:
+    """Benchmarks Snake.draw per frame and the drawing of a single cell."""
+    results = []
+    for size in GRID_SIZES:
+        directions = cycle_directions(size, size)
+        for cell_size in CELL_SIZES:
+            board = size * cell_size
+            screen = pygame.Surface(
+                (min(board, VIEW_SIZE[0]), min(board, VIEW_SIZE[1]))
+            )
+            for renderer in RENDERERS:
+                for length in BODY_LENGTHS:
+                    if length >= size * size:
+                        continue
+                    snake = Snake(size, size, screen, cell_size, renderer)
+                    snake_on_cycle(snake, length, directions)
+                    snake.progress = 0.5
+                    params = {
+                        "grid": size,
+                        "cell_size": cell_size,
+                        "renderer": renderer,
+                        "length": length,
+                    }
+                    results.append({"name": "snake.draw", "params": params})
+                    results[-1].update(measure(snake.draw, min_time))
+
+            def draw_cell() -> None:
+                sprite = SPRITES.get("body", 10 / CELL_MAX_PROGRESS * 2, cell_size)
+                screen.blit(sprite, (cell_size // 2, cell_size))
+
+            params = {"grid": size, "cell_size": cell_size}
+            results.append({"name": "cell.draw", "params": params})
+            results[-1].update(measure(draw_cell, min_time))
+    return results
+
+
+def bench_batch(min_time: float) -> list[dict]:
+    """Benchmarks BatchEngine.step with random moves, on a 20x20 grid."""
+    results = []
+    for games in BATCH_SIZES:
+        engine = BatchEngine(games, 20, 20, seed=0)
+        rows = np.random.default_rng(0).integers(-1, 4, (64, games), np.int8)
+        actions = cycle(rows)
+
+        def step() -> None:
+            engine.step(next(actions))
+
+        params = {"games": games}
+        results.append({"name": "batch.step", "params": params})
+        results[-1].update(measure(step, min_time))
+        # Comparable to the inverse of snake.move
+        results[-1]["game_steps_per_s"] = games / results[-1]["median_us"] * 1e6
+    return results
+
+
+def bench_autopilot(min_time: float) -> list[dict]:
+    """Benchmarks Autopilot planning each move of a game from the start."""
+    results = []
+    for size in GRID_SIZES:
+        engine = Engine(size, size, seed=0)
+        autopilot = Autopilot(size, size)
+
+        def move() -> None:
+            if not engine.alive:
+                engine.reset()
+            autopilot(engine)
+            engine.step()
+            engine.events.clear()
+
+        params = {"grid": size}
+        results.append({"name": "autopilot.move", "params": params})
+        results[-1].update(measure(move, min_time))
+    return results
+
+
+def bench_arena(min_time: float) -> list[dict]:
+    """Benchmarks steering and stepping every bot of a 1000x1000 arena."""
+    results = []
+    for bots in ARENA_SIZES:
+        arena = Arena(1000, 1000, bots, bots, seed=0)
+        snakes = np.arange(bots)
+
+        def step() -> None:
+            arena.step(arena.steer(snakes))
+
+        params = {"bots": bots}
+        results.append({"name": "arena.step", "params": params})
+        results[-1].update(measure(step, min_time))
+    return results
+
+
+def bench_scores(min_time: float) -> list[dict]:
+    """Benchmarks high_scores.add_score on each backend."""
+    results = []
+    scores_file = high_scores.SCORES_FILE
+    with tempfile.TemporaryDirectory() as directory:
+        high_scores.SCORES_FILE = os.path.join(directory, "high_scores.json")
+        stores = {
+            "json": high_scores.ScoreStore(),
+            "sqlite": high_scores.SqliteScoreStore(
+                os.path.join(directory, "high_scores.db")
+            ),
+        }
+        for backend, store in stores.items():
+            high_scores._store = store
+            score = iter(range(1 << 62))
+
+            def add() -> None:
+                high_scores.add_score(next(score) % 500, "bench", 20, 20, 123)
+
+            def add_and_flush() -> None:
+                add()
+                store.flush()
+
+            params = {"backend": backend}
+            results.append({"name": "high_scores.add_score", "params": params})
+            results[-1].update(measure(add, min_time))
+            # What the background writer pays to save one score
+            results.append({"name": "high_scores.flush", "params": params})
+            results[-1].update(measure(add_and_flush, min_time))
+            store.flush()
+        high_scores._store = None
+        high_scores.SCORES_FILE = scores_file
+        stores["sqlite"].db.close()
+    return results
+
+
+BENCHMARKS = {
+    "move": bench_move,
+    "food": bench_food,
+    "snapshot": bench_snapshot,
+    "draw": bench_draw,
+    "batch": bench_batch,
+    "autopilot": bench_autopilot,
+    "arena": bench_arena,
+    "scores": bench_scores,
+}
+
+
+def environment() -> dict[str, str]:
+    """Describes the machine and commit the benchmarks ran on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "sdl": ".".join(map(str, pygame.get_sdl_version())),
+        "platform": platform.platform(),
+        "video_driver": os.environ["SDL_VIDEODRIVER"],
+    }
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float) -> bool:
+    """
+    Prints how the results changed since a baseline run.
+
+    Args:
+        results: The new results.
+        baseline_path: The JSON file of the baseline run.
+        threshold: The slowdown ratio that counts as a regression.
+
+    Returns:
+        True if nothing regressed.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def key(result: dict) -> str:
+        return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+    before = {key(r): r for r in baseline["results"]}
+    ok = True
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        ratio = result["median_us"] / old["median_us"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{ratio:6.2f}x  {key(result)}{flag}")
+    return ok
+
+
+def main() -> None:
+    """Runs the benchmarks given on the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark the snake hot paths.")
+    parser.add_argument("-o", "--output", help="write the results to this file")
+    parser.add_argument(
+        "--quick", action="store_true", help="spend less time on each case"
+    )
+    parser.add_argument(
+        "--only", choices=BENCHMARKS, action="append", help="only run these"
+    )
+    parser.add_argument("--compare", help="a previous results file to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="slowdown ratio that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    pygame.init()
+    # Sprites are converted to the display format, which needs a display
+    pygame.display.set_mode((1, 1))
+    min_time = 0.05 if args.quick else 0.5
+
+    results = []
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr)
+        results += BENCHMARKS[name](min_time)
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+This module contains the camera that shows part of a board larger than the
+screen.
+"""
+
+from pygame import Rect
+
+# The followed cell is kept this fraction of the view away from its edges
+DEAD_ZONE = 0.25
+
+
+class Camera:
+    """
+    Which part of the board is on screen, as the pixel offset of the view.
+
+    A cell at (x, y) is drawn at `(x * cell_size - camera.x, y * cell_size -
+    camera.y)`. The camera only moves when the cell it follows leaves a dead
+    zone in the middle of the view, and then by whole cells, so most frames
+    the view stays put and renderers can keep what they drew. Along an axis
+    where the board fits on the screen, the board is centered instead.
+    """
+
+    __slots__ = (
+        "grid_width",
+        "grid_height",
+        "cell_size",
+        "view_width",
+        "view_height",
+        "x",
+        "y",
+    )
+
+    def __init__(
+        self,
+        grid_width: int,
+        grid_height: int,
+        cell_size: int,
+        view_size: tuple[int, int],
+    ) -> None:
+        """
+        Initializes a Camera object looking at the middle of the board.
+
+        Args:
+            grid_width: The width of the grid.
+            grid_height: The height of the grid.
+            cell_size: The size of the cells in pixels.
+            view_size: The size of the screen in pixels.
+        """
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.cell_size = cell_size
+        self.view_width, self.view_height = view_size
+        self.center(grid_width // 2, grid_height // 2)
+
+    def center(self, x: int, y: int) -> None:
+        """
+        Moves the view so a cell is as close to its middle as the board allows.
+
+        Args:
+            x: The column of the cell.
+            y: The row of the cell.
+        """
+        cell_size = self.cell_size
+        self.x = self._clamp(
+            x * cell_size + (cell_size - self.view_width) // 2,
+            self.grid_width,
+            self.view_width,
+        )
+        self.y = self._clamp(
+            y * cell_size + (cell_size - self.view_height) // 2,
+            self.grid_height,
+            self.view_height,
+        )
+
+    def follow(self, x: int, y: int) -> bool:
+        """
+        Moves the view just enough to keep a cell inside the dead zone.
+
+        Args:
+            x: The column of the cell.
+            y: The row of the cell.
+
+        Returns:
+            Whether the view moved.
+        """
+        new_x = self._follow_axis(self.x, x, self.grid_width, self.view_width)
+        new_y = self._follow_axis(self.y, y, self.grid_height, self.view_height)
+        if new_x == self.x and new_y == self.y:
+            return False
+        self.x = new_x
+        self.y = new_y
+        return True
+
+    def _follow_axis(self, offset: int, cell: int, cells: int, view: int) -> int:
+        """Gets the offset along one axis that keeps a cell in the dead zone."""
+        cell_size = self.cell_size
+        margin = int(view * DEAD_ZONE)
+        # The view has to start at or before lowest, and end at or after
+        # the cell plus the margin
+        lowest = cell * cell_size - margin
+        highest = (cell + 1) * cell_size + margin - view
+        if offset > lowest:
+            offset = lowest // cell_size * cell_size
+        elif offset < highest:
+            offset = -(-highest // cell_size) * cell_size
+        return self._clamp(offset, cells, view)
+
+    def _clamp(self, offset: int, cells: int, view: int) -> int:
+        """Keeps the view on the board, or centers a board smaller than it."""
+        board = cells * self.cell_size
+        if board <= view:
+            return (board - view) // 2
+        return min(max(offset, 0), board - view)
+
+    def visible(self, margin: int = 0) -> tuple[int, int, int, int]:
+        """
+        Gets the cells that intersect the view.
+
+        Args:
+            margin: How many more cells to include on every side, for cells
+                that slide in from outside the view.
+
+        Returns:
+            The first column, first row, and one past the last column and
+            row, clipped to the board.
+        """
+        cell_size = self.cell_size
+        # One past the last cell the view reaches into
+        end_x = -(-(self.x + self.view_width) // cell_size)
+        end_y = -(-(self.y + self.view_height) // cell_size)
+        return (
+            max(self.x // cell_size - margin, 0),
+            max(self.y // cell_size - margin, 0),
+            min(end_x + margin, self.grid_width),
+            min(end_y + margin, self.grid_height),
+        )
+
+    def window(self, columns: int, rows: int) -> tuple[int, int]:
+        """
+        Gets where a fixed-size block of cells covering the view starts.
+
+        Args:
+            columns: The width of the block, from `span`.
+            rows: The height of the block, from `span`.
+
+        Returns:
+            The column and row of the top left cell of the block.
+        """
+        cell_size = self.cell_size
+        return (
+            min(max(self.x // cell_size, 0), self.grid_width - columns),
+            min(max(self.y // cell_size, 0), self.grid_height - rows),
+        )
+
+    def span(self) -> tuple[int, int]:
+        """
+        Gets the size of a block of cells that covers the view wherever it is.
+
+        Renderers can allocate their buffers once at this size and place
+        them with `window`.
+
+        Returns:
+            The number of columns and rows, at most the size of the board.
+        """
+        cell_size = self.cell_size
+        return (
+            min(-(-self.view_width // cell_size) + 1, self.grid_width),
+            min(-(-self.view_height // cell_size) + 1, self.grid_height),
+        )
+
+    def board_rect(self) -> Rect:
+        """Gets the area of the screen covered by the board."""
+        cell_size = self.cell_size
+        return Rect(
+            -self.x,
+            -self.y,
+            self.grid_width * cell_size,
+            self.grid_height * cell_size,
+        )
@@ -0,0 +1,379 @@
+"""
+This module connects to the multiplayer server, to play or to load test it.
+
+`RoomClient` keeps a `protocol.RoomState` copy of a room up to date from
+the server's ticks. `play` draws it with the same sprites as a local game,
+one `RemoteSnake` per snake in the room. `simulate` starts a server and many
+headless clients in one process over loopback, and checks at the end that
+every client's copy matches the server.
+
+Usage:
+    python client.py [--host HOST] [--port PORT] [--room NAME]
+    python client.py --simulate CLIENTS [--seconds S] [--grid W H] [--snakes N]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+
+from engine import DIRECTIONS, MoveResult, Position
+from protocol import (
+    DEATHS,
+    RoomState,
+    encode_join,
+    encode_turn,
+    frame,
+    read_message,
+)
+from server import DEFAULT_PORT, Server, add_room_arguments, format_report
+
+if TYPE_CHECKING:
+    from pygame import Surface
+
+    from camera import Camera
+
+
+class RoomClient:
+    """A connection to a room and the client's copy of it."""
+
+    __slots__ = ("reader", "writer", "room", "state", "received", "tick_time")
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        room: str,
+        state: RoomState,
+    ) -> None:
+        """
+        Initializes a RoomClient object, use `connect` instead.
+
+        Args:
+            reader: The stream from the server.
+            writer: The stream to the server.
+            room: The name of the room.
+            state: The room as the server sent it on joining.
+        """
+        self.reader = reader
+        self.room = room
+        self.writer = writer
+        self.state = state
+        # The bytes of the ticks so far
+        self.received = 0
+        # When the last tick arrived, by time.perf_counter
+        self.tick_time = time.perf_counter()
+
+    @classmethod
+    async def connect(cls, host: str, port: int, room: str) -> "RoomClient":
+        """
+        Joins a room.
+
+        Args:
+            host: The address of the server.
+            port: The port of the server.
+            room: The name of the room.
+
+        Returns:
+            A new RoomClient object.
+
+        Raises:
+            ValueError: If the server refused to let the client in.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(frame(encode_join(room)))
+        welcome = await read_message(reader)
+        return cls(reader, writer, room, RoomState(welcome))
+
+    def turn(self, code: int) -> None:
+        """Sends a direction code for the player's snake."""
+        self.writer.write(frame(encode_turn(code)))
+
+    async def receive(self) -> None:
+        """
+        Applies the server's ticks until it disconnects.
+
+        Raises:
+            ValueError: If a tick does not follow the last one.
+        """
+        try:
+            while True:
+                message = await read_message(self.reader)
+                self.received += len(message)
+                self.state.apply(message)
+                self.tick_time = time.perf_counter()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def close(self) -> None:
+        """Leaves the room."""
+        self.writer.close()
+
+
+class RemoteSnake:
+    """
+    A snake of a `RoomState`, drawn with the same sprites as a local `Snake`.
+
+    It draws straight from the state's deque of cells and keeps only the
+    pulse offset of each of them, so unlike a `Snake` it has no `Engine` and
+    takes memory for the length of the snake rather than the area of the
+    board.
+    """
+
+    __slots__ = ("cells", "width", "pulses", "vacated")
+
+    def __init__(self, cells: deque[int], width: int, clock: float) -> None:
+        """
+        Initializes a RemoteSnake object.
+
+        Args:
+            cells: The snake's cells in the `RoomState`, kept up to date by it.
+            width: The width of the grid.
+            clock: The current clock, when every cell is born.
+        """
+        self.cells = cells
+        self.width = width
+        # The clock each cell was born at, tail first like `PulseRing`
+        self.pulses: deque[float] = deque()
+        # The cell the tail left on the last tick, which it slides out of
+        self.vacated: Position | None = None
+        self.sync(clock)
+
+    def sync(self, clock: float) -> None:
+        """
+        Adds or drops pulses at the tail to match the state's cells.
+
+        Args:
+            clock: The current clock, when any new cell is born.
+        """
+        pulses = self.pulses
+        while len(pulses) > len(self.cells):
+            pulses.popleft()
+        while len(pulses) < len(self.cells):
+            pulses.appendleft(clock)
+
+    def draw(
+        self,
+        screen: "Surface",
+        camera: "Camera",
+        cell_size: int,
+        clock: float,
+        progress: float,
+    ) -> None:
+        """
+        Draws the cells near the camera's view, sliding them like `Snake.draw`.
+
+        Args:
+            screen: The pygame surface to draw on.
+            camera: The camera of the player.
+            cell_size: The size of the cells in pixels.
+            clock: The current clock, which drives every cell's pulse.
+            progress: How far the last tick's move has been shown, 0 to 1.
+        """
+        from snake import CELL_MAX_PROGRESS, SPRITES
+
+        cells = self.cells
+        if not cells:
+            return
+        width = self.width
+        x0, y0, x1, y1 = camera.visible(1)
+        ox, oy = camera.x, camera.y
+        head = len(cells) - 1
+        last = self.vacated or (cells[0] % width, cells[0] // width)
+        blits = []
+        for i, (cell, born) in enumerate(zip(cells, self.pulses)):
+            px, py = last
+            y, x = divmod(cell, width)
+            last = (x, y)
+            if not (x0 <= x < x1 and y0 <= y < y1):
+                continue
+            percent = (clock - born) % CELL_MAX_PROGRESS / CELL_MAX_PROGRESS * 2
+            sprite = SPRITES.get("head" if i == head else "body", percent, cell_size)
+            dest = (
+                ((x - px) * progress + px) * cell_size - ox,
+                ((y - py) * progress + py) * cell_size - oy,
+            )
+            blits.append((sprite, dest))
+        screen.blits(blits, doreturn=False)
+
+
+async def play(host: str, port: int, room: str) -> None:
+    """
+    Plays in a room with a window and the keyboard.
+
+    Args:
+        host: The address of the server.
+        port: The port of the server.
+        room: The name of the room.
+    """
+    import pygame
+
+    from camera import Camera
+    from colors import OUTSIDE_COLOR, SCREEN_BACKGROUND_COLOR
+    from config import SETTINGS
+    from game import KEY_DIRECTIONS
+    from snake import Food
+
+    client = await RoomClient.connect(host, port, room)
+    state = client.state
+    receiver = asyncio.create_task(client.receive())
+
+    pygame.init()
+    pygame.display.set_caption(f"Snake - {room}")
+    screen = pygame.display.set_mode((1200, 900))
+    cell_size = SETTINGS.game.cell_size
+    fps = SETTINGS.game.fps
+
+    width = state.grid_width
+    camera = Camera(width, state.grid_height, cell_size, screen.get_size())
+    # Total progress so far, which drives every cell's pulse
+    clock = 0.0
+    snakes = [RemoteSnake(cells, width, clock) for cells in state.bodies]
+    player = state.bodies[state.snake]
+    if player:
+        camera.center(player[-1] % width, player[-1] // width)
+    food = [Food() for _ in state.food]
+
+    tick = state.tick
+    running = True
+    while running and not receiver.done():
+        frame_start = time.perf_counter()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (
+                event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
+            ):
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                direction = KEY_DIRECTIONS.get(event.key)
+                if direction is not None:
+                    client.turn(DIRECTIONS.index(direction))
+
+        if state.tick != tick:
+            # Only the last tick's results are known after a slow frame, so
+            # the cells of any ticks missed are born now
+            tick = state.tick
+            for snake, result, vacated in zip(snakes, state.results, state.vacated):
+                snake.vacated = vacated
+                if result in DEATHS:
+                    snake.pulses.clear()
+                elif result == MoveResult.ATE_FOOD.value:
+                    # The new cell is added at the tail, which stays in place
+                    snake.pulses.appendleft(clock)
+                snake.sync(clock)
+
+        # Slide between ticks the way a local game slides between moves
+        elapsed = (time.perf_counter() - client.tick_time) * 1000
+        progress = min(elapsed / state.move_interval, 1.0)
+        progress_step = 1000 / fps / state.move_interval
+        clock += progress_step
+        if player:
+            camera.follow(player[-1] % width, player[-1] // width)
+        board = camera.board_rect()
+        if not board.contains(screen.get_rect()):
+            screen.fill(OUTSIDE_COLOR)
+        screen.fill(SCREEN_BACKGROUND_COLOR, board)
+        origin = (camera.x, camera.y)
+        for item, cell in zip(food, state.food):
+            item.y, item.x = divmod(cell, width)
+            item.tick(progress_step)
+            item.draw(progress, screen, cell_size, origin)
+        for snake in snakes:
+            snake.draw(screen, camera, cell_size, clock, progress)
+        pygame.display.flip()
+
+        await asyncio.sleep(max(1 / fps - (time.perf_counter() - frame_start), 0))
+
+    client.close()
+    receiver.cancel()
+    pygame.quit()
+
+
+async def simulate(args: argparse.Namespace) -> None:
+    """
+    Load tests a server with many headless clients over loopback.
+
+    The clients fill rooms of `--snakes` players and push random
+    directions. At the end the server stops ticking, the clients catch up,
+    and every client's copy of its room is compared with the server.
+    """
+    server = Server(
+        args.grid[0], args.grid[1], args.snakes, args.food, args.move_interval
+    )
+    await server.start("127.0.0.1", 0)
+    clients = [
+        await RoomClient.connect("127.0.0.1", server.port, f"room{i // args.snakes}")
+        for i in range(args.simulate)
+    ]
+    receivers = [asyncio.create_task(client.receive()) for client in clients]
+    rng = random.Random(0)
+
+    async def push_directions() -> None:
+        while True:
+            await asyncio.sleep(server.move_interval / 1000)
+            for client in clients:
+                if rng.random() < 0.2:
+                    client.turn(rng.randrange(len(DIRECTIONS)))
+
+    pusher = asyncio.create_task(push_directions())
+    start = time.perf_counter()
+    ticks = server.ticks
+    await asyncio.sleep(args.seconds)
+    rate = (server.ticks - ticks) / (time.perf_counter() - start)
+    pusher.cancel()
+    server.stop_ticking()
+    # Let every client apply the ticks still on the way
+    await asyncio.sleep(1)
+    print(format_report(server, rate), file=sys.stderr)
+
+    mismatches = 0
+    for client in clients:
+        state = client.state
+        room = server.rooms[client.room]
+        arena = room.arena
+        same = state.tick == room.tick and list(state.food) == arena.food_cells.tolist()
+        for snake, cells in enumerate(state.bodies):
+            same = same and list(cells) == arena.body(snake)
+        mismatches += not same
+    longest = max(len(body) for c in clients for body in c.state.bodies)
+    received = sum(client.received for client in clients)
+    print(
+        f"{len(clients)} clients received {received / 1024:.0f} KiB,"
+        f" longest snake {longest},"
+        f" {mismatches} copies differ from the server",
+        file=sys.stderr,
+    )
+    for client in clients:
+        client.close()
+    for receiver in receivers:
+        receiver.cancel()
+    await server.stop()
+
+
+def main() -> None:
+    """Plays, or load tests a server, as given on the command line."""
+    parser = argparse.ArgumentParser(description="Join a multiplayer room.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--room", default="lobby")
+    parser.add_argument(
+        "--simulate",
+        type=int,
+        metavar="CLIENTS",
+        help="load test an in-process server with this many clients instead",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=10.0, help="how long to load test"
+    )
+    add_room_arguments(parser)
+    args = parser.parse_args()
+    if args.simulate:
+        asyncio.run(simulate(args))
+    else:
+        asyncio.run(play(args.host, args.port, args.room))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,4 +5,7 @@ This module defines the colors used in the game.
 from pygame import Color
 
 SCREEN_BACKGROUND_COLOR: Color = Color(64, 64, 64)
+# Around a board smaller than the screen
+OUTSIDE_COLOR: Color = Color(40, 40, 40)
 SCORE_TEXT_COLOR: Color = Color(255, 255, 255)
+BOT_COLOR: Color = Color(70, 130, 180)
@@ -2,6 +2,16 @@
 This package handles the configuration of the application.
 """
 
-from .config import CONF
+from typing import Any
 
-__all__ = ["CONF"]
+from . import config
+from .config import SETTINGS, STATE, Settings, compile_settings
+
+__all__ = ["CONF", "SETTINGS", "STATE", "Settings", "compile_settings"]
+
+
+def __getattr__(name: str) -> Any:
+    """Loads `CONF` the first time it is accessed."""
+    if name == "CONF":
+        return config.CONF
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
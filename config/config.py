@@ -1,22 +1,360 @@
-"""This module handles the configuration of the application."""
+"""
+This module handles the configuration of the application.
 
-from omegaconf import OmegaConf, DictConfig
+The YAML files are merged once at import time, `default.yaml` first and then
+`user.yaml` if it exists. The result is validated and compiled into frozen
+settings objects with plain attributes, since DictConfig lookups are slow
+enough to show up in the game loop. State that changes while the game runs,
+like the best score, lives in `STATE` instead.
+
+Importing OmegaConf takes longer than the rest of startup put together, so
+the merged config is also cached as JSON in the user's cache directory, and
+the YAML is only parsed again when one of the files changes. The cache is
+only ever a shortcut: if it cannot be read or written, the YAML is parsed.
+`CONF` is loaded on first access.
+"""
+
+import json
 import os
+import sys
+import zlib
+from dataclasses import dataclass, fields, is_dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
 
 # Define paths for config files
 CONFIG_DIR = os.path.dirname(__file__)
 DEFAULT_CONFIG_PATH = os.path.join(CONFIG_DIR, "default.yaml")
+USER_CONFIG_PATH = os.path.join(CONFIG_DIR, "user.yaml")
+
+
+def _cache_path() -> str:
+    """
+    Gets the path of the settings cache, in the user's cache directory.
+
+    The name holds a hash of the config directory, so installs in different
+    places keep their own caches.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    key = zlib.crc32(os.fsencode(os.path.abspath(CONFIG_DIR)))
+    return os.path.join(base, "snake", f"settings-{key:08x}.json")
+
+
+CACHE_PATH = _cache_path()
+
+RENDERERS = ("sprites", "dirty", "grid")
+SCORE_BACKENDS = ("json", "sqlite")
+
+
+def _check_positive(settings: object, section: str, *names: str) -> None:
+    """Raises ValueError if any of the named attributes is not positive."""
+    for name in names:
+        value = getattr(settings, name)
+        if value <= 0:
+            raise ValueError(f"{section}.{name} must be positive, not {value}")
+
+
+def _check_choice(value: str, name: str, choices: tuple[str, ...]) -> None:
+    """Raises ValueError if a value is not one of the choices."""
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}, not {value!r}")
+
+
+@dataclass(frozen=True, slots=True)
+class GameSettings:
+    """Settings of the game loop and board."""
+
+    fps: int
+    move_interval: int
+    cell_size: int
+    grid_width: int
+    grid_height: int
+    # The best score to start from, see `STATE` for the current one
+    best_score: int
+    renderer: str
+    # Let the autopilot play instead of the keyboard
+    autopilot: bool
+
+    def __post_init__(self) -> None:
+        _check_positive(
+            self,
+            "game",
+            "fps",
+            "move_interval",
+            "cell_size",
+            "grid_width",
+            "grid_height",
+        )
+        _check_choice(self.renderer, "game.renderer", RENDERERS)
+
+
+@dataclass(frozen=True, slots=True)
+class ProfilerSettings:
+    """Settings of the frame profiler."""
+
+    enabled: bool
+    overlay: bool
+    trace: str
+    frames: int
+
+    def __post_init__(self) -> None:
+        _check_positive(self, "profiler", "frames")
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreSettings:
+    """Settings of the high score storage."""
+
+    backend: str
+    player: str
+
+    def __post_init__(self) -> None:
+        _check_choice(self.backend, "scores.backend", SCORE_BACKENDS)
+
+
+@dataclass(frozen=True, slots=True)
+class ReplaySettings:
+    """Settings of replay recording."""
+
+    save: bool
+    dir: str
+
+
+@dataclass(frozen=True, slots=True)
+class RewindSettings:
+    """Settings of rewinding the last moves of a game."""
+
+    enabled: bool
+    seconds: int
+    # The most memory the kept states may take, in MiB
+    memory: int
+
+    def __post_init__(self) -> None:
+        _check_positive(self, "rewind", "seconds", "memory")
+
+
+@dataclass(frozen=True, slots=True)
+class ArenaSettings:
+    """Settings of the many-snake arena."""
+
+    grid_width: int
+    grid_height: int
+    bots: int
+    food: int
+
+    def __post_init__(self) -> None:
+        _check_positive(self, "arena", "grid_width", "grid_height", "food")
+        if self.bots < 0:
+            raise ValueError(f"arena.bots must not be negative, not {self.bots}")
+
+
+@dataclass(frozen=True, slots=True)
+class MenuSettings:
+    """Settings of the menu."""
+
+    cell_size_values: tuple[int, ...]
+    grid_size_values: tuple[int, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """All the settings of the application."""
+
+    game: GameSettings
+    profiler: ProfilerSettings
+    scores: ScoreSettings
+    replays: ReplaySettings
+    rewind: RewindSettings
+    arena: ArenaSettings
+    menu: MenuSettings
+
 
+class RuntimeState:
+    """Settings that change while the application runs."""
 
-def _load_config() -> DictConfig:
+    __slots__ = ("best_score",)
+
+    def __init__(self, best_score: int) -> None:
+        """
+        Initializes a RuntimeState object.
+
+        Args:
+            best_score: The best score so far.
+        """
+        self.best_score = best_score
+
+
+def _load_config() -> "DictConfig":
     """
-    Loads the configuration from default YAML file.
+    Loads the configuration from the default YAML file and the user overrides.
 
     Returns:
-        DictConfig: The loaded configuration object.
+        DictConfig: The merged, read-only configuration object.
+    """
+    from omegaconf import OmegaConf
+
+    config = OmegaConf.load(DEFAULT_CONFIG_PATH)
+    if os.path.exists(USER_CONFIG_PATH):
+        config = OmegaConf.merge(config, OmegaConf.load(USER_CONFIG_PATH))
+    OmegaConf.set_readonly(config, True)
+    return config
+
+
+def _scalar(value: Any, kind: type, key: str) -> Any:
     """
-    return OmegaConf.load(DEFAULT_CONFIG_PATH)
+    Checks a plain value against the type of its setting.
+
+    Numbers are converted when nothing is lost, since YAML and JSON writers
+    do not keep 10 and 10.0 apart: an int is accepted for a float, and a
+    float with no fractional part for an int.
+
+    Args:
+        value: The value.
+        kind: The type of the setting.
+        key: The dotted key of the setting, for error messages.
+
+    Returns:
+        The value, converted to `kind`.
+
+    Raises:
+        ValueError: If the value has the wrong type.
+    """
+    # type() rather than isinstance(), so true is not an int
+    if type(value) is kind:
+        return value
+    if kind is float and type(value) is int:
+        return float(value)
+    if kind is int and type(value) is float and value.is_integer():
+        return int(value)
+    raise ValueError(f"{key} must be {kind.__name__}, not {value!r}")
+
+
+def _compile(cls: type, node: Any, path: str = "") -> Any:
+    """
+    Builds a settings object from a section of the configuration.
+
+    Args:
+        cls: The settings class to build.
+        node: The section as plain containers.
+        path: The dotted key of the section, for error messages.
+
+    Returns:
+        A new object of type `cls`.
+
+    Raises:
+        ValueError: If a key is missing or unknown, or a value has the wrong
+            type.
+    """
+    if not isinstance(node, dict):
+        raise ValueError(f"{path} must be a mapping, not {node!r}")
+    names = [f.name for f in fields(cls)]
+    unknown = sorted(set(node) - set(names))
+    if unknown:
+        raise ValueError(f"Unknown setting {path}{'.' if path else ''}{unknown[0]}")
+
+    values = {}
+    for f in fields(cls):
+        key = f"{path}.{f.name}" if path else f.name
+        if f.name not in node:
+            raise ValueError(f"Missing setting {key}")
+        value = node[f.name]
+        if is_dataclass(f.type):
+            value = _compile(f.type, value, key)
+        elif f.type == tuple[int, ...]:
+            if not isinstance(value, list):
+                raise ValueError(f"{key} must be a list of integers, not {value!r}")
+            value = tuple(_scalar(v, int, key) for v in value)
+        else:
+            value = _scalar(value, f.type, key)
+        values[f.name] = value
+    return cls(**values)
+
+
+def compile_settings(config: "DictConfig") -> Settings:
+    """
+    Validates a configuration and compiles it into settings.
+
+    Args:
+        config: The configuration to compile.
+
+    Returns:
+        The frozen settings.
+
+    Raises:
+        ValueError: If the configuration is invalid.
+    """
+    from omegaconf import OmegaConf
+
+    return _compile(Settings, OmegaConf.to_container(config, resolve=True))
+
+
+def _sources() -> list[list]:
+    """Gets the path, size and modification time of each YAML file."""
+    sources = []
+    for path in (DEFAULT_CONFIG_PATH, USER_CONFIG_PATH):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        sources.append([path, stat.st_size, stat.st_mtime_ns])
+    return sources
+
+
+def _load_settings() -> Settings:
+    """
+    Loads the settings from the cache, or from the YAML files if it is stale.
+
+    Returns:
+        The frozen settings.
+
+    Raises:
+        ValueError: If the configuration is invalid.
+    """
+    sources = _sources()
+    try:
+        with open(CACHE_PATH) as f:
+            cached = json.load(f)
+        if cached["sources"] == sources:
+            return _compile(Settings, cached["config"])
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing, corrupt or written by an older version, so rebuild it
+        pass
+
+    from omegaconf import OmegaConf
+
+    config = OmegaConf.to_container(_load_config(), resolve=True)
+    # Compile before caching, so an invalid config is never cached
+    settings = _compile(Settings, config)
+    # Every process writes its own file and renames it over the cache, so
+    # processes starting together never read a half-written one
+    temp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        with open(temp_path, "w") as f:
+            json.dump({"sources": sources, "config": config}, f)
+        os.replace(temp_path, CACHE_PATH)
+    except OSError:
+        # Without a writable cache it still works, it just starts slower
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    return settings
+
+
+def __getattr__(name: str) -> Any:
+    """Loads `CONF` the first time it is accessed."""
+    if name == "CONF":
+        globals()["CONF"] = _load_config()
+        return globals()["CONF"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-# Create a singleton config object
-CONF: DictConfig = _load_config()
+# Create singleton settings and state objects
+SETTINGS: Settings = _load_settings()
+STATE = RuntimeState(SETTINGS.game.best_score)
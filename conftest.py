@@ -0,0 +1,12 @@
+"""
+This module sets up pytest for the tests in `tests`.
+
+The game's modules sit at the top of the repository, next to this file, so
+pytest puts this directory on the path. Nothing opens a window in the tests,
+so SDL runs headless.
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
@@ -0,0 +1,388 @@
+"""
+This module wraps the snake rules in a Gym-style environment.
+
+`SnakeEnv` plays one `Engine` game and `BatchSnakeEnv` plays a `BatchEngine`
+batch, both with `reset()` and `step(action)`. Observations are written into
+NumPy buffers allocated once, and every call returns the same buffer, so
+copy an observation if it has to outlive the next step.
+
+Observations are either "grid", with one plane each for the body, the food
+and the head, or "ego", a square window centered on the head and rotated
+so the snake always faces up, with planes for the body, the food and the
+walls.
+"""
+
+import numpy as np
+
+from batch import BatchEngine
+from engine import DIRECTIONS, Engine, MoveResult
+
+# The reward for each result of a move
+REWARDS: dict[MoveResult, float] = {
+    MoveResult.OK: 0.0,
+    MoveResult.ATE_FOOD: 1.0,
+    MoveResult.HIT_TAIL: -1.0,
+    MoveResult.HIT_BORDER: -1.0,
+    MoveResult.WON: 10.0,
+}
+
+OBSERVATIONS = ("grid", "ego")
+
+# Planes of the observations, the third one is the head for "grid" and the
+# walls for "ego"
+BODY, FOOD, HEAD = range(3)
+WALL = HEAD
+
+
+class SnakeEnv:
+    """
+    A single snake game with a `reset`/`step` interface.
+
+    Actions are direction codes into `engine.DIRECTIONS`, or -1 to keep
+    going straight. A finished game has to be reset before stepping again.
+    """
+
+    __slots__ = (
+        "engine",
+        "observation",
+        "radius",
+        "max_moves",
+        "rewards",
+        "obs",
+        "padded",
+        "surface",
+        "pixels",
+    )
+
+    def __init__(
+        self,
+        grid_width: int,
+        grid_height: int,
+        observation: str = "grid",
+        radius: int = 5,
+        max_moves: int = 0,
+        rewards: dict[MoveResult, float] | None = None,
+    ) -> None:
+        """
+        Initializes a SnakeEnv object.
+
+        Args:
+            grid_width: The width of the grid.
+            grid_height: The height of the grid.
+            observation: "grid" or "ego".
+            radius: How many cells the ego view sees on each side of the head.
+            max_moves: Truncate games after this many moves, 0 for never.
+            rewards: The reward for each result of a move, `REWARDS` if None.
+
+        Raises:
+            ValueError: If the observation is unknown.
+        """
+        if observation not in OBSERVATIONS:
+            raise ValueError(f"Unknown observation {observation!r}")
+        self.engine = Engine(grid_width, grid_height)
+        self.observation = observation
+        self.radius = radius
+        self.max_moves = max_moves
+        self.rewards = REWARDS if rewards is None else rewards
+        if observation == "grid":
+            self.obs = np.zeros((3, grid_height, grid_width), np.uint8)
+            self.padded = None
+        else:
+            size = 2 * radius + 1
+            self.obs = np.zeros((3, size, size), np.uint8)
+            # The grid with a wall border as wide as the view, so the view is
+            # always a plain slice of it
+            self.padded = np.zeros(
+                (3, grid_height + 2 * radius, grid_width + 2 * radius), np.uint8
+            )
+            self.padded[WALL] = 1
+            self._planes()[WALL] = 0
+        self.surface = None
+        self.pixels: np.ndarray | None = None
+
+    def reset(self, seed: int | None = None) -> np.ndarray:
+        """
+        Starts a new game.
+
+        Args:
+            seed: The seed of the game, random if None.
+
+        Returns:
+            The observation buffer.
+        """
+        engine = self.engine
+        engine.reset(seed)
+        planes = self._planes()
+        planes[BODY:FOOD + 1] = 0
+        for x, y in engine.body:
+            planes[BODY, y, x] = 1
+        if engine.food is not None:
+            planes[FOOD, engine.food[1], engine.food[0]] = 1
+        if self.padded is None:
+            planes[HEAD] = 0
+            planes[HEAD, engine.head[1], engine.head[0]] = 1
+        else:
+            self._write_ego()
+        return self.obs
+
+    def step(self, action: int) -> tuple[np.ndarray, float, bool, bool, dict]:
+        """
+        Moves the snake one step and updates the observation in place.
+
+        Only the cells the move changed are written.
+
+        Args:
+            action: A direction code, or -1 to keep going straight.
+
+        Returns:
+            The observation buffer, the reward, whether the game ended,
+            whether it was cut off by `max_moves`, and an info dict with the
+            result, score and moves.
+        """
+        engine = self.engine
+        old_head = engine.head
+        old_food = engine.food
+        if action >= 0:
+            engine.push_direction(DIRECTIONS[action])
+        result = engine.step()
+
+        if result in (MoveResult.OK, MoveResult.ATE_FOOD, MoveResult.WON):
+            planes = self._planes()
+            if engine.vacated is not None:
+                planes[BODY, engine.vacated[1], engine.vacated[0]] = 0
+            x, y = engine.head
+            planes[BODY, y, x] = 1
+            if engine.food != old_food:
+                planes[FOOD, old_food[1], old_food[0]] = 0
+                if engine.food is not None:
+                    planes[FOOD, engine.food[1], engine.food[0]] = 1
+            if self.padded is None:
+                planes[HEAD, old_head[1], old_head[0]] = 0
+                planes[HEAD, y, x] = 1
+            else:
+                self._write_ego()
+
+        terminated = not engine.alive
+        truncated = not terminated and 0 < self.max_moves <= engine.moves
+        info = {"result": result, "score": engine.score, "moves": engine.moves}
+        return self.obs, self.rewards[result], terminated, truncated, info
+
+    def _planes(self) -> np.ndarray:
+        """Gets the grid-sized planes, inside the wall border for ego views."""
+        if self.padded is None:
+            return self.obs
+        r = self.radius
+        engine = self.engine
+        return self.padded[:, r : r + engine.grid_height, r : r + engine.grid_width]
+
+    def _write_ego(self) -> None:
+        """Copies the window around the head into the observation, rotated."""
+        x, y = self.engine.head
+        size = 2 * self.radius + 1
+        window = self.padded[:, y : y + size, x : x + size]
+        # Rotate so the direction of travel points up; right needs a quarter
+        # turn counterclockwise, down a half turn and left a quarter clockwise
+        turns = (1, 2, -1, 0)[DIRECTIONS.index(self.engine.direction)]
+        np.copyto(self.obs, np.rot90(window, turns, axes=(1, 2)))
+
+    def render_to_array(self, cell_size: int = 8) -> np.ndarray:
+        """
+        Draws the game on an off-screen surface.
+
+        pygame is only imported on the first call. The surface and the
+        returned array are reused between calls.
+
+        Args:
+            cell_size: The size of the cells in pixels.
+
+        Returns:
+            The pixels, as a (height, width, 3) uint8 array.
+        """
+        from pygame import Surface
+        from pygame.surfarray import pixels3d
+
+        from colors import SCREEN_BACKGROUND_COLOR
+        from snake import SPRITES
+
+        engine = self.engine
+        size = (engine.grid_width * cell_size, engine.grid_height * cell_size)
+        if self.surface is None or self.surface.get_size() != size:
+            self.surface = Surface(size)
+            self.pixels = np.zeros((size[1], size[0], 3), np.uint8)
+
+        surface = self.surface
+        surface.fill(SCREEN_BACKGROUND_COLOR)
+        dead = engine.outcome in (MoveResult.HIT_TAIL, MoveResult.HIT_BORDER)
+        blits = []
+        if engine.food is not None:
+            x, y = engine.food
+            sprite = SPRITES.get("food", 0, cell_size)
+            blits.append((sprite, (x * cell_size, y * cell_size)))
+        head = len(engine.body) - 1
+        for i, (x, y) in enumerate(engine.body):
+            kind = "dead" if dead else "head" if i == head else "body"
+            sprite = SPRITES.get(kind, 0, cell_size)
+            blits.append((sprite, (x * cell_size, y * cell_size)))
+        surface.blits(blits, doreturn=False)
+
+        view = pixels3d(surface)
+        np.copyto(self.pixels, view.transpose(1, 0, 2))
+        del view
+        return self.pixels
+
+
+class BatchSnakeEnv:
+    """
+    Many snake games stepped together, with the `SnakeEnv` interface.
+
+    Games that end are reset by the step that ended them, and their
+    observation already shows the new game, like the autoreset of vector
+    environments. Only "grid" observations are supported.
+    """
+
+    __slots__ = (
+        "batch",
+        "rewards",
+        "obs",
+        "reward_table",
+        "reward_buffer",
+        "bases",
+        "cells",
+        "tails",
+        "index",
+        "values",
+        "drawn",
+        "unfed",
+        "ended",
+    )
+
+    def __init__(
+        self,
+        num_games: int,
+        grid_width: int,
+        grid_height: int,
+        seed: int | None = None,
+        rewards: dict[MoveResult, float] | None = None,
+    ) -> None:
+        """
+        Initializes a BatchSnakeEnv object.
+
+        Args:
+            num_games: The number of games.
+            grid_width: The width of the grids.
+            grid_height: The height of the grids.
+            seed: The seed of the food placement, random if None.
+            rewards: The reward for each result of a move, `REWARDS` if None.
+        """
+        self.batch = BatchEngine(num_games, grid_width, grid_height, seed)
+        self.rewards = REWARDS if rewards is None else rewards
+        self.obs = np.zeros((num_games, 3, grid_height, grid_width), np.uint8)
+        self.reward_table = np.zeros(len(MoveResult), np.float32)
+        for result, reward in self.rewards.items():
+            self.reward_table[result.value] = reward
+        self.reward_buffer = np.zeros(num_games, np.float32)
+
+        # Where each game's planes start in the flattened buffer
+        area = grid_width * grid_height
+        self.bases = np.arange(num_games, dtype=np.intp) * 3 * area
+        # Buffers for the cells a step changes, so stepping allocates nothing
+        self.cells = np.zeros(num_games, np.intp)
+        self.tails = np.zeros(num_games, self.batch.rings.dtype)
+        self.index = np.zeros(num_games, np.intp)
+        self.values = np.zeros(num_games, np.uint8)
+        # The flat indices of the head and food cells in the buffer
+        self.drawn = np.zeros((2, num_games), np.intp)
+        self.unfed = np.zeros(num_games, bool)
+        self.ended = np.zeros(num_games, bool)
+
+    def reset(self) -> np.ndarray:
+        """
+        Starts every game again.
+
+        Returns:
+            The observation buffer.
+        """
+        self.batch.reset()
+        self.obs.fill(0)
+        self._copy_bodies(slice(None))
+        self._write_marks()
+        return self.obs
+
+    def step(
+        self, actions: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Moves every snake one step and rewrites the observations in place.
+
+        Only the cells that changed are written: the head and food of every
+        game, and the cell its tail left. The body planes of games that
+        ended are copied whole, since they were started again.
+
+        Args:
+            actions: A direction code per game, or -1 to keep going straight.
+
+        Returns:
+            The observation buffer, the reward buffer, whether each game
+            ended, and the MoveResult value of each game's move.
+        """
+        batch = self.batch
+        # The tails before the move, which it may free
+        np.add(batch.bases, batch.starts, out=self.index)
+        batch.rings.reshape(-1).take(self.index, out=self.tails)
+        results = batch.step(actions)
+        self.reward_table.take(results, out=self.reward_buffer)
+        self._write_bodies(results)
+        self._write_marks()
+        terminated = results >= MoveResult.HIT_TAIL.value
+        return self.obs, self.reward_buffer, terminated, results
+
+    def _copy_bodies(self, games: slice | np.ndarray) -> None:
+        """Copies the occupancy grids of games into their body planes."""
+        num_games, _, height, width = self.obs.shape
+        area = height * width
+        planes = self.obs.reshape(num_games, 3 * area)
+        planes[games, BODY * area : (BODY + 1) * area] = self.batch.occupied[games]
+
+    def _write_bodies(self, results: np.ndarray) -> None:
+        """Writes the body cells a step changed into the body planes."""
+        batch = self.batch
+        _, _, height, width = self.obs.shape
+        flat = self.obs.reshape(-1)
+        index = self.index
+        # The cell a tail left is freed, unless its snake ate or moved into it
+        np.add(batch.bases, self.tails, out=index)
+        batch.occupied.reshape(-1).take(index, out=self.values)
+        np.add(self.bases, self.tails, out=index)
+        index += BODY * height * width
+        flat[index] = self.values
+        # The new heads
+        cells = self.cells
+        np.multiply(batch.head_y, width, out=cells)
+        cells += batch.head_x
+        np.add(self.bases, cells, out=index)
+        index += BODY * height * width
+        flat[index] = 1
+        np.greater_equal(results, MoveResult.HIT_TAIL.value, out=self.ended)
+        if self.ended.any():
+            self._copy_bodies(np.flatnonzero(self.ended))
+
+    def _write_marks(self) -> None:
+        """Moves the head and food marks of every game to their new cells."""
+        batch = self.batch
+        _, _, height, width = self.obs.shape
+        area = height * width
+        flat = self.obs.reshape(-1)
+        drawn = self.drawn
+        heads, food = drawn
+        flat[drawn] = 0
+        np.multiply(batch.head_y, width, out=heads)
+        heads += batch.head_x
+        heads += self.bases
+        np.add(self.bases, batch.food, out=food)
+        food += FOOD * area
+        # A full board has no food, so its food mark goes on the head, which
+        # is marked anyway
+        heads += HEAD * area
+        np.less(batch.food, 0, out=self.unfed)
+        np.copyto(food, heads, where=self.unfed)
+        flat[drawn] = 1
@@ -0,0 +1,488 @@
+"""
+This module exports recorded games to video or GIF files without a window.
+
+Frames are drawn off-screen by the same `Snake.draw` and `Food.draw` as the
+game, at a fixed frame rate, so a clip looks just like the replay played in
+the game. The replay is first played through without drawing, which is
+cheap, keeping a `FrameState` every few frames. Worker processes each
+restore one of those states and draw the frames after it, and the frames
+are written in order to a local ffmpeg binary through a pipe. Without
+ffmpeg, or for a .gif file, the workers encode the frames as GIF and they
+are written by the built-in `gif.GifWriter` instead. Only a few batches of
+frames are in flight at once, so the memory used does not depend on the
+length of the game.
+
+Usage:
+    python export.py <file> [-o clip.mp4] [--fps N] [--size W H]
+                     [--start S] [--length S] [--workers N]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from array import array
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pygame
+from pygame import Surface
+from pygame_menu.font import FONT_8BIT
+
+from assets import ASSETS
+from colors import OUTSIDE_COLOR, SCORE_TEXT_COLOR, SCREEN_BACKGROUND_COLOR
+from config import SETTINGS
+from game import SCORE_TEXT_POS
+from gif import GifWriter, Palette, encode_frame
+from replay import Replay, ReplayPlayer
+from snake import PHASE_STEPS, SPRITE_COLORS, SPRITES, Food, Snake
+
+# GIF frames last whole hundredths of a second, and most viewers slow down
+# anything shorter than two
+MAX_GIF_FPS = 50
+
+# The largest frames by default, the size of the game window. Smaller
+# boards get frames just big enough for them
+WINDOW_SIZE = (1200, 900)
+
+# The longest batch of frames a worker draws, in seconds of video. GIF
+# batches start with a whole frame, so they are longer
+BATCH_SECONDS = 1
+GIF_BATCH_SECONDS = 10
+
+# Shades of the score text blended into the background by antialiasing
+TEXT_SHADES = 16
+
+
+class FrameState:
+    """Everything about a clip that changes from one frame to the next."""
+
+    __slots__ = (
+        "frame",
+        "engine",
+        "clock",
+        "progress",
+        "dead_acc",
+        "food",
+        "pulses",
+        "camera",
+    )
+
+    def __init__(self, frame: int, snake: Snake) -> None:
+        """
+        Initializes a FrameState object.
+
+        Args:
+            frame: The number of frames played so far.
+            snake: The snake of the clip.
+        """
+        self.frame = frame
+        self.engine = snake.engine.snapshot()
+        self.clock = snake.clock
+        self.progress = snake.progress
+        self.dead_acc = snake.dead_acc
+        self.food = None if snake.food is None else snake.food.progress
+        # The pulse offsets from tail to head
+        self.pulses = array("f", snake.pulses)
+        self.camera = (snake.camera.x, snake.camera.y)
+
+
+class Clip:
+    """A replay played back frame by frame on an off-screen surface."""
+
+    __slots__ = ("replay", "screen", "snake", "player", "step", "frame", "over")
+
+    def __init__(
+        self, replay: Replay, size: tuple[int, int], cell_size: int, fps: int
+    ) -> None:
+        """
+        Initializes a Clip object at the start of the game.
+
+        Args:
+            replay: The game to play back.
+            size: The size of the frames in pixels.
+            cell_size: The size of the cells in pixels.
+            fps: The frames per second of the clip.
+        """
+        self.replay = replay
+        self.screen = Surface(size)
+        self.player = ReplayPlayer(replay)
+        self.snake = Snake(
+            replay.grid_width,
+            replay.grid_height,
+            self.screen,
+            cell_size,
+            seed=replay.seed,
+            controller=self.player,
+            on_game_over=lambda: None,
+        )
+        self.step = 1000 / fps / replay.move_interval
+        self.frame = 0
+        self.over = False
+
+    def restore(self, state: FrameState) -> None:
+        """
+        Puts the clip back at a frame kept by `FrameState`.
+
+        Args:
+            state: The state of the clip at that frame.
+        """
+        snake = self.snake
+        engine = snake.engine
+        engine.restore(state.engine)
+        snake.clock = state.clock
+        snake.progress = state.progress
+        snake.dead_acc = state.dead_acc
+        snake.food = None
+        if engine.food is not None:
+            snake.food = Food(*engine.food)
+            snake.food.progress = state.food
+        pulses = snake.pulses
+        pulses.offsets[: len(state.pulses)] = state.pulses
+        pulses.start = 0
+        pulses.length = len(state.pulses)
+        snake.camera.x, snake.camera.y = state.camera
+        self.player = snake.controller = ReplayPlayer(self.replay, engine.moves)
+        self.frame = state.frame
+        self.over = False
+
+    def advance(self) -> None:
+        """Plays the time of one frame, the way the game loop does."""
+        snake = self.snake
+        engine = snake.engine
+        snake.tick(self.step)
+        snake.camera.follow(*engine.head)
+        self.frame += 1
+        # The game ends once its death has been shown, or at the last
+        # recorded move if the recording stopped first
+        if engine.alive:
+            self.over = self.player.finished(engine)
+        else:
+            self.over = snake.dead_acc <= 0
+
+    def draw(self) -> Surface:
+        """
+        Draws the current frame as the game does.
+
+        Returns:
+            The off-screen surface, which is drawn over by the next call.
+        """
+        snake = self.snake
+        snake.clear(SCREEN_BACKGROUND_COLOR)
+        snake.draw(follow=False)
+        score_text = ASSETS.text(
+            f"{snake.score}", SCORE_TEXT_COLOR, FONT_8BIT, snake.cell_size
+        )
+        self.screen.blit(score_text, SCORE_TEXT_POS)
+        return self.screen
+
+
+def palette_colors(cell_size: int) -> list[tuple[int, int, int]]:
+    """
+    Gets the colors a clip is drawn with, for the palette of a GIF.
+
+    Every other pulse phase of the sprites is enough to stay under 256
+    colors, the phases in between map to the nearest of them.
+
+    Args:
+        cell_size: The size of the cells in pixels.
+
+    Returns:
+        The RGB colors.
+    """
+    colors = [
+        SCREEN_BACKGROUND_COLOR.lerp(SCORE_TEXT_COLOR, i / (TEXT_SHADES - 1))
+        for i in range(TEXT_SHADES)
+    ]
+    colors.append(OUTSIDE_COLOR)
+    sprites = [SPRITES.get("dead", 0, cell_size)]
+    for kind in SPRITE_COLORS:
+        for phase in range(0, PHASE_STEPS + 1, 2):
+            sprites.append(SPRITES.get(kind, phase / PHASE_STEPS, cell_size))
+    for sprite in sprites:
+        pixels = pygame.surfarray.array3d(sprite).reshape(-1, 3)
+        colors.extend(map(tuple, np.unique(pixels, axis=0).tolist()))
+    return [tuple(color)[:3] for color in colors]
+
+
+def gif_delay(frame: int, fps: int) -> int:
+    """
+    Gets how long a GIF frame is shown, so the clip keeps the right speed.
+
+    Args:
+        frame: The number of the frame, from 1.
+        fps: The frames per second of the clip.
+
+    Returns:
+        The delay in hundredths of a second.
+    """
+    return round(frame * 100 / fps) - round((frame - 1) * 100 / fps)
+
+
+class FfmpegPipe:
+    """An ffmpeg process encoding raw RGB frames written to its input."""
+
+    __slots__ = ("process",)
+
+    def __init__(
+        self, ffmpeg: str, path: str, size: tuple[int, int], fps: int
+    ) -> None:
+        """
+        Initializes a FfmpegPipe object and starts ffmpeg.
+
+        Args:
+            ffmpeg: The ffmpeg binary.
+            path: The file to write, its extension picks the format.
+            size: The size of the frames in pixels.
+            fps: The frames per second of the clip.
+        """
+        width, height = size
+        command = [
+            ffmpeg,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(fps),
+            "-i",
+            "-",
+            # Most players only take 4:2:0, which needs an even size
+            "-vf",
+            "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-pix_fmt",
+            "yuv420p",
+            path,
+        ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame: bytes) -> None:
+        """
+        Sends a frame to ffmpeg.
+
+        Args:
+            frame: The RGB pixels of the frame, row by row.
+        """
+        self.process.stdin.write(frame)
+
+    def close(self) -> None:
+        """
+        Waits for ffmpeg to finish the file.
+
+        Raises:
+            RuntimeError: If ffmpeg failed.
+        """
+        self.process.stdin.close()
+        code = self.process.wait()
+        if code:
+            raise RuntimeError(f"ffmpeg exited with code {code}")
+
+
+def plan(clip: Clip, batch: int, start: int, end: int) -> Iterator[FrameState]:
+    """
+    Plays a clip through without drawing and keeps its state between batches.
+
+    Args:
+        clip: The clip, at its first frame.
+        batch: The frames in each batch.
+        start: The first frame to export.
+        end: The frame to stop at.
+
+    Yields:
+        The state before each batch of frames.
+    """
+    while not clip.over and clip.frame < start:
+        clip.advance()
+    while not clip.over and clip.frame < end:
+        yield FrameState(clip.frame, clip.snake)
+        for _ in range(min(batch, end - clip.frame)):
+            clip.advance()
+            if clip.over:
+                break
+
+
+# The clip of a worker process and its GIF palette, set up by `_start_worker`
+_clip: Clip | None = None
+_palette: Palette | None = None
+
+
+def _start_worker(
+    replay: Replay,
+    size: tuple[int, int],
+    cell_size: int,
+    fps: int,
+    palette: Palette | None,
+) -> None:
+    """Sets up the clip of a worker process."""
+    global _clip, _palette
+    _clip = Clip(replay, size, cell_size, fps)
+    _palette = palette
+
+
+def render_frames(
+    state: FrameState, count: int, fps: int
+) -> tuple[int, list[bytes]]:
+    """
+    Draws a batch of frames in a worker process.
+
+    Args:
+        state: The state of the clip before the batch.
+        count: The most frames to draw, fewer if the game ends.
+        fps: The frames per second of the clip.
+
+    Returns:
+        The number of the frame before the batch, and the raw RGB pixels of
+        each frame, or each frame encoded as GIF if the clip has a palette.
+    """
+    clip = _clip
+    clip.restore(state)
+    width, height = clip.screen.get_size()
+    frames = []
+    previous = None
+    for _ in range(count):
+        clip.advance()
+        if _palette is None:
+            frames.append(pygame.image.tobytes(clip.draw(), "RGB"))
+        else:
+            pixels = np.frombuffer(
+                pygame.image.tobytes(clip.draw(), "RGBX"), "<u4"
+            ).reshape(height, width)
+            # The first frame of a batch is stored whole, the rest only
+            # where they changed
+            delay = gif_delay(clip.frame, fps)
+            frames.append(encode_frame(pixels, previous, _palette, delay))
+            previous = pixels
+        if clip.over:
+            break
+    return state.frame, frames
+
+
+def main() -> None:
+    """Exports the replay given on the command line."""
+    parser = argparse.ArgumentParser(description="Export a replay to a video.")
+    parser.add_argument("replay", help="the replay file")
+    parser.add_argument(
+        "-o", "--output", help="the video, .gif for a GIF, default the replay as .mp4"
+    )
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument(
+        "--size",
+        type=int,
+        nargs=2,
+        metavar=("W", "H"),
+        help="the size of the frames, default the board up to the game window",
+    )
+    parser.add_argument("--cell-size", type=int, default=SETTINGS.game.cell_size)
+    parser.add_argument(
+        "--start", type=float, default=0.0, help="seconds into the game to start at"
+    )
+    parser.add_argument("--length", type=float, help="seconds to export, default all")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--memory",
+        type=int,
+        default=256,
+        help="MiB of frames in flight at once, which sets the batch size",
+    )
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="the ffmpeg binary")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+    output = args.output or os.path.splitext(args.replay)[0] + ".mp4"
+    fps = args.fps
+    size = tuple(args.size or ())
+    if not size:
+        size = (
+            min(replay.grid_width * args.cell_size, WINDOW_SIZE[0]),
+            min(replay.grid_height * args.cell_size, WINDOW_SIZE[1]),
+        )
+    ffmpeg = None
+    if not output.endswith(".gif"):
+        ffmpeg = shutil.which(args.ffmpeg)
+        if ffmpeg is None:
+            output = os.path.splitext(output)[0] + ".gif"
+            print(f"{args.ffmpeg} not found, writing {output}", file=sys.stderr)
+    if ffmpeg is None and fps > MAX_GIF_FPS:
+        parser.error(f"GIFs play at most {MAX_GIF_FPS} fps")
+
+    palette = None
+    if ffmpeg is None:
+        palette = Palette(palette_colors(args.cell_size))
+        encoder = GifWriter(output, *size, palette)
+    else:
+        encoder = FfmpegPipe(ffmpeg, output, size, fps)
+
+    # A few batches per worker are in flight. Raw frames take 3 bytes a
+    # pixel, and a GIF frame rarely more than the byte of its palette index
+    window = 2 * args.workers
+    if palette is None:
+        frame_bytes = size[0] * size[1] * 3
+        longest = BATCH_SECONDS * fps
+    else:
+        frame_bytes = size[0] * size[1]
+        longest = GIF_BATCH_SECONDS * fps
+    batch = max(min((args.memory << 20) // (window * frame_bytes), longest), 1)
+    start = round(args.start * fps)
+    end = sys.maxsize if args.length is None else start + round(args.length * fps)
+    tasks = plan(Clip(replay, size, args.cell_size, fps), batch, start, end)
+
+    written = 0
+    began = time.perf_counter()
+    with ProcessPoolExecutor(
+        args.workers,
+        initializer=_start_worker,
+        initargs=(replay, size, args.cell_size, fps, palette),
+    ) as pool:
+
+        def submit() -> bool:
+            state = next(tasks, None)
+            if state is None:
+                return False
+            count = min(batch, end - state.frame)
+            pending.add(pool.submit(render_frames, state, count, fps))
+            return True
+
+        # Batches that finish early wait in ready for the ones before them,
+        # and count towards the window until they are written
+        pending = set()
+        ready: dict[int, list[bytes]] = {}
+        while len(pending) < window and submit():
+            pass
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                first, frames = future.result()
+                ready[first] = frames
+            while start + written in ready:
+                frames = ready.pop(start + written)
+                for frame in frames:
+                    encoder.write(frame)
+                written += len(frames)
+            while len(pending) + len(ready) < window and submit():
+                pass
+            speed = written / fps / (time.perf_counter() - began)
+            print(
+                f"\r{written} frames, {written / fps:.1f} s of video,"
+                f" {speed:.1f}x real time ",
+                end="",
+                file=sys.stderr,
+            )
+    encoder.close()
+    print(file=sys.stderr)
+    print(
+        f"{output}: {written} frames, {written / fps:.1f} s of video"
+        f" in {time.perf_counter() - began:.1f} s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,37 +2,128 @@
 This module contains the main game logic.
 """
 
+from collections import deque
+
+import numpy as np
 import pygame
 from pygame_menu.font import FONT_8BIT
 
+from arena import Arena
+from assets import ASSETS
+from autopilot import Autopilot
 from colors import SCORE_TEXT_COLOR, SCREEN_BACKGROUND_COLOR
-from config import CONF
+from config import SETTINGS, STATE
+from engine import DIRECTIONS
+from profiler import FrameProfiler
+from renderers import ArenaRenderer, DirtyRenderer
+from replay import Replay, ReplayPlayer
 from snake import Snake
 
+SCORE_TEXT_POS = (10, 10)
+
+# The phases of a frame, as recorded by the profiler
+FRAME_PHASES = ("events", "wait", "tick", "text", "draw", "present")
+EVENTS, WAIT, TICK, TEXT, DRAW, PRESENT = range(len(FRAME_PHASES))
+
+KEY_DIRECTIONS = {
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_a: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_d: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_w: (0, -1),
+    pygame.K_DOWN: (0, 1),
+    pygame.K_s: (0, 1),
+}
 
-def game(screen: pygame.Surface) -> None:
+# The index of the player's snake in the arena, the others are bots
+PLAYER = 0
+
+
+def game(screen: pygame.Surface, replay: Replay | None = None) -> None:
     """
     Initializes and runs the main game loop.
-    """
-    pygame.font.init()
 
-    screen_width, screen_height = screen.get_size()
-
-    score_text_size = CONF.game.cell_size
-    font = pygame.font.Font(FONT_8BIT, score_text_size)
+    Args:
+        screen: The pygame surface to draw on.
+        replay: A recorded game to show instead of taking keyboard input.
+    """
+    settings = SETTINGS.game
+    score_text_size = settings.cell_size
     running: bool = True
 
-    fps = CONF.game.fps
-    cell_size = CONF.game.cell_size
-    move_interval = CONF.game.move_interval
-    grid_width = screen_width // cell_size
-    grid_height = screen_height // cell_size
+    fps = settings.fps
+    cell_size = settings.cell_size
+    move_interval = settings.move_interval
+    grid_width = settings.grid_width
+    grid_height = settings.grid_height
 
     clock = pygame.time.Clock()
 
-    snake = Snake(grid_width, grid_height, screen, cell_size)
+    player = None
+    if replay is None and settings.autopilot:
+
+        def restart() -> None:
+            # Attract mode games are not worth a high score
+            snake.reset()
+
+        snake = Snake(
+            grid_width,
+            grid_height,
+            screen,
+            cell_size,
+            settings.renderer,
+            controller=Autopilot(grid_width, grid_height),
+            on_game_over=restart,
+        )
+    elif replay is None:
+        rewind = SETTINGS.rewind
+        snake = Snake(
+            grid_width,
+            grid_height,
+            screen,
+            cell_size,
+            settings.renderer,
+            rewind_moves=(
+                rewind.seconds * 1000 // move_interval if rewind.enabled else 0
+            ),
+            rewind_memory=rewind.memory << 20,
+        )
+    else:
+
+        def stop() -> None:
+            nonlocal running
+            running = False
+
+        move_interval = replay.move_interval
+        player = ReplayPlayer(replay)
+        snake = Snake(
+            replay.grid_width,
+            replay.grid_height,
+            screen,
+            cell_size,
+            settings.renderer,
+            seed=replay.seed,
+            controller=player,
+            on_game_over=stop,
+        )
+
+    renderer = None
+    if settings.renderer == "dirty":
+        renderer = DirtyRenderer(screen, SCREEN_BACKGROUND_COLOR, SCORE_TEXT_POS)
+
+    profiler = None
+    if SETTINGS.profiler.enabled:
+        profiler = FrameProfiler(FRAME_PHASES, SETTINGS.profiler.frames, fps)
+    show_overlay = profiler is not None and SETTINGS.profiler.overlay
+
+    score = None
+    score_text = None
 
     while running:
+        if profiler is not None:
+            profiler.begin_frame()
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -42,26 +133,136 @@ def game(screen: pygame.Surface) -> None:
                 if event.key == pygame.K_ESCAPE:
                     running = False
                     break
-                if event.key in (pygame.K_LEFT, pygame.K_a):
-                    snake.push_direction((-1, 0))
-                if event.key in (pygame.K_RIGHT, pygame.K_d):
-                    snake.push_direction((1, 0))
-                if event.key in (pygame.K_UP, pygame.K_w):
-                    snake.push_direction((0, -1))
-                if event.key in (pygame.K_DOWN, pygame.K_s):
-                    snake.push_direction((0, 1))
+                if player is not None or snake.controller is not None:
+                    continue
+                if event.key == pygame.K_BACKSPACE:
+                    snake.rewinding = True
+                    continue
+                direction = KEY_DIRECTIONS.get(event.key)
+                if direction is not None:
+                    snake.push_direction(direction)
+
+            if event.type == pygame.KEYUP and event.key == pygame.K_BACKSPACE:
+                snake.rewinding = False
+
+        if profiler is not None:
+            profiler.mark(EVENTS)
 
         progress_step = clock.tick(fps) / move_interval
+        if profiler is not None:
+            profiler.mark(WAIT)
 
         snake.tick(progress_step)
 
-        if snake.score > CONF.game.best_score:
-            CONF.game.best_score = snake.score
+        if player is not None and snake.engine.alive and player.finished(snake.engine):
+            # The recording stopped before the game ended
+            running = False
 
-        screen.fill(SCREEN_BACKGROUND_COLOR)
-        snake.draw()
-        score_text = font.render(f"{snake.score}", True, SCORE_TEXT_COLOR)
-        screen.blit(score_text, (10, 10))
-        pygame.display.flip()
+        # Replays and the autopilot do not set records
+        if snake.controller is None and snake.score > STATE.best_score:
+            STATE.best_score = snake.score
+
+        if profiler is not None:
+            profiler.mark(TICK)
+
+        if snake.score != score:
+            score = snake.score
+            score_text = ASSETS.text(
+                f"{score}", SCORE_TEXT_COLOR, FONT_8BIT, score_text_size
+            )
+        if profiler is not None:
+            profiler.mark(TEXT)
+
+        if renderer is not None:
+            rects = renderer.draw(snake, score_text)
+            if profiler is not None:
+                profiler.mark(DRAW)
+            if show_overlay:
+                rects.append(profiler.draw_overlay(screen))
+            pygame.display.update(rects)
+        else:
+            snake.clear(SCREEN_BACKGROUND_COLOR)
+            snake.draw()
+            screen.blit(score_text, SCORE_TEXT_POS)
+            if profiler is not None:
+                profiler.mark(DRAW)
+            if show_overlay:
+                profiler.draw_overlay(screen)
+            pygame.display.flip()
+        if profiler is not None:
+            profiler.mark(PRESENT)
+
+    if profiler is not None and SETTINGS.profiler.trace:
+        profiler.dump(SETTINGS.profiler.trace)
 
     # Return to menu instead of quitting
+
+
+def arena_game(screen: pygame.Surface) -> None:
+    """
+    Runs a game where the player shares one board with many bots.
+
+    The player and every bot start again as soon as they die, and the
+    player's score is not saved.
+
+    Args:
+        screen: The pygame surface to draw on.
+    """
+    settings = SETTINGS.arena
+    fps = SETTINGS.game.fps
+    move_interval = SETTINGS.game.move_interval
+    cell_size = SETTINGS.game.cell_size
+    score_text_size = cell_size
+
+    arena = Arena(
+        settings.grid_width, settings.grid_height, settings.bots + 1, settings.food
+    )
+    bots = np.arange(PLAYER + 1, arena.num_snakes)
+    actions = np.full(arena.num_snakes, -1, np.intp)
+    # The player's direction codes, one is used per move like `Engine` does
+    queue: deque[int] = deque()
+    renderer = ArenaRenderer(
+        arena, PLAYER, cell_size, screen.get_size(), SCREEN_BACKGROUND_COLOR
+    )
+    renderer.update(arena)
+
+    clock = pygame.time.Clock()
+    progress = 0.0
+    score = None
+    score_text = None
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+                break
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                    break
+                direction = KEY_DIRECTIONS.get(event.key)
+                if direction is not None:
+                    queue.append(DIRECTIONS.index(direction))
+
+        progress += clock.tick(fps) / move_interval
+        moved = progress >= 1
+        while progress >= 1:
+            progress -= 1
+            current = arena.directions[PLAYER]
+            while queue and queue[0] & 1 == current & 1:
+                queue.popleft()
+            actions[PLAYER] = queue.popleft() if queue else -1
+            actions[bots] = arena.steer(bots)
+            arena.step(actions)
+        if moved:
+            renderer.update(arena)
+
+        if arena.scores[PLAYER] != score:
+            score = arena.scores[PLAYER]
+            score_text = ASSETS.text(
+                f"{score}", SCORE_TEXT_COLOR, FONT_8BIT, score_text_size
+            )
+
+        renderer.draw(screen)
+        screen.blit(score_text, SCORE_TEXT_POS)
+        pygame.display.flip()
@@ -0,0 +1,256 @@
+"""
+This module writes animated GIF files with nothing but NumPy.
+
+Frames are given as RGBX pixels packed in 32-bit integers, which is what
+`pygame.image.tobytes(surface, "RGBX")` gives, so comparing two frames is a
+single NumPy comparison. Each frame only stores the rectangle that changed
+since the frame before it, with the pixels inside it that did not change
+left transparent, which keeps both the file and the LZW work small when
+little moves. The rectangle is mapped to one global palette of at most 255
+colors through a lookup table of 15-bit colors, and the colors the palette
+was made from come out exact.
+
+Encoding a frame only needs the frame before it, so `encode_frame` can run
+in worker processes while a single `GifWriter` writes the results in order.
+"""
+
+import struct
+
+import numpy as np
+
+# Index 255 is kept for transparency, so a palette has at most 255 colors
+TRANSPARENT = 255
+MAX_COLORS = 255
+
+# LZW codes for 8-bit pixels
+MIN_CODE_SIZE = 8
+CLEAR = 1 << MIN_CODE_SIZE
+END = CLEAR + 1
+MAX_CODE = 4096
+
+# The graphic control extension of a frame: delay in hundredths of a
+# second and the transparent index. Frames are drawn over the previous one
+CONTROL = struct.Struct("<3sBHBB")
+# The image descriptor of a frame: left, top, width, height, no local palette
+DESCRIPTOR = struct.Struct("<BHHHHB")
+
+
+class Palette:
+    """The colors of a GIF and the lookup table that maps pixels to them."""
+
+    __slots__ = ("colors", "table")
+
+    def __init__(self, colors: list[tuple[int, int, int]]) -> None:
+        """
+        Initializes a Palette object.
+
+        Every 15-bit color is mapped to the nearest of the colors, and then
+        each of the colors to itself, so they come out exact.
+
+        Args:
+            colors: The RGB colors, duplicates are dropped.
+
+        Raises:
+            ValueError: If there are more than 255 distinct colors.
+        """
+        unique = list(dict.fromkeys(tuple(color) for color in colors))
+        if not 0 < len(unique) <= MAX_COLORS:
+            raise ValueError(
+                f"A palette needs 1 to {MAX_COLORS} colors, not {len(unique)}"
+            )
+        rgb = np.array(unique, np.int32)
+        self.colors = rgb.astype(np.uint8)
+
+        # The middle of every 15-bit color bin
+        bins = np.arange(1 << 15)
+        centers = np.stack(
+            ((bins >> 10) & 31, (bins >> 5) & 31, bins & 31), axis=1
+        ) * 8 + 4
+        table = np.empty(1 << 15, np.uint8)
+        for start in range(0, len(bins), 4096):
+            chunk = centers[start : start + 4096, None, :] - rgb[None, :, :]
+            distance = (chunk * chunk).sum(axis=2)
+            table[start : start + 4096] = distance.argmin(axis=1)
+        packed = rgb[:, 0] | rgb[:, 1] << 8 | rgb[:, 2] << 16
+        table[self.bins(packed.astype(np.uint32))] = np.arange(len(unique))
+        self.table = table
+
+    @staticmethod
+    def bins(pixels: np.ndarray) -> np.ndarray:
+        """Gets the 15-bit color of every pixel of an RGBX uint32 array."""
+        return (
+            (pixels << 7 & 0x7C00) | (pixels >> 6 & 0x3E0) | (pixels >> 19 & 0x1F)
+        )
+
+    def quantize(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Maps pixels to palette indexes.
+
+        Args:
+            pixels: A (height, width) uint32 array of RGBX pixels.
+
+        Returns:
+            The (height, width) uint8 array of indexes.
+        """
+        return self.table[self.bins(pixels)]
+
+    def to_bytes(self) -> bytes:
+        """Encodes the palette as a 256-color GIF color table."""
+        table = np.zeros((256, 3), np.uint8)
+        table[: len(self.colors)] = self.colors
+        return table.tobytes()
+
+
+def lzw(data: bytes) -> bytes:
+    """
+    Compresses palette indexes with the LZW variant of GIF.
+
+    Args:
+        data: The indexes, one byte per pixel.
+
+    Returns:
+        The codes, packed least significant bit first.
+    """
+    out = bytearray()
+    table: dict[int, int] = {}
+    get = table.get
+    next_code = END + 1
+    size = MIN_CODE_SIZE + 1
+    # Start with a clear code, as some decoders expect
+    bits = CLEAR
+    count = size
+    prefix = data[0]
+    for index in data[1:]:
+        key = prefix << 8 | index
+        code = get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << count
+        count += size
+        if count >= 64:
+            out += (bits & 0xFFFFFFFFFFFFFFFF).to_bytes(8, "little")
+            bits >>= 64
+            count -= 64
+        if next_code == MAX_CODE:
+            bits |= CLEAR << count
+            count += size
+            table.clear()
+            next_code = END + 1
+            size = MIN_CODE_SIZE + 1
+        else:
+            table[key] = next_code
+            # The decoder adds this code one step later, so it widens the
+            # codes as the code after the largest one is assigned
+            if next_code == 1 << size:
+                size += 1
+            next_code += 1
+        prefix = index
+    bits |= prefix << count
+    count += size
+    bits |= END << count
+    count += size
+    out += bits.to_bytes((count + 7) // 8, "little")
+    return bytes(out)
+
+
+def _blocks(data: bytes) -> bytes:
+    """Splits data into GIF sub-blocks of up to 255 bytes, and ends them."""
+    out = bytearray()
+    for i in range(0, len(data), 255):
+        chunk = data[i : i + 255]
+        out.append(len(chunk))
+        out += chunk
+    out.append(0)
+    return bytes(out)
+
+
+def encode_frame(
+    pixels: np.ndarray, previous: np.ndarray | None, palette: Palette, delay: int
+) -> bytes:
+    """
+    Encodes one frame of an animation.
+
+    Args:
+        pixels: The (height, width) uint32 array of RGBX pixels.
+        previous: The pixels of the frame before it, or None to store the
+            whole frame.
+        palette: The palette of the animation.
+        delay: How long the frame is shown, in hundredths of a second.
+
+    Returns:
+        The control extension, image descriptor and image data of the frame.
+    """
+    left = top = 0
+    if previous is None:
+        indexes = palette.quantize(pixels)
+        transparent = 0
+    else:
+        changed = pixels != previous
+        rows = np.flatnonzero(changed.any(axis=1))
+        if not len(rows):
+            # A single transparent pixel, which only shows the previous frame
+            # for longer
+            indexes = np.full((1, 1), TRANSPARENT, np.uint8)
+        else:
+            columns = np.flatnonzero(changed.any(axis=0))
+            top, bottom = int(rows[0]), int(rows[-1]) + 1
+            left, right = int(columns[0]), int(columns[-1]) + 1
+            indexes = palette.quantize(pixels[top:bottom, left:right])
+            indexes[~changed[top:bottom, left:right]] = TRANSPARENT
+        transparent = 1
+    height, width = indexes.shape
+    return b"".join(
+        (
+            CONTROL.pack(b"\x21\xf9\x04", 1 << 2 | transparent, delay, TRANSPARENT, 0),
+            DESCRIPTOR.pack(0x2C, left, top, width, height, 0),
+            bytes((MIN_CODE_SIZE,)),
+            _blocks(lzw(indexes.tobytes())),
+        )
+    )
+
+
+class GifWriter:
+    """Writes encoded frames to an animated GIF file that loops forever."""
+
+    __slots__ = ("file",)
+
+    def __init__(
+        self, path: str, width: int, height: int, palette: Palette
+    ) -> None:
+        """
+        Initializes a GifWriter object and writes the header.
+
+        Args:
+            path: The file to write, replaced if it exists.
+            width: The width of the frames.
+            height: The height of the frames.
+            palette: The colors of every frame.
+        """
+        self.file = open(path, "wb")
+        self.file.write(
+            b"".join(
+                (
+                    b"GIF89a",
+                    # A global color table of 256 colors, 8 bits per channel
+                    struct.pack("<HHBBB", width, height, 0xF7, 0, 0),
+                    palette.to_bytes(),
+                    # Loop forever
+                    b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00",
+                )
+            )
+        )
+
+    def write(self, frame: bytes) -> None:
+        """
+        Appends a frame.
+
+        Args:
+            frame: A frame from `encode_frame`.
+        """
+        self.file.write(frame)
+
+    def close(self) -> None:
+        """Ends the file and closes it."""
+        self.file.write(b"\x3b")
+        self.file.close()
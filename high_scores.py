@@ -1,13 +1,73 @@
 """
 This module handles high scores with dates.
+
+Scores are kept either in a JSON file holding the top 5, or in a SQLite
+database holding every run, chosen by `SETTINGS.scores.backend`. Both are cached
+in memory and written to disk by a background thread, so recording a score
+never blocks the game loop.
 """
 
+import atexit
+import heapq
 import json
 import os
+import sqlite3
+import threading
+import time
 from datetime import datetime
 from typing import List, Dict
 
+from config import SETTINGS
+
 SCORES_FILE = "high_scores.json"
+SCORES_DB = "high_scores.db"
+
+ENTRY_KEYS = ("score", "date", "player", "grid_width", "grid_height", "move_interval")
+FILTER_KEYS = ("player", "grid_width", "grid_height", "move_interval")
+
+# How long the writer waits for more changes before writing them together
+WRITE_DELAY = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    player TEXT NOT NULL,
+    grid_width INTEGER NOT NULL,
+    grid_height INTEGER NOT NULL,
+    move_interval INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+CREATE INDEX IF NOT EXISTS scores_by_config ON scores (
+    grid_width, grid_height, move_interval, score DESC
+);
+CREATE INDEX IF NOT EXISTS scores_by_player ON scores (
+    player, grid_width, grid_height, move_interval, score DESC
+);
+
+-- How many runs got each score, so ranks are found without counting rows
+CREATE TABLE IF NOT EXISTS score_counts (
+    grid_width INTEGER NOT NULL,
+    grid_height INTEGER NOT NULL,
+    move_interval INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (grid_width, grid_height, move_interval, player, score)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS score_counts_by_player ON score_counts (player, score);
+CREATE TRIGGER IF NOT EXISTS count_score AFTER INSERT ON scores BEGIN
+    INSERT INTO score_counts
+    VALUES (
+        NEW.grid_width, NEW.grid_height, NEW.move_interval, NEW.player,
+        NEW.score, 1
+    )
+    ON CONFLICT DO UPDATE SET count = count + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
 
 
 def load_high_scores() -> List[Dict[str, any]]:
@@ -31,69 +91,367 @@ def save_high_scores(scores: List[Dict[str, any]]) -> None:
     """
     Saves high scores to file.
 
+    The scores are written to a temporary file which then replaces the old
+    one, so a crash never leaves a half-written file behind.
+
     Args:
         scores: List of score dictionaries to save.
     """
+    tmp_file = f"{SCORES_FILE}.tmp"
     try:
-        with open(SCORES_FILE, "w") as f:
+        with open(tmp_file, "w") as f:
             json.dump(scores, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, SCORES_FILE)
     except Exception as e:
         print(f"Error saving high scores: {e}")
 
 
-def add_score(new_score: int) -> bool:
+def _new_entry(
+    score: int, player: str, grid_width: int, grid_height: int, move_interval: int
+) -> Dict[str, any]:
+    """Creates a score dictionary dated now."""
+    return {
+        "score": score,
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "player": player,
+        "grid_width": grid_width,
+        "grid_height": grid_height,
+        "move_interval": move_interval,
+    }
+
+
+def _insert_top(scores: List[Dict[str, any]], entry: Dict[str, any]) -> bool:
+    """Inserts an entry into a top 5 list, returning whether it made it."""
+    scores.append(entry)
+    # Sort by score (descending) and keep only top 5
+    scores.sort(key=lambda x: x["score"], reverse=True)
+    del scores[5:]
+    return any(e is entry for e in scores)
+
+
+class ScoreStore:
     """
-    Adds a new score to the high scores list if it qualifies.
+    High scores cached in memory and saved by a background writer.
 
-    Args:
-        new_score: The score to potentially add.
+    This base class keeps only the top 5 in `high_scores.json`. Subclasses
+    override `_write` to store the pending entries somewhere else.
+    """
 
-    Returns:
-        True if the score was added to top 5, False otherwise.
+    __slots__ = ("scores", "lock", "write_lock", "pending", "changed", "writer")
+
+    def __init__(self, scores: List[Dict[str, any]] | None = None) -> None:
+        """
+        Initializes a ScoreStore object.
+
+        Args:
+            scores: The top 5 to start with, None to read them from
+                `high_scores.json`.
+        """
+        self.scores = load_high_scores()[:5] if scores is None else scores
+        self.lock = threading.Lock()
+        # Held while writing, so flush() and the writer never interleave
+        self.write_lock = threading.Lock()
+        self.pending: List[Dict[str, any]] = []
+        self.changed = threading.Event()
+        self.writer: threading.Thread | None = None
+
+    def add(
+        self,
+        new_score: int,
+        player: str = "",
+        grid_width: int = 0,
+        grid_height: int = 0,
+        move_interval: int = 0,
+    ) -> bool:
+        """
+        Adds a new score and schedules a write.
+
+        Args:
+            new_score: The score to add.
+            player: The name of the player.
+            grid_width: The width of the grid the game was played on.
+            grid_height: The height of the grid the game was played on.
+            move_interval: The milliseconds between moves of the game.
+
+        Returns:
+            True if the score was added to top 5, False otherwise.
+        """
+        entry = _new_entry(new_score, player, grid_width, grid_height, move_interval)
+        with self.lock:
+            scores = list(self.scores)
+            added = _insert_top(scores, entry)
+            self.scores = scores
+            self.pending.append(entry)
+        self._start_writer()
+        self.changed.set()
+        return added
+
+    def top(self) -> List[Dict[str, any]]:
+        """
+        Gets the top 5 high scores.
+
+        Returns:
+            List of top 5 score dictionaries.
+        """
+        return self.scores[:5]
+
+    def flush(self) -> None:
+        """Writes any pending changes to disk right away."""
+        with self.write_lock:
+            with self.lock:
+                if not self.pending:
+                    return
+                pending = self.pending
+                self.pending = []
+            self._write(pending)
+
+    def _write(self, pending: List[Dict[str, any]]) -> None:
+        """Writes the top 5 to file."""
+        save_high_scores(
+            [{"score": e["score"], "date": e["date"]} for e in self.scores]
+        )
+
+    def _start_writer(self) -> None:
+        """Starts the background writer on first use."""
+        if self.writer is None:
+            self.writer = threading.Thread(
+                target=self._write_loop, name="high-scores-writer", daemon=True
+            )
+            self.writer.start()
+
+    def _write_loop(self) -> None:
+        """Waits for changes and writes them in batches."""
+        while True:
+            self.changed.wait()
+            # Give a burst of changes time to arrive, then write them at once
+            time.sleep(WRITE_DELAY)
+            self.changed.clear()
+            self.flush()
+
+
+class SqliteScoreStore(ScoreStore):
     """
-    scores = load_high_scores()
+    Every run kept in an indexed SQLite database.
 
-    # Add new score with current date
-    new_entry = {"score": new_score, "date": datetime.now().strftime("%Y-%m-%d %H:%M")}
+    The overall top 5 is still cached in memory. Leaderboards can be filtered
+    by player and by game config, and ranks are looked up in a table of
+    score counts that a trigger keeps up to date. `high_scores.json` is
+    imported once when the database is created.
+    """
 
-    scores.append(new_entry)
+    __slots__ = ("db",)
 
-    # Sort by score (descending) and keep only top 5
-    scores.sort(key=lambda x: x["score"], reverse=True)
-    scores = scores[:5]
+    def __init__(self, path: str = SCORES_DB) -> None:
+        """
+        Initializes a SqliteScoreStore object.
+
+        Args:
+            path: The path of the database file.
+        """
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute("PRAGMA cache_size = -65536")
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self._migrate_json()
+        # The JSON file was read once by the migration, and not again
+        super().__init__([])
+        self.scores = self.query_top()
+
+    def _migrate_json(self) -> None:
+        """Imports the scores of the JSON backend the first time."""
+        query = "SELECT 1 FROM meta WHERE key = 'json_migrated'"
+        if self.db.execute(query).fetchone():
+            return
+        self.db.executemany(
+            "INSERT INTO scores (score, date, player, grid_width, grid_height,"
+            " move_interval) VALUES (?, ?, '', 0, 0, 0)",
+            [(e["score"], e["date"]) for e in load_high_scores()],
+        )
+        self.db.execute("INSERT INTO meta VALUES ('json_migrated', '1')")
 
-    save_high_scores(scores)
+    def add_many(self, entries: List[Dict[str, any]]) -> None:
+        """
+        Inserts many finished runs in one transaction.
 
-    # Return True if the new score made it to top 5
-    return any(
-        entry["score"] == new_score and entry["date"] == new_entry["date"]
-        for entry in scores
+        Args:
+            entries: Score dictionaries with 'score' and optionally 'date',
+                'player', 'grid_width', 'grid_height' and 'move_interval'.
+        """
+        defaults = _new_entry(0, "", 0, 0, 0)
+        rows = [defaults | e for e in entries]
+        with self.write_lock:
+            self._write(rows)
+        with self.lock:
+            self.scores = heapq.nlargest(
+                5, self.scores + rows, key=lambda x: x["score"]
+            )
+
+    def _write(self, pending: List[Dict[str, any]]) -> None:
+        """Inserts the pending runs."""
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO scores (score, date, player, grid_width, grid_height,"
+                " move_interval) VALUES (:score, :date, :player, :grid_width,"
+                " :grid_height, :move_interval)",
+                pending,
+            )
+
+    def query_top(self, limit: int = 5, **filters: any) -> List[Dict[str, any]]:
+        """
+        Gets the best runs.
+
+        Args:
+            limit: The number of runs to return.
+            **filters: Any of player, grid_width, grid_height and
+                move_interval to only consider matching runs.
+
+        Returns:
+            List of score dictionaries, best first.
+        """
+        self.flush()
+        where, params = _where(filters)
+        with self.write_lock:
+            rows = self.db.execute(
+                f"SELECT {', '.join(ENTRY_KEYS)} FROM scores {where}"
+                " ORDER BY score DESC, id LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(zip(ENTRY_KEYS, row)) for row in rows]
+
+    def rank(self, score: int, **filters: any) -> int:
+        """
+        Gets the leaderboard position a score would have.
+
+        Args:
+            score: The score to rank.
+            **filters: Any of player, grid_width, grid_height and
+                move_interval to only consider matching runs.
+
+        Returns:
+            1 plus the number of runs with a higher score.
+        """
+        self.flush()
+        where, params = _where(filters)
+        where = f"{where} AND score > ?" if where else "WHERE score > ?"
+        with self.write_lock:
+            (higher,) = self.db.execute(
+                f"SELECT COALESCE(SUM(count), 0) FROM score_counts {where}",
+                (*params, score),
+            ).fetchone()
+        return higher + 1
+
+
+def _where(filters: Dict[str, any]) -> tuple[str, tuple]:
+    """Builds the WHERE clause of a leaderboard query."""
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise TypeError(f"Unknown leaderboard filters: {sorted(unknown)}")
+    used = [c for c in FILTER_KEYS if filters.get(c) is not None]
+    if not used:
+        return "", ()
+    return "WHERE " + " AND ".join(f"{c} = ?" for c in used), tuple(
+        filters[c] for c in used
     )
 
 
-def get_top_scores() -> List[Dict[str, any]]:
+_store: ScoreStore | None = None
+
+
+def get_store() -> ScoreStore:
+    """
+    Gets the shared score store, loading it on first use.
+
+    Returns:
+        The score store.
+    """
+    global _store
+    if _store is None:
+        if SETTINGS.scores.backend == "sqlite":
+            _store = SqliteScoreStore()
+        else:
+            _store = ScoreStore()
+        atexit.register(_store.flush)
+    return _store
+
+
+def add_score(
+    new_score: int,
+    player: str = "",
+    grid_width: int = 0,
+    grid_height: int = 0,
+    move_interval: int = 0,
+) -> bool:
+    """
+    Adds a new score to the high scores.
+
+    Args:
+        new_score: The score to add.
+        player: The name of the player.
+        grid_width: The width of the grid the game was played on.
+        grid_height: The height of the grid the game was played on.
+        move_interval: The milliseconds between moves of the game.
+
+    Returns:
+        True if the score was added to top 5, False otherwise.
+    """
+    return get_store().add(new_score, player, grid_width, grid_height, move_interval)
+
+
+def get_top_scores(limit: int = 5, **filters: any) -> List[Dict[str, any]]:
     """
-    Gets the top 5 high scores.
+    Gets the top high scores.
+
+    Args:
+        limit: The number of scores to return.
+        **filters: Any of player, grid_width, grid_height and move_interval.
+            Only the SQLite backend supports filters and limits above 5.
 
     Returns:
-        List of top 5 score dictionaries.
+        List of the top score dictionaries.
     """
-    return load_high_scores()[:5]
+    store = get_store()
+    if (filters or limit > 5) and isinstance(store, SqliteScoreStore):
+        return store.query_top(limit, **filters)
+    return store.top()[:limit]
 
 
-def get_best_score() -> int:
+def get_best_score(**filters: any) -> int:
     """
     Gets the highest score.
 
+    Args:
+        **filters: Any of player, grid_width, grid_height and move_interval.
+
     Returns:
         The highest score, or 0 if no scores exist.
     """
-    scores = load_high_scores()
+    scores = get_top_scores(1, **filters)
     if not scores:
         return 0
     return scores[0]["score"]
 
 
+def get_rank(score: int, **filters: any) -> int:
+    """
+    Gets the leaderboard position a score would have.
+
+    Args:
+        score: The score to rank.
+        **filters: Any of player, grid_width, grid_height and move_interval.
+
+    Returns:
+        1 plus the number of higher scores.
+    """
+    store = get_store()
+    if isinstance(store, SqliteScoreStore):
+        return store.rank(score, **filters)
+    return 1 + sum(entry["score"] > score for entry in store.top())
+
+
 def format_scores_for_display() -> List[str]:
     """
     Formats scores for display in the menu.
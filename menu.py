@@ -3,20 +3,51 @@ author: whoiam1101
 This module creates the main menu for the game.
 """
 
+from collections.abc import Callable
+
 import pygame
 import pygame_menu
 
 from colors import SCORE_TEXT_COLOR
-from config import CONF
+from config import SETTINGS
 from theme import theme
 from quit import quit
-from game import game
 from high_scores import get_best_score, format_scores_for_display
 
 
-def menu(screen: pygame.Surface) -> None:
+# The number of high score lines the menu has room for
+SHOWN_SCORES = 5
+
+
+def play(
+    screen: pygame.Surface, on_return: Callable[[], None], arena: bool = False
+) -> None:
     """
-    Creates and displays the main menu.
+    Starts a game, importing the game modules on first use.
+
+    Args:
+        screen: The pygame surface to draw on.
+        on_return: Called when the game returns to the menu.
+        arena: Play on the shared board with the bots instead.
+    """
+    from game import arena_game, game
+
+    if arena:
+        arena_game(screen)
+    else:
+        game(screen)
+    on_return()
+
+
+def build_menu(screen: pygame.Surface) -> pygame_menu.Menu:
+    """
+    Creates the main menu.
+
+    Args:
+        screen: The pygame surface the menu is drawn on.
+
+    Returns:
+        The menu, ready for its main loop.
     """
     screen_width, screen_height = screen.get_size()
 
@@ -24,14 +55,11 @@ def menu(screen: pygame.Surface) -> None:
         "Snake", width=screen_width, height=screen_height, theme=theme
     )
 
-    # Get high scores from the new system
-    best_score = get_best_score()
-    best_score_text = f"Best score: {best_score}"
-    best_score_text_size = CONF.game.cell_size * 2
-    cell_size = CONF.game.cell_size
+    best_score_text_size = SETTINGS.game.cell_size * 2
+    cell_size = SETTINGS.game.cell_size
 
-    menu_menu.add.label(
-        best_score_text,
+    best_score_label = menu_menu.add.label(
+        "Best score: 0",
         font_size=best_score_text_size,
         font_color=SCORE_TEXT_COLOR,
         margin=(0, cell_size),
@@ -46,14 +74,28 @@ def menu(screen: pygame.Surface) -> None:
     )
 
     # Display top 5 scores with dates
-    high_scores = format_scores_for_display()
-    for score_line in high_scores:
+    score_labels = [
         menu_menu.add.label(
-            score_line,
+            "",
             font_size=cell_size // 2,
             font_color=SCORE_TEXT_COLOR,
             margin=(0, 2),
         )
+        for _ in range(SHOWN_SCORES)
+    ]
+
+    def show_scores() -> None:
+        # Update the labels in place rather than building the menu again
+        best_score_label.set_title(f"Best score: {get_best_score()}")
+        lines = format_scores_for_display()
+        for i, label in enumerate(score_labels):
+            if i < len(lines):
+                label.set_title(lines[i])
+                label.show()
+            else:
+                label.hide()
+
+    show_scores()
 
     # Add instructions
     instructions = "Use ARROW KEYS or WASD to move. Press ESC to return to menu."
@@ -64,7 +106,15 @@ def menu(screen: pygame.Surface) -> None:
         margin=(0, cell_size // 2),
     )
 
-    menu_menu.add.button("Play", lambda: game(screen))
+    menu_menu.add.button("Play", lambda: play(screen, show_scores))
+    menu_menu.add.button("Arena", lambda: play(screen, show_scores, arena=True))
     menu_menu.add.button("Quit", quit)
 
-    menu_menu.mainloop(screen)
+    return menu_menu
+
+
+def menu(screen: pygame.Surface) -> None:
+    """
+    Creates and displays the main menu.
+    """
+    build_menu(screen).mainloop(screen)
@@ -0,0 +1,120 @@
+"""
+This module runs batches of headless work in a process pool and writes
+their results.
+
+Work is split into batches, and only a few batches per worker are queued at
+a time, so a run of millions of items takes memory for the batches in
+flight and not for all of them. Results come back in the order the batches
+finish, to be appended to a JSONL or CSV file by `ResultWriter` as soon as
+they arrive.
+"""
+
+import csv
+import json
+import os
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+def batches(items: list[T], size: int) -> Iterator[list[T]]:
+    """Splits items into batches of the given size."""
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def run_batches(
+    function: Callable[..., Any],
+    tasks: Iterable[list[T]],
+    workers: int,
+    *args: Any,
+) -> Iterator[tuple[list[T], Future]]:
+    """
+    Calls a function on every batch in a process pool.
+
+    A worker that dies breaks the whole pool, so the batches after it are
+    run in a new one, and only the batches that were in flight fail.
+
+    Args:
+        function: The function, called with a batch and then args. It must
+            be importable by the workers.
+        tasks: The batches.
+        workers: The number of worker processes.
+        *args: More arguments for every call.
+
+    Yields:
+        Every batch with its finished future, as they finish.
+    """
+    tasks = iter(tasks)
+    pool = ProcessPoolExecutor(workers)
+    pending: dict[Future, list[T]] = {}
+
+    def submit() -> bool:
+        nonlocal pool
+        batch = next(tasks, None)
+        if batch is None:
+            return False
+        try:
+            future = pool.submit(function, batch, *args)
+        except BrokenProcessPool:
+            pool.shutdown()
+            pool = ProcessPoolExecutor(workers)
+            future = pool.submit(function, batch, *args)
+        pending[future] = batch
+        return True
+
+    try:
+        # Keep a few tasks queued per worker instead of submitting them all
+        for _ in range(2 * workers):
+            if not submit():
+                break
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield pending.pop(future), future
+                submit()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+class ResultWriter:
+    """Appends results to a JSONL or CSV file."""
+
+    __slots__ = ("file", "csv")
+
+    def __init__(self, path: str, fields: tuple[str, ...]) -> None:
+        """
+        Initializes a ResultWriter object.
+
+        Args:
+            path: The file to append to. Files ending in .csv get CSV with a
+                header, anything else gets one JSON object per line.
+            fields: The keys of the results, in the order of the CSV columns.
+        """
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.DictWriter(self.file, fields)
+            if new:
+                self.csv.writeheader()
+
+    def write(self, results: list[dict[str, int | str | None]]) -> None:
+        """
+        Writes results and flushes them to disk.
+
+        Args:
+            results: The results to write.
+        """
+        if self.csv is not None:
+            self.csv.writerows(results)
+        else:
+            self.file.writelines(json.dumps(r) + "\n" for r in results)
+        self.file.flush()
+
+    def close(self) -> None:
+        """Closes the file."""
+        self.file.close()
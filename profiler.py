@@ -0,0 +1,172 @@
+"""
+This module measures where the time of each frame goes.
+
+The game loop marks the end of each phase of a frame, and the durations are
+kept in a preallocated ring buffer. The profiler can draw a small overlay
+with frame time percentiles and dropped frames, and dump the buffer as a
+CSV or JSON trace.
+"""
+
+import json
+from array import array
+from time import perf_counter
+
+from pygame import Color, Rect, Surface
+
+from assets import ASSETS
+
+OVERLAY_TEXT_COLOR = Color(255, 255, 0)
+OVERLAY_BACKGROUND_COLOR = Color(0, 0, 0)
+
+# How often the overlay text is refreshed, in seconds
+OVERLAY_REFRESH = 0.5
+
+# A frame counts as dropped when it takes this many times the target
+DROPPED_FRAME_FACTOR = 1.5
+
+
+class FrameProfiler:
+    """Per-phase frame timings in a fixed-size ring buffer."""
+
+    __slots__ = (
+        "phases",
+        "capacity",
+        "target",
+        "times",
+        "count",
+        "frame_start",
+        "last",
+        "overlay",
+        "overlay_time",
+    )
+
+    def __init__(self, phases: tuple[str, ...], capacity: int, fps: int) -> None:
+        """
+        Initializes a FrameProfiler object.
+
+        Args:
+            phases: The names of the phases of a frame, in order.
+            capacity: The number of frames to keep.
+            fps: The target frame rate.
+        """
+        self.phases = phases
+        self.capacity = capacity
+        self.target = 1 / fps
+        # Each frame is a row of the phase durations followed by the time
+        # since the previous frame started
+        self.times = array("d", bytes(8 * capacity * (len(phases) + 1)))
+        self.count = 0
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.overlay: Surface | None = None
+        self.overlay_time = 0.0
+
+    def begin_frame(self) -> None:
+        """Starts timing a new frame."""
+        now = perf_counter()
+        if self.frame_start:
+            row = (self.count % self.capacity) * (len(self.phases) + 1)
+            self.times[row + len(self.phases)] = now - self.frame_start
+            self.count += 1
+        self.frame_start = self.last = now
+
+    def mark(self, phase: int) -> None:
+        """
+        Ends a phase of the current frame.
+
+        Args:
+            phase: The index of the phase in `phases`.
+        """
+        now = perf_counter()
+        row = (self.count % self.capacity) * (len(self.phases) + 1)
+        self.times[row + phase] = now - self.last
+        self.last = now
+
+    def frames(self) -> list[list[float]]:
+        """
+        Gets the finished frames in the buffer, oldest first.
+
+        Returns:
+            A row of phase durations plus the frame time, in seconds, for
+            each frame.
+        """
+        width = len(self.phases) + 1
+        kept = min(self.count, self.capacity)
+        first = self.count - kept
+        rows = []
+        for i in range(first, self.count):
+            start = (i % self.capacity) * width
+            rows.append(list(self.times[start : start + width]))
+        return rows
+
+    def stats(self) -> tuple[float, float, int]:
+        """
+        Summarizes the frame times in the buffer.
+
+        Returns:
+            The median and 99th percentile frame time in milliseconds, and
+            the number of dropped frames.
+        """
+        width = len(self.phases) + 1
+        kept = min(self.count, self.capacity)
+        if kept == 0:
+            return 0.0, 0.0, 0
+        frame_times = sorted(self.times[i * width + width - 1] for i in range(kept))
+        dropped = sum(t > self.target * DROPPED_FRAME_FACTOR for t in frame_times)
+        p50 = frame_times[kept // 2]
+        p99 = frame_times[min(kept - 1, kept * 99 // 100)]
+        return p50 * 1000, p99 * 1000, dropped
+
+    def draw_overlay(self, screen: Surface) -> Rect:
+        """
+        Draws the frame time summary in the top right corner.
+
+        The text is drawn on an opaque box that only ever grows, so drawing
+        it again over itself is harmless.
+
+        Args:
+            screen: The pygame surface to draw on.
+
+        Returns:
+            The area the overlay covers.
+        """
+        now = perf_counter()
+        if self.overlay is None or now - self.overlay_time >= OVERLAY_REFRESH:
+            p50, p99, dropped = self.stats()
+            text = ASSETS.font(None, 20).render(
+                f"p50 {p50:.1f} ms  p99 {p99:.1f} ms  dropped {dropped}",
+                True,
+                OVERLAY_TEXT_COLOR,
+                OVERLAY_BACKGROUND_COLOR,
+            )
+            # Never shrink, so no stale text is left next to the box
+            width = text.get_width()
+            if self.overlay is not None:
+                width = max(width, self.overlay.get_width())
+            self.overlay = Surface((width, text.get_height()))
+            self.overlay.fill(OVERLAY_BACKGROUND_COLOR)
+            self.overlay.blit(text, text.get_rect(topright=(width, 0)))
+            self.overlay_time = now
+        rect = self.overlay.get_rect(topright=(screen.get_width() - 10, 10))
+        screen.blit(self.overlay, rect)
+        return rect
+
+    def dump(self, path: str) -> None:
+        """
+        Writes the frames in the buffer to a file.
+
+        Files ending in .json get a JSON object with the phase names and the
+        frames, anything else gets CSV. Times are in milliseconds.
+
+        Args:
+            path: The path of the file.
+        """
+        columns = list(self.phases) + ["frame"]
+        frames = [[t * 1000 for t in row] for row in self.frames()]
+        with open(path, "w") as f:
+            if path.endswith(".json"):
+                json.dump({"columns": columns, "frames": frames}, f)
+                return
+            f.write(",".join(columns) + "\n")
+            for row in frames:
+                f.write(",".join(f"{t:.4f}" for t in row) + "\n")
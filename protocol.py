@@ -0,0 +1,299 @@
+"""
+This module defines the messages between the multiplayer server and its
+clients.
+
+Every message is a little-endian u32 length followed by a type byte and its
+body. A client sends JOIN with the name of a room, and then TURN whenever
+it pushes a direction. The server answers JOIN with WELCOME, holding the
+whole room once, and then sends one TICK per move with only what changed:
+a byte per snake with its result and direction, the spawn cell of every
+snake that died and started again, and the new cell of every food item that
+was eaten. A snake's new head follows from its direction and its tail is
+dropped unless it ate, so a tick costs the same however long the snakes
+are, and so does applying it.
+"""
+
+import asyncio
+import struct
+from array import array
+from collections import deque
+
+import numpy as np
+
+from engine import DIRECTIONS, MoveResult, Position
+
+JOIN, TURN, WELCOME, TICK, REFUSED = range(5)
+
+LENGTH = struct.Struct("<I")
+# Messages longer than this are a broken or hostile peer
+MAX_MESSAGE = 1 << 24
+MAX_ROOM_NAME = 64
+
+# type, snake index, grid width, grid height, number of snakes, number of
+# food items, move interval, tick
+WELCOME_HEADER = struct.Struct("<BHHHHHHI")
+# type, tick
+TICK_HEADER = struct.Struct("<BI")
+FOOD_COUNT = struct.Struct("<H")
+# A food item that moved, as (slot, cell)
+FOOD_MOVE = np.dtype([("slot", "<u2"), ("cell", "<u4")])
+
+# The results after which a snake starts again on a new cell
+DEATHS = (MoveResult.HIT_TAIL.value, MoveResult.HIT_BORDER.value)
+# The spawn cell of a snake that found no room to start again
+NO_CELL = 0xFFFFFFFF
+
+
+def frame(message: bytes) -> bytes:
+    """Prefixes a message with its length."""
+    return LENGTH.pack(len(message)) + message
+
+
+async def read_message(reader: asyncio.StreamReader) -> bytes:
+    """
+    Reads one message.
+
+    Args:
+        reader: The stream to read from.
+
+    Returns:
+        The message, starting with its type byte.
+
+    Raises:
+        asyncio.IncompleteReadError: If the stream ended.
+        ValueError: If the message is empty or too long.
+    """
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    if not 0 < length <= MAX_MESSAGE:
+        raise ValueError(f"Bad message length {length}")
+    return await reader.readexactly(length)
+
+
+def encode_join(room: str) -> bytes:
+    """Encodes a request to join a room."""
+    name = room.encode()
+    if not 0 < len(name) <= MAX_ROOM_NAME:
+        raise ValueError(f"Room names must be 1 to {MAX_ROOM_NAME} bytes")
+    return bytes((JOIN,)) + name
+
+
+def decode_join(message: bytes) -> str:
+    """
+    Decodes a request to join a room.
+
+    Raises:
+        ValueError: If the message is not a valid JOIN.
+    """
+    if message[0] != JOIN or not 1 < len(message) <= MAX_ROOM_NAME + 1:
+        raise ValueError("Expected JOIN")
+    return message[1:].decode()
+
+
+def encode_turn(code: int) -> bytes:
+    """Encodes a direction code pushed by the player."""
+    return bytes((TURN, code))
+
+
+def decode_turn(message: bytes) -> int:
+    """
+    Decodes a direction code pushed by the player.
+
+    Raises:
+        ValueError: If the message is not a valid TURN.
+    """
+    if len(message) != 2 or message[0] != TURN or message[1] >= len(DIRECTIONS):
+        raise ValueError("Expected TURN")
+    return message[1]
+
+
+def encode_refused(reason: str) -> bytes:
+    """Encodes why the server turned a client away."""
+    return bytes((REFUSED,)) + reason.encode()
+
+
+def encode_welcome(
+    snake: int,
+    grid_width: int,
+    grid_height: int,
+    move_interval: int,
+    tick: int,
+    food: np.ndarray,
+    bodies: list[list[int]],
+) -> bytes:
+    """
+    Encodes the whole state of a room for a client that just joined.
+
+    Args:
+        snake: The index of the snake the client controls.
+        grid_width: The width of the grid.
+        grid_height: The height of the grid.
+        move_interval: The milliseconds between ticks.
+        tick: The number of the last tick.
+        food: The cell of every food item.
+        bodies: The cells of every snake, tail first.
+
+    Returns:
+        The message.
+    """
+    parts = [
+        WELCOME_HEADER.pack(
+            WELCOME,
+            snake,
+            grid_width,
+            grid_height,
+            len(bodies),
+            len(food),
+            move_interval,
+            tick,
+        ),
+        food.astype("<u4").tobytes(),
+    ]
+    for cells in bodies:
+        parts.append(LENGTH.pack(len(cells)))
+        parts.append(array("I", cells).tobytes())
+    return b"".join(parts)
+
+
+def encode_tick(
+    tick: int,
+    results: np.ndarray,
+    directions: np.ndarray,
+    spawns: np.ndarray,
+    food_slots: np.ndarray,
+    food_cells: np.ndarray,
+) -> bytes:
+    """
+    Encodes what changed in a room on one move.
+
+    Args:
+        tick: The number of the tick.
+        results: The MoveResult value of every snake.
+        directions: The direction code every snake moved in.
+        spawns: The new cell of every snake that died, in snake order, or
+            NO_CELL if it could not start again.
+        food_slots: The food items that moved.
+        food_cells: Their new cells.
+
+    Returns:
+        The message.
+    """
+    codes = (results.astype(np.uint8) << 2) | directions.astype(np.uint8)
+    food = np.empty(len(food_slots), FOOD_MOVE)
+    food["slot"] = food_slots
+    food["cell"] = food_cells
+    return b"".join(
+        (
+            TICK_HEADER.pack(TICK, tick),
+            codes.tobytes(),
+            spawns.astype("<u4").tobytes(),
+            FOOD_COUNT.pack(len(food)),
+            food.tobytes(),
+        )
+    )
+
+
+class RoomState:
+    """
+    A client's copy of a room, kept up to date by the server's ticks.
+
+    Every snake is a deque of its cells, tail first, so a tick is applied
+    with a push and a pop per snake, and a copy takes memory for the length
+    of the snakes rather than for the area of the board.
+    """
+
+    __slots__ = (
+        "snake",
+        "grid_width",
+        "grid_height",
+        "move_interval",
+        "tick",
+        "food",
+        "bodies",
+        "results",
+        "vacated",
+    )
+
+    def __init__(self, welcome: bytes) -> None:
+        """
+        Initializes a RoomState object from the server's WELCOME.
+
+        Args:
+            welcome: The message.
+
+        Raises:
+            ValueError: If the message is not a WELCOME.
+        """
+        if welcome[0] == REFUSED:
+            raise ValueError(f"Refused by the server: {welcome[1:].decode()}")
+        if welcome[0] != WELCOME:
+            raise ValueError("Expected WELCOME")
+        (
+            _,
+            self.snake,
+            self.grid_width,
+            self.grid_height,
+            num_snakes,
+            num_food,
+            self.move_interval,
+            self.tick,
+        ) = WELCOME_HEADER.unpack_from(welcome)
+        pos = WELCOME_HEADER.size
+        # The cell of every food item
+        self.food = array("I", welcome[pos : pos + 4 * num_food])
+        pos += 4 * num_food
+
+        # The cells of every snake, as y * grid_width + x from tail to head
+        self.bodies: list[deque[int]] = []
+        for _ in range(num_snakes):
+            (length,) = LENGTH.unpack_from(welcome, pos)
+            pos += LENGTH.size
+            self.bodies.append(deque(array("I", welcome[pos : pos + 4 * length])))
+            pos += 4 * length
+        # The MoveResult value of every snake on the last tick
+        self.results = bytearray(num_snakes)
+        # The cell each snake's tail left on the last tick
+        self.vacated: list[Position | None] = [None] * num_snakes
+
+    def apply(self, message: bytes) -> None:
+        """
+        Applies a TICK.
+
+        Args:
+            message: The message.
+
+        Raises:
+            ValueError: If the message is not the next TICK.
+        """
+        kind, tick = TICK_HEADER.unpack_from(message)
+        if kind != TICK or tick != self.tick + 1:
+            raise ValueError(f"Expected TICK {self.tick + 1}")
+        self.tick = tick
+        width = self.grid_width
+        pos = TICK_HEADER.size
+        codes = message[pos : pos + len(self.bodies)]
+        pos += len(self.bodies)
+        results = self.results
+        vacated = self.vacated
+        for snake, code in enumerate(codes):
+            body = self.bodies[snake]
+            result = results[snake] = code >> 2
+            if result in DEATHS:
+                (cell,) = LENGTH.unpack_from(message, pos)
+                pos += LENGTH.size
+                body.clear()
+                if cell != NO_CELL:
+                    body.append(cell)
+                vacated[snake] = None
+                continue
+            dx, dy = DIRECTIONS[code & 3]
+            head = body[-1] + dy * width + dx
+            vacated[snake] = None
+            if result != MoveResult.ATE_FOOD.value:
+                tail = body.popleft()
+                vacated[snake] = (tail % width, tail // width)
+            body.append(head)
+
+        (count,) = FOOD_COUNT.unpack_from(message, pos)
+        pos += FOOD_COUNT.size
+        for slot, cell in np.frombuffer(message, FOOD_MOVE, count, pos).tolist():
+            self.food[slot] = cell
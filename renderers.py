@@ -0,0 +1,520 @@
+"""
+This module contains alternative ways of rendering a Snake game.
+"""
+
+import numpy as np
+from pygame import BLEND_RGBA_ADD, BLEND_RGBA_MULT, SRCALPHA, Color, Rect, Surface
+from pygame.surfarray import blit_array, pixels_alpha
+from pygame.transform import scale
+
+from arena import ALIVE, EMPTY, FOOD, Arena
+from camera import Camera
+from colors import BOT_COLOR, OUTSIDE_COLOR
+from engine import MoveResult
+from snake import (
+    CELL_MAX_PROGRESS,
+    DEAD_COLOR,
+    FOOD_C1,
+    HEAD_C1,
+    PHASE_STEPS,
+    SNAKE_C1,
+    SPRITE_COLORS,
+    Snake,
+    color_calc,
+)
+
+# Rows of the GridRenderer color table
+GRID_KINDS = ("body", "head")
+
+_grid_renderer: "GridRenderer | None" = None
+
+
+class DirtyRenderer:
+    """
+    Redraws only the grid cells that changed since the last frame.
+
+    The head slides into its new cell and the tail slides out of the cell it
+    vacated, while the rest of the body is drawn snapped to the grid, so a
+    move only touches a handful of cells. Cells are also redrawn when their
+    pulse sprite changes, and everything when the camera scrolls or the
+    game is rewound. Use
+    `pygame.display.update` with the returned rects instead of a full flip.
+    """
+
+    __slots__ = (
+        "screen",
+        "background",
+        "drawn",
+        "regions",
+        "food",
+        "score_text",
+        "score_pos",
+        "was_dead",
+        "moves",
+    )
+
+    def __init__(
+        self, screen: Surface, background: Color, score_pos: tuple[int, int]
+    ) -> None:
+        """
+        Initializes a DirtyRenderer object.
+
+        Args:
+            screen: The pygame surface to draw on.
+            background: The color of the empty screen.
+            score_pos: Where the score text is drawn.
+        """
+        self.screen = screen
+        self.background = background
+        self.score_pos = score_pos
+        # The sprite currently on screen at each snapped body cell
+        self.drawn: dict[int, Surface] = {}
+        # The cells touched by the sliding cells of the last frame
+        self.regions: set[int] = set()
+        self.food: tuple[int, Surface] | None = None
+        self.score_text: Surface | None = None
+        self.was_dead: bool | None = None
+        # The moves of the game in the last frame
+        self.moves = 0
+
+    def draw(self, snake: Snake, score_text: Surface) -> list[Rect]:
+        """
+        Draws the changes since the last frame.
+
+        Args:
+            snake: The snake to draw.
+            score_text: The rendered score. Pass the same surface while the
+                score is unchanged.
+
+        Returns:
+            The screen areas that were redrawn.
+        """
+        camera = snake.camera
+        isdead = snake.is_dead()
+        moves = snake.engine.moves
+        if (
+            camera.follow(*snake.engine.head)
+            or isdead != self.was_dead
+            or moves < self.moves
+        ):
+            # The view scrolled, the snake died or was reset, or the game
+            # went back, so every cell changes at once
+            self.was_dead = isdead
+            self.moves = moves
+            return self._draw_full(snake, score_text)
+        self.moves = moves
+
+        cell_size = snake.cell_size
+        width = snake.grid_width
+        engine = snake.engine
+        body = engine.body
+        head = len(body) - 1
+        tail = engine.vacated or body.tail
+
+        dirty = self.regions
+        regions: set[int] = set()
+        snapped: dict[int, Surface] = {}
+        sliders: list[tuple[Surface, int, int, int, int]] = []
+
+        for i, (x, y), sprite in snake.visible_sprites():
+            index = y * width + x
+            if 0 < i < head:
+                snapped[index] = sprite
+                if self.drawn.get(index) is not sprite:
+                    dirty.add(index)
+            else:
+                px, py = body[i - 1] if i > 0 else tail
+                sliders.append((sprite, px, py, x, y))
+                regions.add(py * width + px)
+                regions.add(index)
+        dirty |= regions
+
+        food = snake.food
+        food_state = None
+        if food is not None:
+            food_state = (food.y * width + food.x, food.sprite(cell_size))
+        if food_state != self.food:
+            if self.food is not None:
+                dirty.add(self.food[0])
+            if food_state is not None:
+                dirty.add(food_state[0])
+            self.food = food_state
+
+        score_cells = self._cells_under(score_text, snake)
+        if score_text is not self.score_text:
+            if self.score_text is not None:
+                dirty |= self._cells_under(self.score_text, snake)
+            self.score_text = score_text
+            dirty |= score_cells
+        elif not dirty.isdisjoint(score_cells):
+            # Redraw the cells under the text so it is not blended twice
+            dirty |= score_cells
+
+        screen = self.screen
+        background = self.background
+        left, top = camera.x, camera.y
+        rects = []
+        blits = []
+        for index in dirty:
+            y, x = divmod(index, width)
+            cell_rect = Rect(
+                x * cell_size - left, y * cell_size - top, cell_size, cell_size
+            )
+            screen.fill(background, cell_rect)
+            rects.append(cell_rect)
+            self.drawn.pop(index, None)
+            if food_state is not None and food_state[0] == index:
+                blits.append((food_state[1], cell_rect.topleft))
+            sprite = snapped.get(index)
+            if sprite is not None:
+                self.drawn[index] = sprite
+                blits.append((sprite, cell_rect.topleft))
+
+        progress = 1 if isdead else snake.progress
+        for sprite, fromx, fromy, x, y in sliders:
+            dest = (
+                ((x - fromx) * progress + fromx) * cell_size - left,
+                ((y - fromy) * progress + fromy) * cell_size - top,
+            )
+            blits.append((sprite, dest))
+
+        if not dirty.isdisjoint(score_cells):
+            blits.append((score_text, self.score_pos))
+        screen.blits(blits, doreturn=False)
+
+        self.regions = regions
+        return rects
+
+    def _draw_full(self, snake: Snake, score_text: Surface) -> list[Rect]:
+        """Redraws the whole screen and forgets what was on it."""
+        snake.clear(self.background)
+        snake.draw()
+        self.screen.blit(score_text, self.score_pos)
+
+        width = snake.grid_width
+        self.drawn.clear()
+        self.regions = set(y * width + x for _, (x, y), _ in snake.visible_sprites())
+        if snake.engine.vacated is not None:
+            x, y = snake.engine.vacated
+            self.regions.add(y * width + x)
+        food = snake.food
+        self.food = None
+        if food is not None:
+            self.regions.add(food.y * width + food.x)
+        self.score_text = score_text
+        return [self.screen.get_rect()]
+
+    def _cells_under(self, text: Surface, snake: Snake) -> set[int]:
+        """Gets the grid cells covered by a text surface at the score position."""
+        camera = snake.camera
+        cell_size = snake.cell_size
+        width = snake.grid_width
+        x, y = self.score_pos
+        x += camera.x
+        y += camera.y
+        w, h = text.get_size()
+        return {
+            cy * width + cx
+            for cy in range(
+                max(y // cell_size, 0),
+                min((y + h - 1) // cell_size + 1, snake.grid_height),
+            )
+            for cx in range(
+                max(x // cell_size, 0), min((x + w - 1) // cell_size + 1, width)
+            )
+        }
+
+
+class GridRenderer:
+    """
+    Renders the part of the board on screen from a color array.
+
+    Every frame the colors of a block of cells covering the camera's view
+    are written into a `rows x columns` array, copied onto a
+    one-pixel-per-cell surface, scaled up with one call and covered with a
+    pre-rendered bevel overlay. The snake's cells in the block are found in
+    its occupancy grid, so the cost depends on the size of the screen, not
+    on the size of the board or the length of the snake. Cells are drawn
+    snapped to the grid, and the food is drawn on top as a sprite.
+    """
+
+    __slots__ = (
+        "background",
+        "cell_size",
+        "columns",
+        "rows",
+        "colors",
+        "occupied",
+        "table",
+        "small",
+        "small_mask",
+        "board",
+        "mask",
+        "overlay",
+        "bevel",
+        "dead_bevel",
+    )
+
+    def __init__(
+        self, columns: int, rows: int, cell_size: int, background: Color
+    ) -> None:
+        """
+        Initializes a GridRenderer object.
+
+        Args:
+            columns: The width of the block of cells drawn, from
+                `Camera.span`.
+            rows: The height of the block of cells drawn.
+            cell_size: The size of the cells.
+            background: The color of the empty cells.
+        """
+        self.background = background
+        self.cell_size = cell_size
+        self.columns = columns
+        self.rows = rows
+        self.colors = np.zeros((rows * columns, 3), np.uint8)
+        self.occupied = np.zeros(rows * columns, np.uint8)
+
+        # The base color of every kind at every quantized pulse phase
+        self.table = np.array(
+            [
+                [
+                    tuple(color_calc(*SPRITE_COLORS[kind][0], q / PHASE_STEPS))[:3]
+                    for q in range(PHASE_STEPS + 1)
+                ]
+                for kind in GRID_KINDS
+            ],
+            np.uint8,
+        )
+
+        size = (columns * cell_size, rows * cell_size)
+        self.small = Surface((columns, rows))
+        self.small_mask = Surface((columns, rows), SRCALPHA)
+        self.small_mask.fill((255, 255, 255, 0))
+        self.board = Surface(size)
+        self.mask = Surface(size, SRCALPHA)
+        self.overlay = Surface(size, SRCALPHA)
+        # Blending white and black over a color is the same as the lerps the
+        # sprites use for their highlights and shadows
+        self.bevel = self._tile_bevel(size, 0.3, 0.4)
+        self.dead_bevel = self._tile_bevel(size, 0.5, 0.5)
+
+    def _tile_bevel(
+        self, size: tuple[int, int], highlight: float, shadow: float
+    ) -> Surface:
+        """Renders the bevel of every cell onto a transparent surface."""
+        cell_size = self.cell_size
+        border = 2
+        tile = Surface((cell_size, cell_size), SRCALPHA)
+        white = (255, 255, 255, round(highlight * 255))
+        black = (0, 0, 0, round(shadow * 255))
+        tile.fill(white, Rect(0, 0, cell_size - border, border))  # top
+        tile.fill(white, Rect(0, 0, border, cell_size - border))  # left
+        tile.fill(
+            black, Rect(border, cell_size - border, cell_size - border, border)
+        )  # bottom
+        tile.fill(black, Rect(cell_size - border, 0, border, cell_size))  # right
+
+        bevel = Surface(size, SRCALPHA)
+        bevel.blits(
+            [
+                (tile, (x * cell_size, y * cell_size))
+                for y in range(self.rows)
+                for x in range(self.columns)
+            ],
+            doreturn=False,
+        )
+        return bevel
+
+    def draw(self, snake: Snake) -> None:
+        """
+        Draws the snake and food onto the snake's screen, around its camera.
+
+        Args:
+            snake: The snake to draw.
+        """
+        colors = self.colors
+        occupied = self.occupied
+        colors[:] = tuple(self.background)[:3]
+        occupied[:] = 0
+
+        camera = snake.camera
+        columns, rows = self.columns, self.rows
+        left, top = camera.window(columns, rows)
+        body = snake.engine.body
+        width = body.grid_width
+        grid = np.frombuffer(body.occupied, np.uint8).reshape(-1, width)
+        ys, xs = grid[top : top + rows, left : left + columns].nonzero()
+        cells = ys * columns + xs
+        capacity = len(body.ring)
+        where = np.frombuffer(body.where, np.int32)
+        indices = (where[(ys + top) * width + xs + left] - body.start) % capacity
+
+        isdead = snake.is_dead() and snake.engine.outcome != MoveResult.WON
+        if isdead:
+            colors[cells] = tuple(Color(DEAD_COLOR))[:3]
+        else:
+            pulses = snake.pulses
+            offsets = np.frombuffer(pulses.offsets, np.float32)
+            offsets = offsets[(pulses.start + indices) % capacity]
+            phases = self._phases(snake.clock - offsets, CELL_MAX_PROGRESS)
+            heads = indices == len(body) - 1
+            colors[cells] = self.table[heads.astype(np.intp), phases]
+        occupied[cells] = 255
+
+        shape = (rows, columns)
+        blit_array(self.small, colors.reshape(*shape, 3).transpose(1, 0, 2))
+        alpha = pixels_alpha(self.small_mask)
+        alpha[:] = occupied.reshape(shape).T
+        del alpha
+
+        scale(self.small, self.board.get_size(), self.board)
+        scale(self.small_mask, self.mask.get_size(), self.mask)
+        self.overlay.fill((0, 0, 0, 0))
+        self.overlay.blit(
+            self.dead_bevel if isdead else self.bevel,
+            (0, 0),
+            special_flags=BLEND_RGBA_ADD,
+        )
+        # Keep the bevel only on the cells that are not empty
+        self.overlay.blit(self.mask, (0, 0), special_flags=BLEND_RGBA_MULT)
+        self.board.blit(self.overlay, (0, 0))
+        cell_size = self.cell_size
+        origin = (camera.x, camera.y)
+        snake.screen.blit(
+            self.board, (left * cell_size - origin[0], top * cell_size - origin[1])
+        )
+
+        food = snake.food
+        if food is not None:
+            food.draw(snake.progress, snake.screen, cell_size, origin)
+
+    @staticmethod
+    def _phases(progress: np.ndarray, max_progress: float) -> np.ndarray:
+        """Quantizes animation progress the same way as the sprite cache."""
+        percent = progress % max_progress / max_progress * 2
+        percent = np.where(percent > 1, 2 - percent, percent)
+        return (percent * PHASE_STEPS).astype(np.intp)
+
+
+class ArenaRenderer:
+    """
+    Renders the part of an arena board around the player.
+
+    Every cell is one color looked up from its owner in `Arena.cells`, for
+    the block of cells covering the camera's view only, so the cost depends
+    on the size of the screen and not on the size of the board. The board
+    only changes when the arena moves, so it is redrawn by `update` and
+    just blitted by `draw` in between.
+    """
+
+    __slots__ = ("camera", "palette", "player", "small", "board", "left", "top")
+
+    def __init__(
+        self,
+        arena: Arena,
+        player: int,
+        cell_size: int,
+        view_size: tuple[int, int],
+        background: Color,
+    ) -> None:
+        """
+        Initializes an ArenaRenderer object.
+
+        Args:
+            arena: The arena to draw.
+            player: The index of the snake drawn in the player's colors and
+                followed by the camera.
+            cell_size: The size of the cells.
+            view_size: The size of the screen in pixels.
+            background: The color of the empty cells.
+        """
+        self.player = player
+        self.camera = Camera(arena.grid_width, arena.grid_height, cell_size, view_size)
+        # A color per value of `Arena.cells`, shifted so FOOD is the first row
+        self.palette = np.empty((arena.num_snakes - FOOD, 3), np.uint8)
+        self.palette[:] = tuple(BOT_COLOR)[:3]
+        self.palette[FOOD - FOOD] = tuple(FOOD_C1)[:3]
+        self.palette[EMPTY - FOOD] = tuple(background)[:3]
+        self.palette[player - FOOD] = tuple(SNAKE_C1)[:3]
+
+        columns, rows = self.camera.span()
+        self.small = Surface((columns, rows))
+        self.board = Surface((columns * cell_size, rows * cell_size))
+        self.left = 0
+        self.top = 0
+
+    def update(self, arena: Arena) -> None:
+        """
+        Redraws the board after the arena moved.
+
+        Args:
+            arena: The arena to draw.
+        """
+        camera = self.camera
+        head = arena.heads[self.player]
+        width = arena.grid_width
+        if arena.outcomes[self.player] == ALIVE:
+            camera.follow(head % width, head // width)
+        columns, rows = self.small.get_size()
+        left, top = camera.window(columns, rows)
+        cells = arena.cells.reshape(-1, width)[top : top + rows, left : left + columns]
+        colors = self.palette.take(cells - FOOD, axis=0)
+        if arena.outcomes[self.player] == ALIVE:
+            y, x = divmod(head, width)
+            if left <= x < left + columns and top <= y < top + rows:
+                colors[y - top, x - left] = tuple(HEAD_C1)[:3]
+        blit_array(self.small, colors.transpose(1, 0, 2))
+        scale(self.small, self.board.get_size(), self.board)
+        self.left = left
+        self.top = top
+
+    def draw(self, screen: Surface) -> None:
+        """
+        Draws the board on the screen.
+
+        Args:
+            screen: The surface to draw on.
+        """
+        camera = self.camera
+        board = camera.board_rect()
+        if not board.contains(screen.get_rect()):
+            screen.fill(OUTSIDE_COLOR)
+        cell_size = camera.cell_size
+        screen.blit(
+            self.board,
+            (self.left * cell_size - camera.x, self.top * cell_size - camera.y),
+        )
+
+
+def get_grid_renderer(
+    columns: int, rows: int, cell_size: int, background: Color
+) -> GridRenderer:
+    """
+    Gets a GridRenderer, reusing the last one if it has the same layout.
+
+    Building one renders bevel overlays the size of the screen, which a new
+    game on the same screen can skip. The renderer keeps no state between
+    frames, so sharing it is safe.
+
+    Args:
+        columns: The width of the block of cells drawn.
+        rows: The height of the block of cells drawn.
+        cell_size: The size of the cells.
+        background: The color of the empty cells.
+
+    Returns:
+        The renderer.
+    """
+    global _grid_renderer
+    board = _grid_renderer
+    if (
+        board is None
+        or board.columns != columns
+        or board.rows != rows
+        or board.cell_size != cell_size
+        or board.background != background
+    ):
+        board = GridRenderer(columns, rows, cell_size, background)
+        _grid_renderer = board
+    return board
@@ -0,0 +1,324 @@
+"""
+This module records and plays back games.
+
+A replay holds the seed and config of a game plus every direction the
+player pushed, keyed by move index. Since the engine is deterministic that
+is enough to play the game out again, either headless as fast as possible
+or rendered at normal speed.
+
+Usage:
+    python replay.py <file> [--headless]
+"""
+
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from itertools import islice
+from operator import itemgetter
+
+from engine import DIRECTIONS, NO_OUTCOME, SEED_MASK, Direction, Engine, MoveResult
+
+MAGIC = b"SNKR"
+VERSION = 1
+
+# magic, version, seed, grid_width, grid_height, move_interval, moves,
+# score, outcome, number of events
+HEADER = struct.Struct("<4sBQHHHIIBI")
+
+# Events store direction codes in two bits
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+
+class Replay:
+    """A recorded game."""
+
+    __slots__ = (
+        "seed",
+        "grid_width",
+        "grid_height",
+        "move_interval",
+        "moves",
+        "score",
+        "outcome",
+        "events",
+    )
+
+    def __init__(
+        self,
+        seed: int,
+        grid_width: int,
+        grid_height: int,
+        move_interval: int,
+        moves: int,
+        score: int,
+        outcome: MoveResult | None,
+        events: list[tuple[int, Direction]],
+    ) -> None:
+        """
+        Initializes a Replay object.
+
+        Args:
+            seed: The seed of the game, taken modulo 2**64 like `Engine`
+                does.
+            grid_width: The width of the grid.
+            grid_height: The height of the grid.
+            move_interval: The milliseconds between moves.
+            moves: The number of moves the game lasted.
+            score: The final score.
+            outcome: How the game ended, None if it was abandoned.
+            events: The pushed directions as (move index, direction).
+        """
+        self.seed = seed & SEED_MASK
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.move_interval = move_interval
+        self.moves = moves
+        self.score = score
+        self.outcome = outcome
+        self.events = events
+
+    @classmethod
+    def from_engine(cls, engine: Engine, move_interval: int) -> "Replay":
+        """
+        Records the game an engine has played so far.
+
+        Args:
+            engine: The engine to record.
+            move_interval: The milliseconds between moves.
+
+        Returns:
+            A new Replay object.
+        """
+        return cls(
+            engine.seed,
+            engine.grid_width,
+            engine.grid_height,
+            move_interval,
+            engine.moves,
+            engine.score,
+            engine.outcome,
+            list(engine.events),
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Encodes the replay.
+
+        Each event is a varint of the moves since the previous event,
+        shifted left by two, plus the direction code.
+
+        Returns:
+            The encoded replay.
+        """
+        out = bytearray(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.seed,
+                self.grid_width,
+                self.grid_height,
+                self.move_interval,
+                self.moves,
+                self.score,
+                NO_OUTCOME if self.outcome is None else self.outcome.value,
+                len(self.events),
+            )
+        )
+        last = 0
+        for move, direction in self.events:
+            value = (move - last) << 2 | DIRECTION_CODES[direction]
+            last = move
+            while value >= 0x80:
+                out.append(value & 0x7F | 0x80)
+                value >>= 7
+            out.append(value)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Replay":
+        """
+        Decodes a replay.
+
+        Args:
+            data: The encoded replay.
+
+        Returns:
+            A new Replay object.
+
+        Raises:
+            ValueError: If the data is not a replay.
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("Not a replay: too short")
+        (
+            magic,
+            version,
+            seed,
+            grid_width,
+            grid_height,
+            move_interval,
+            moves,
+            score,
+            outcome,
+            count,
+        ) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a replay: bad header")
+
+        events = []
+        move = 0
+        pos = HEADER.size
+        for _ in range(count):
+            value = shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            move += value >> 2
+            events.append((move, DIRECTIONS[value & 3]))
+
+        return cls(
+            seed,
+            grid_width,
+            grid_height,
+            move_interval,
+            moves,
+            score,
+            None if outcome == NO_OUTCOME else MoveResult(outcome),
+            events,
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the replay to a file.
+
+        Args:
+            path: The path of the file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Replay":
+        """
+        Reads a replay from a file.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            A new Replay object.
+        """
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayPlayer:
+    """Feeds the events of a replay into an engine before each move."""
+
+    __slots__ = ("replay", "events", "next_event")
+
+    def __init__(self, replay: Replay, moves: int = 0) -> None:
+        """
+        Initializes a ReplayPlayer object.
+
+        Args:
+            replay: The replay to play.
+            moves: The moves the engine has already played, for a game
+                restored from a snapshot. Their events are skipped.
+        """
+        self.replay = replay
+        start = bisect_left(replay.events, moves, key=itemgetter(0))
+        self.events: Iterator[tuple[int, Direction]] = islice(
+            replay.events, start, None
+        )
+        self.next_event = next(self.events, None)
+
+    def __call__(self, engine: Engine) -> None:
+        """
+        Pushes the directions that were pushed before the engine's next move.
+
+        Args:
+            engine: The engine about to move.
+        """
+        while self.next_event is not None and self.next_event[0] <= engine.moves:
+            engine.push_direction(self.next_event[1])
+            self.next_event = next(self.events, None)
+
+    def finished(self, engine: Engine) -> bool:
+        """
+        Checks if the whole replay has been played.
+
+        Args:
+            engine: The engine playing the replay.
+
+        Returns:
+            True if the game ended or reached the recorded number of moves.
+        """
+        return not engine.alive or engine.moves >= self.replay.moves
+
+
+def simulate(replay: Replay, engine: Engine | None = None) -> Engine:
+    """
+    Plays a replay headless.
+
+    Args:
+        replay: The replay to play.
+        engine: An engine with the replay's grid size to play on, which is
+            reset, or None for a new one.
+
+    Returns:
+        The engine in its final state.
+    """
+    if engine is None:
+        engine = Engine(replay.grid_width, replay.grid_height, replay.seed)
+    else:
+        engine.reset(replay.seed)
+    player = ReplayPlayer(replay)
+    while not player.finished(engine):
+        player(engine)
+        engine.step()
+    return engine
+
+
+def main() -> None:
+    """Plays the replay file given on the command line."""
+    if len(sys.argv) < 2:
+        print("Usage: python replay.py <file> [--headless]")
+        sys.exit(2)
+    replay = Replay.load(sys.argv[1])
+
+    if "--headless" in sys.argv[2:]:
+        start = time.perf_counter()
+        engine = simulate(replay)
+        elapsed = time.perf_counter() - start
+        outcome = engine.outcome.name if engine.outcome else "none"
+        print(
+            f"score {engine.score}, {engine.moves} moves, outcome {outcome}"
+            f" in {elapsed * 1000:.1f} ms"
+            f" ({replay.moves * replay.move_interval / 1000:.1f} s of play)"
+        )
+        return
+
+    import pygame
+
+    from game import game
+
+    pygame.init()
+    pygame.display.set_caption("Snake Replay")
+    screen = pygame.display.set_mode((1200, 900))
+    game(screen, replay)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+This module keeps the recent past of a game so it can be played back.
+
+`RewindBuffer` keeps an `Engine.snapshot` every few moves, in a fixed number
+of slots that are reused oldest first. The states in between are stored as
+their difference from the snapshot before them, which for a deterministic
+engine is only the directions pushed, and those are already in the engine's
+`events`. Going back to a move restores the nearest snapshot before it and
+steps forward from there, which gives back the exact state, random
+generator included, so a rewound game still matches its replay. The memory
+used is fixed by the number of slots, however long the game.
+"""
+
+from collections import deque
+
+from engine import Engine
+
+# The most memory the snapshots of a buffer take by default
+REWIND_MEMORY = 16 << 20
+
+# Bytes allowed per snapshot on top of an empty direction queue, which
+# takes one byte per queued direction
+QUEUE_ROOM = 64
+
+
+class RewindBuffer:
+    """The snapshots of the last moves of a game, oldest first."""
+
+    __slots__ = ("engine", "interval", "snapshots")
+
+    def __init__(
+        self, engine: Engine, moves: int, memory: int = REWIND_MEMORY
+    ) -> None:
+        """
+        Initializes an empty RewindBuffer object.
+
+        Snapshots are taken every move if the memory allows, or further
+        apart on large boards so that the window still fits.
+
+        Args:
+            engine: The game to record, which is rewound in place.
+            moves: How many moves back the game can be rewound.
+            memory: The most bytes the snapshots may take.
+        """
+        self.engine = engine
+        size = len(engine.snapshot()) + QUEUE_ROOM
+        slots = max(min(memory // size, moves + 1), 2)
+        # The newest snapshot is the current move, the others cover the window
+        self.interval = max(-(-moves // (slots - 1)), 1)
+        # (moves, number of events, snapshot)
+        self.snapshots: deque[tuple[int, int, bytes]] = deque(maxlen=slots)
+
+    @property
+    def oldest(self) -> int:
+        """The earliest move the game can be rewound to."""
+        if not self.snapshots:
+            return self.engine.moves
+        return self.snapshots[0][0]
+
+    def clear(self) -> None:
+        """Forgets the past, for a new game."""
+        self.snapshots.clear()
+
+    def record(self) -> None:
+        """Takes a snapshot if one is due, call after every move."""
+        engine = self.engine
+        snapshots = self.snapshots
+        if snapshots and engine.moves < snapshots[-1][0] + self.interval:
+            return
+        snapshots.append((engine.moves, len(engine.events), engine.snapshot()))
+
+    def rewind(self, moves: int) -> None:
+        """
+        Puts the game back as it was after a number of moves.
+
+        Directions pushed after that move are dropped, and so are the
+        snapshots taken after it, since the game goes on from there.
+
+        Args:
+            moves: The move to go back to, at least `oldest`.
+
+        Raises:
+            ValueError: If the move is not between `oldest` and now, or
+                nothing was recorded yet.
+        """
+        engine = self.engine
+        snapshots = self.snapshots
+        if not snapshots or not self.oldest <= moves <= engine.moves:
+            raise ValueError(
+                f"Move {moves} is not between {self.oldest} and {engine.moves}"
+            )
+        while snapshots[-1][0] > moves:
+            snapshots.pop()
+        _, events, snapshot = snapshots[-1]
+        pending = engine.events[events:]
+        engine.restore(snapshot)
+        for move, direction in pending:
+            if move >= moves:
+                break
+            while engine.moves < move:
+                engine.step()
+            engine.push_direction(direction)
+        while engine.moves < moves:
+            engine.step()
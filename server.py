@@ -0,0 +1,421 @@
+"""
+This module runs the authoritative multiplayer server.
+
+Every room is an `Arena` of a fixed number of snakes on a shared board. A
+client that joins a room takes over one of its snakes, and the snakes that
+no client controls are steered by the server's bots. All rooms move together
+at a fixed rate, and every move is sent to the clients of each room as a
+delta-compressed TICK from `protocol`, so the work and the bytes of a tick
+depend on the number of snakes and not on their length.
+
+Usage:
+    python server.py [--host HOST] [--port PORT] [--grid W H] [--snakes N]
+                     [--food N] [--move-interval MS] [--report SECONDS]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from arena import ALIVE, Arena
+from protocol import (
+    DEATHS,
+    NO_CELL,
+    TURN,
+    decode_join,
+    decode_turn,
+    encode_refused,
+    encode_tick,
+    encode_welcome,
+    frame,
+    read_message,
+)
+
+DEFAULT_PORT = 7447
+
+# Clients that fall this many bytes behind are dropped, since the server
+# cannot skip ticks for them
+MAX_BACKLOG = 1 << 20
+
+
+class Client:
+    """A connection to a player, and the directions it pushed."""
+
+    __slots__ = ("writer", "room", "snake", "queue")
+
+    def __init__(self, writer: asyncio.StreamWriter, room: "Room", snake: int) -> None:
+        """
+        Initializes a Client object.
+
+        Args:
+            writer: The stream to the player.
+            room: The room the player joined.
+            snake: The index of the player's snake in the room.
+        """
+        self.writer = writer
+        self.room = room
+        self.snake = snake
+        # Direction codes, one is used per move like `Engine` does
+        self.queue: deque[int] = deque()
+
+
+class Room:
+    """A shared board, the clients playing on it and its traffic."""
+
+    __slots__ = (
+        "name",
+        "arena",
+        "move_interval",
+        "clients",
+        "actions",
+        "tick",
+        "bytes_sent",
+        "step_time",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        grid_width: int,
+        grid_height: int,
+        snakes: int,
+        food: int,
+        move_interval: int,
+    ) -> None:
+        """
+        Initializes a Room object with bots on every snake.
+
+        Args:
+            name: The name clients join the room by.
+            grid_width: The width of the grid.
+            grid_height: The height of the grid.
+            snakes: The number of snakes, and so of players at most.
+            food: The number of food items.
+            move_interval: The milliseconds between moves.
+        """
+        self.name = name
+        self.arena = Arena(grid_width, grid_height, snakes, food)
+        self.move_interval = move_interval
+        self.clients: dict[int, Client] = {}
+        self.actions = np.full(snakes, -1, np.intp)
+        self.tick = 0
+        # Totals since the room was made, for the reports
+        self.bytes_sent = 0
+        self.step_time = 0.0
+
+    def join(self, writer: asyncio.StreamWriter) -> Client | None:
+        """
+        Hands a snake over from the bots to a new client.
+
+        Args:
+            writer: The stream to the client.
+
+        Returns:
+            The client, or None if every snake already has one.
+        """
+        arena = self.arena
+        for snake in range(arena.num_snakes):
+            if snake not in self.clients:
+                break
+        else:
+            return None
+        client = Client(writer, self, snake)
+        self.clients[snake] = client
+        message = encode_welcome(
+            snake,
+            arena.grid_width,
+            arena.grid_height,
+            self.move_interval,
+            self.tick,
+            arena.food_cells,
+            [arena.body(i) for i in range(arena.num_snakes)],
+        )
+        self._send(client, frame(message))
+        return client
+
+    def leave(self, client: Client) -> None:
+        """Hands a client's snake back to the bots."""
+        if self.clients.get(client.snake) is client:
+            del self.clients[client.snake]
+
+    def step(self) -> None:
+        """Moves every snake and sends the changes to every client."""
+        start = time.perf_counter()
+        arena = self.arena
+        actions = self.actions
+        actions[:] = -1
+        for snake, client in self.clients.items():
+            queue = client.queue
+            current = arena.directions[snake]
+            while queue and queue[0] & 1 == current & 1:
+                queue.popleft()
+            if queue:
+                actions[snake] = queue.popleft()
+        bots = np.flatnonzero(actions < 0)
+        actions[bots] = arena.steer(bots)
+
+        food = arena.food_cells.copy()
+        results = arena.step(actions)
+        self.tick += 1
+
+        died = np.flatnonzero(np.isin(results, DEATHS))
+        spawns = np.where(
+            arena.outcomes[died] == ALIVE, arena.heads[died], NO_CELL
+        )
+        moved = np.flatnonzero(arena.food_cells != food)
+        message = frame(
+            encode_tick(
+                self.tick,
+                results,
+                arena.directions,
+                spawns,
+                moved,
+                arena.food_cells[moved],
+            )
+        )
+        for client in list(self.clients.values()):
+            self._send(client, message)
+        self.step_time += time.perf_counter() - start
+
+    def _send(self, client: Client, message: bytes) -> None:
+        """Queues a message for a client, dropping clients that fell behind."""
+        transport = client.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_BACKLOG:
+            self.leave(client)
+            transport.abort()
+            return
+        client.writer.write(message)
+        self.bytes_sent += len(message)
+
+
+class Server:
+    """Accepts clients into rooms and moves every room at a fixed rate."""
+
+    __slots__ = (
+        "grid_width",
+        "grid_height",
+        "snakes",
+        "food",
+        "move_interval",
+        "rooms",
+        "handlers",
+        "server",
+        "ticker",
+        "ticks",
+        "late",
+    )
+
+    def __init__(
+        self,
+        grid_width: int = 40,
+        grid_height: int = 30,
+        snakes: int = 8,
+        food: int = 4,
+        move_interval: int = 123,
+    ) -> None:
+        """
+        Initializes a Server object.
+
+        Args:
+            grid_width: The width of the rooms' grids.
+            grid_height: The height of the rooms' grids.
+            snakes: The number of snakes in every room.
+            food: The number of food items in every room.
+            move_interval: The milliseconds between moves.
+        """
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.snakes = snakes
+        self.food = food
+        self.move_interval = move_interval
+        self.rooms: dict[str, Room] = {}
+        # The task serving each connection
+        self.handlers: set[asyncio.Task] = set()
+        self.server: asyncio.Server | None = None
+        self.ticker: asyncio.Task | None = None
+        # Ticks run so far, and how many of them started late
+        self.ticks = 0
+        self.late = 0
+
+    @property
+    def port(self) -> int:
+        """The port the server listens on."""
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str, port: int) -> None:
+        """
+        Starts listening and ticking.
+
+        Args:
+            host: The address to listen on.
+            port: The port to listen on, 0 for any free port.
+        """
+        self.server = await asyncio.start_server(self._serve, host, port)
+        self.ticker = asyncio.create_task(self._tick_forever())
+
+    async def stop(self) -> None:
+        """Stops ticking and closes every connection."""
+        self.ticker.cancel()
+        self.server.close()
+        for room in self.rooms.values():
+            for client in room.clients.values():
+                client.writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def stop_ticking(self) -> None:
+        """Freezes every room as it is, but keeps the connections open."""
+        self.ticker.cancel()
+
+    async def _tick_forever(self) -> None:
+        """Steps every room once per move interval."""
+        loop = asyncio.get_running_loop()
+        interval = self.move_interval / 1000
+        deadline = loop.time()
+        while True:
+            deadline += interval
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Stay on the fixed rate, but let the connections run
+                self.late += 1
+                await asyncio.sleep(0)
+            for room in self.rooms.values():
+                room.step()
+            self.ticks += 1
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Handles one client from JOIN until it disconnects."""
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        client = None
+        try:
+            name = decode_join(await read_message(reader))
+            room = self.rooms.get(name)
+            if room is None:
+                room = Room(
+                    name,
+                    self.grid_width,
+                    self.grid_height,
+                    self.snakes,
+                    self.food,
+                    self.move_interval,
+                )
+                self.rooms[name] = room
+            client = room.join(writer)
+            if client is None:
+                writer.write(frame(encode_refused(f"room {name!r} is full")))
+                return
+            while True:
+                message = await read_message(reader)
+                if message[0] == TURN and len(client.queue) < 4:
+                    client.queue.append(decode_turn(message))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            if client is not None:
+                room = client.room
+                room.leave(client)
+                # The room may have emptied when this client was dropped,
+                # and been removed or made again under the same name since
+                if not room.clients and self.rooms.get(room.name) is room:
+                    del self.rooms[room.name]
+            writer.close()
+            self.handlers.discard(handler)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Gets the traffic and CPU time of every room since it was made.
+
+        Returns:
+            For every room, its clients, ticks, bytes sent per tick and per
+            second, and the milliseconds of CPU time each tick took.
+        """
+        seconds = self.move_interval / 1000
+        stats = {}
+        for name, room in self.rooms.items():
+            ticks = max(room.tick, 1)
+            stats[name] = {
+                "clients": len(room.clients),
+                "ticks": room.tick,
+                "bytes_per_tick": room.bytes_sent / ticks,
+                "bytes_per_s": room.bytes_sent / ticks / seconds,
+                "tick_ms": room.step_time / ticks * 1000,
+            }
+        return stats
+
+
+def format_report(server: Server, ticks_per_s: float) -> str:
+    """Summarizes the rooms of a server in one line."""
+    stats = server.stats().values()
+    if not stats:
+        return f"{ticks_per_s:.1f} ticks/s, no rooms"
+    n = len(stats)
+    return (
+        f"{ticks_per_s:.1f} ticks/s, {n} rooms,"
+        f" {sum(s['clients'] for s in stats)} clients,"
+        f" per room {sum(s['bytes_per_s'] for s in stats) / n / 1024:.1f} KiB/s"
+        f" ({sum(s['bytes_per_tick'] for s in stats) / n:.0f} B/tick),"
+        f" {sum(s['tick_ms'] for s in stats) / n:.3f} ms/tick,"
+        f" {server.late} late ticks"
+    )
+
+
+async def report_forever(server: Server, period: float) -> None:
+    """Prints the server's report every period seconds."""
+    ticks = server.ticks
+    start = time.perf_counter()
+    while True:
+        await asyncio.sleep(period)
+        now = time.perf_counter()
+        rate = (server.ticks - ticks) / (now - start)
+        ticks, start = server.ticks, now
+        print(format_report(server, rate), file=sys.stderr)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    """Runs the server given on the command line until it is interrupted."""
+    server = Server(
+        args.grid[0], args.grid[1], args.snakes, args.food, args.move_interval
+    )
+    await server.start(args.host, args.port)
+    print(f"listening on {args.host}:{server.port}", file=sys.stderr)
+    await report_forever(server, args.report)
+
+
+def add_room_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the options of the rooms to a command line parser."""
+    parser.add_argument(
+        "--grid", type=int, nargs=2, default=(40, 30), metavar=("W", "H")
+    )
+    parser.add_argument("--snakes", type=int, default=8, help="snakes per room")
+    parser.add_argument("--food", type=int, default=4, help="food items per room")
+    parser.add_argument("--move-interval", type=int, default=123, help="ms per move")
+
+
+def main() -> None:
+    """Runs the server."""
+    parser = argparse.ArgumentParser(description="Run a multiplayer server.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    add_room_arguments(parser)
+    parser.add_argument(
+        "--report", type=float, default=5.0, help="seconds between reports"
+    )
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,20 @@
 """
-This module contains the Snake, Food, and Cell classes.
+This module contains the Snake and Food classes.
 """
 
-from random import randint
+import os
+from array import array
+from itertools import chain
 from math import floor
-from enum import Enum
 from pygame import Surface, Rect, Color
+from pygame.display import get_surface
 from pygame.draw import rect
-from collections.abc import Sequence
+from collections.abc import Callable, Iterator
+
+from camera import Camera
+from colors import OUTSIDE_COLOR
+from engine import Engine, MoveResult, Position
+from rewind import REWIND_MEMORY, RewindBuffer
 
 DEAD_COLOR = "red"
 
@@ -38,6 +45,19 @@ FOOD_S2 = FOOD_C2.lerp(Color("black"), 0.4)
 CELL_MAX_PROGRESS = 75
 FOOD_MAX_PROGRESS = 30
 
+# Moves played back per move interval while rewinding
+REWIND_SPEED = 2
+
+# Number of pre-rendered sprites between the two colors of a pulse
+PHASE_STEPS = 32
+
+# Base, highlight and shadow color pairs of each kind of sprite
+SPRITE_COLORS: dict[str, tuple[tuple[Color, Color], ...]] = {
+    "head": ((HEAD_C1, HEAD_C2), (HEAD_H1, HEAD_H2), (HEAD_S1, HEAD_S2)),
+    "body": ((SNAKE_C1, SNAKE_C2), (SNAKE_H1, SNAKE_H2), (SNAKE_S1, SNAKE_S2)),
+    "food": ((FOOD_C1, FOOD_C2), (FOOD_H1, FOOD_H2), (FOOD_S1, FOOD_S2)),
+}
+
 
 def color_calc(c1: Color, c2: Color, percent: float) -> Color:
     """
@@ -61,137 +81,170 @@ def color_calc(c1: Color, c2: Color, percent: float) -> Color:
     return Color(r, g, b)
 
 
-class MoveResult(Enum):
-    """The result of a snake's move."""
+def draw_bevel(
+    screen: Surface,
+    main_color: Color,
+    highlight_color: Color,
+    shadow_color: Color,
+    x: float,
+    y: float,
+    cell_size: int,
+) -> None:
+    """
+    Draws a cell with a 3D pixel bevel.
 
-    OK = 0
-    ATE_FOOD = 1
-    HIT_TAIL = 2
-    HIT_BORDER = 3
+    Args:
+        screen: The pygame surface to draw on.
+        main_color: The fill color.
+        highlight_color: The color of the top and left edges.
+        shadow_color: The color of the bottom and right edges.
+        x: The x-coordinate in pixels.
+        y: The y-coordinate in pixels.
+        cell_size: The size of the cell.
+    """
+    border = 2
+    rect(screen, main_color, Rect(x, y, cell_size, cell_size))
+    rect(screen, highlight_color, Rect(x, y, cell_size - border, border))  # top
+    rect(screen, highlight_color, Rect(x, y, border, cell_size - border))  # left
+    rect(
+        screen,
+        shadow_color,
+        Rect(x + border, y + cell_size - border, cell_size - border, border),
+    )  # bottom
+    rect(
+        screen, shadow_color, Rect(x + cell_size - border, y, border, cell_size)
+    )  # right
+
+
+class SpriteCache:
+    """
+    Pre-rendered cell sprites keyed by kind, pulse phase and cell size.
 
+    Kinds are "head", "body", "food" and "dead". The pulse is quantized to
+    PHASE_STEPS, so each sprite is rendered once and then drawn with a single
+    blit. Changing the cell size evicts every sprite.
+    """
 
-class Cell:
-    """Represents a single cell of the snake."""
+    __slots__ = ("cell_size", "sprites")
 
-    __slots__ = ("x", "y", "fromx", "fromy", "ishead", "progress")
+    def __init__(self) -> None:
+        """Initializes an empty SpriteCache object."""
+        self.cell_size = 0
+        self.sprites: dict[tuple[str, int], Surface] = {}
 
-    def __init__(self, x: int, y: int, fromx: int = -1, fromy: int = -1) -> None:
+    def get(self, kind: str, percent: float, cell_size: int) -> Surface:
         """
-        Initializes a Cell object.
+        Gets the sprite of a cell.
 
         Args:
-            x: The x-coordinate of the cell.
-            y: The y-coordinate of the cell.
-            fromx: The previous x-coordinate of the cell.
-            fromy: The previous y-coordinate of the cell.
-        """
-        self.x = x
-        self.y = y
-        self.fromx = fromx
-        self.fromy = fromy
-        if fromy == -1:
-            self.fromx = x
-            self.fromy = y
-        self.ishead = False
-        self.progress = 0
+            kind: The kind of cell.
+            percent: The pulse phase, as passed to `color_calc`.
+            cell_size: The size of the cell.
 
-    def tick(self, progress_step: float) -> None:
+        Returns:
+            The sprite surface.
+        """
+        if cell_size != self.cell_size:
+            self.sprites.clear()
+            self.cell_size = cell_size
+
+        if percent > 1:
+            percent = 2 - percent
+        key = (kind, int(percent * PHASE_STEPS))
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self._render(kind, key[1] / PHASE_STEPS, cell_size)
+            self.sprites[key] = sprite
+        return sprite
+
+    @staticmethod
+    def _render(kind: str, percent: float, cell_size: int) -> Surface:
+        """Renders a sprite."""
+        if kind == "dead":
+            main_color = Color(DEAD_COLOR)
+            highlight_color = main_color.lerp(Color("white"), 0.5)
+            shadow_color = main_color.lerp(Color("black"), 0.5)
+        else:
+            main_color, highlight_color, shadow_color = (
+                color_calc(c1, c2, percent) for c1, c2 in SPRITE_COLORS[kind]
+            )
+
+        sprite = Surface((cell_size, cell_size))
+        draw_bevel(sprite, main_color, highlight_color, shadow_color, 0, 0, cell_size)
+        if get_surface() is not None:
+            sprite = sprite.convert()
+        return sprite
+
+
+SPRITES = SpriteCache()
+
+
+class PulseRing:
+    """
+    The pulse offset of every cell of the snake, tail first.
+
+    A cell's pulse progress is the global clock minus its offset, so the
+    animation advances without touching any cell. Offsets are float32 in a
+    ring buffer sized for a full board, and a new cell is added at the tail
+    in O(1).
+    """
+
+    __slots__ = ("offsets", "start", "length")
+
+    def __init__(self, capacity: int) -> None:
         """
-        Updates the cell's progress.
+        Initializes a PulseRing object with a single cell.
 
         Args:
-            progress_step: The amount to increment the progress by.
+            capacity: The most cells the snake can have.
         """
-        self.progress += progress_step
-        self.progress %= CELL_MAX_PROGRESS
+        self.offsets = array("f", bytes(4 * capacity))
+        self.start = 0
+        self.length = 0
+        self.reset(0.0)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[float]:
+        """Yields the offsets from tail to head."""
+        offsets = self.offsets
+        end = self.start + self.length
+        if end <= len(offsets):
+            return iter(offsets[self.start : end])
+        return chain(offsets[self.start :], offsets[: end - len(offsets)])
 
-    def coords(self, progress: float = 1) -> tuple[float, float]:
+    def reset(self, clock: float) -> None:
         """
-        Calculates the coordinates of the cell based on its progress.
+        Drops every cell and starts again with one born now.
 
         Args:
-            progress: The progress of the cell's movement.
-
-        Returns:
-            A tuple containing the x and y coordinates.
+            clock: The current clock.
         """
-        x = (self.x - self.fromx) * progress + self.fromx
-        y = (self.y - self.fromy) * progress + self.fromy
-        return (x, y)
+        self.start = 0
+        self.length = 1
+        self.offsets[0] = clock % CELL_MAX_PROGRESS
 
-    def draw(
-        self, progress: float, isdead: bool, screen: Surface, cell_size: int
-    ) -> None:
+    def grow(self, clock: float) -> None:
         """
-        Draws the cell on the screen.
+        Adds a cell born now at the tail.
 
         Args:
-            progress: The progress of the cell's movement.
-            isdead: Whether the snake is dead.
-            screen: The pygame surface to draw on.
-            cell_size: The size of the cell.
+            clock: The current clock.
         """
-        if isdead:
-            progress = 1
-        x, y = self.coords(progress)
-        x *= cell_size
-        y *= cell_size
+        self.start = (self.start - 1) % len(self.offsets)
+        self.offsets[self.start] = clock % CELL_MAX_PROGRESS
+        self.length += 1
 
-        if isdead:
-            main_color = Color(DEAD_COLOR)
-            highlight_color = main_color.lerp(Color("white"), 0.5)
-            shadow_color = main_color.lerp(Color("black"), 0.5)
-        elif self.ishead:
-            percent = self.progress / CELL_MAX_PROGRESS * 2
-            main_color = color_calc(HEAD_C1, HEAD_C2, percent)
-            highlight_color = color_calc(HEAD_H1, HEAD_H2, percent)
-            shadow_color = color_calc(HEAD_S1, HEAD_S2, percent)
-        else:
-            percent = self.progress / CELL_MAX_PROGRESS * 2
-            main_color = color_calc(SNAKE_C1, SNAKE_C2, percent)
-            highlight_color = color_calc(SNAKE_H1, SNAKE_H2, percent)
-            shadow_color = color_calc(SNAKE_S1, SNAKE_S2, percent)
-
-        border = 2
-        rect(screen, main_color, Rect(x, y, cell_size, cell_size))
-        rect(screen, highlight_color, Rect(x, y, cell_size - border, border))  # top
-        rect(screen, highlight_color, Rect(x, y, border, cell_size - border))  # left
-        rect(
-            screen,
-            shadow_color,
-            Rect(x + border, y + cell_size - border, cell_size - border, border),
-        )  # bottom
-        rect(
-            screen, shadow_color, Rect(x + cell_size - border, y, border, cell_size)
-        )  # right
-
-    @classmethod
-    def random(cls, grid_width: int, grid_height: int) -> "Cell":
-        """
-        Creates a new Cell at a random position.
+    def shrink(self, count: int) -> None:
+        """
+        Removes cells from the tail, undoing `grow`.
 
         Args:
-            grid_width: The width of the grid.
-            grid_height: The height of the grid.
-
-        Returns:
-            A new Cell object.
+            count: The number of cells to remove.
         """
-        return cls(randint(0, grid_width - 1), randint(0, grid_height - 1))
-
-
-def next_cell(cell: Cell, next: Cell) -> None:
-    """
-    Updates a cell to the position of the next cell.
-
-    Args:
-        cell: The cell to update.
-        next: The cell to move to.
-    """
-    cell.fromx = cell.x
-    cell.fromy = cell.y
-    cell.x = next.x
-    cell.y = next.y
+        self.start = (self.start + count) % len(self.offsets)
+        self.length -= count
 
 
 class Food:
@@ -221,31 +274,13 @@ class Food:
         self.progress += progress_step
         self.progress %= FOOD_MAX_PROGRESS
 
-    def is_eaten(self, snake_cells: Sequence[Cell]) -> bool:
-        """
-        Checks if the food has been eaten by the snake.
-
-        Args:
-            snake_cells: The cells of the snake.
-
-        Returns:
-            True if the food has been eaten, False otherwise.
-        """
-        return any(self.equal(cell) for cell in snake_cells)
-
-    def equal(self, cell: Cell) -> bool:
-        """
-        Checks if the food is at the same position as a cell.
-
-        Args:
-            cell: The cell to compare with.
-
-        Returns:
-            True if the positions are the same, False otherwise.
-        """
-        return (cell.x, cell.y) == (self.x, self.y)
-
-    def draw(self, progress: float, screen: Surface, cell_size: int) -> None:
+    def draw(
+        self,
+        progress: float,
+        screen: Surface,
+        cell_size: int,
+        origin: tuple[int, int] = (0, 0),
+    ) -> None:
         """
         Draws the food on the screen.
 
@@ -253,69 +288,58 @@ class Food:
             progress: The progress of the food's animation.
             screen: The pygame surface to draw on.
             cell_size: The size of the food.
+            origin: The pixel of the board at the top left of the screen.
         """
-        x, y = self.x * cell_size, self.y * cell_size
+        x, y = self.x * cell_size - origin[0], self.y * cell_size - origin[1]
+        screen.blit(self.sprite(cell_size), (x, y))
 
-        percent = self.progress / FOOD_MAX_PROGRESS * 2
-        main_color = color_calc(FOOD_C1, FOOD_C2, percent)
-        highlight_color = color_calc(FOOD_H1, FOOD_H2, percent)
-        shadow_color = color_calc(FOOD_S1, FOOD_S2, percent)
-
-        border = 2
-        rect(screen, main_color, Rect(x, y, cell_size, cell_size))
-        rect(screen, highlight_color, Rect(x, y, cell_size - border, border))  # top
-        rect(screen, highlight_color, Rect(x, y, border, cell_size - border))  # left
-        rect(
-            screen,
-            shadow_color,
-            Rect(x + border, y + cell_size - border, cell_size - border, border),
-        )  # bottom
-        rect(
-            screen, shadow_color, Rect(x + cell_size - border, y, border, cell_size)
-        )  # right
-
-    @classmethod
-    def place(
-        cls, grid_width: int, grid_height: int, exclude_cells: Sequence[Cell]
-    ) -> "Food":
-        """
-        Places the food in a random position on the grid.
+    def sprite(self, cell_size: int) -> Surface:
+        """
+        Gets the sprite of the food for its current animation phase.
 
         Args:
-            grid_width: The width of the grid.
-            grid_height: The height of the grid.
-            exclude_cells: A sequence of cells to exclude when placing the food.
+            cell_size: The size of the food.
 
         Returns:
-            A new Food object.
+            The sprite surface.
         """
-        while True:
-            x = randint(0, grid_width - 1)
-            y = randint(0, grid_height - 1)
-            food = cls(x, y)
-            if not food.is_eaten(exclude_cells):
-                return food
+        percent = self.progress / FOOD_MAX_PROGRESS * 2
+        return SPRITES.get("food", percent, cell_size)
 
 
 class Snake:
-    """Represents the snake."""
+    """Renders an `Engine` game and drives it from frame time."""
 
     __slots__ = (
-        "grid_width",
-        "grid_height",
+        "engine",
         "screen",
         "cell_size",
-        "cells",
+        "camera",
+        "board",
+        "controller",
+        "on_game_over",
+        "clock",
+        "pulses",
         "progress",
         "dead_acc",
-        "score",
         "food",
-        "direction",
-        "directions_queue",
+        "rewind",
+        "rewinding",
+        "rewind_progress",
     )
 
     def __init__(
-        self, grid_width: int, grid_height: int, screen: Surface, cell_size: int
+        self,
+        grid_width: int,
+        grid_height: int,
+        screen: Surface,
+        cell_size: int,
+        renderer: str = "sprites",
+        seed: int | None = None,
+        controller: Callable[[Engine], None] | None = None,
+        on_game_over: Callable[[], None] | None = None,
+        rewind_moves: int = 0,
+        rewind_memory: int = REWIND_MEMORY,
     ) -> None:
         """
         Initializes a Snake object.
@@ -325,35 +349,105 @@ class Snake:
             grid_height: The height of the grid.
             screen: The pygame surface to draw on.
             cell_size: The size of the snake's cells.
-        """
-        self.grid_width = grid_width
-        self.grid_height = grid_height
+            renderer: "grid" to draw the whole board from a color array,
+                anything else to draw each cell from the sprite cache.
+            seed: The seed of the first game, random if None.
+            controller: Called with the engine before every move, for
+                anything that steers the snake other than the keyboard.
+            on_game_over: Called once a finished game has been shown,
+                defaults to `save_score_and_reset`.
+            rewind_moves: How many moves back the game can be rewound with
+                `rewinding`, 0 for none.
+            rewind_memory: The most bytes the states kept for rewinding
+                may take.
+        """
+        self.engine = Engine(grid_width, grid_height)
         self.screen = screen
         self.cell_size = cell_size
-        self.reset()
+        self.controller = controller
+        self.on_game_over = on_game_over or self.save_score_and_reset
+        self.camera = Camera(grid_width, grid_height, cell_size, screen.get_size())
+        self.board = None
+        if renderer == "grid":
+            from colors import SCREEN_BACKGROUND_COLOR
+            from renderers import get_grid_renderer
+
+            columns, rows = self.camera.span()
+            self.board = get_grid_renderer(
+                columns, rows, cell_size, SCREEN_BACKGROUND_COLOR
+            )
+        self.pulses = PulseRing(grid_width * grid_height)
+        self.rewind = None
+        if rewind_moves > 0:
+            self.rewind = RewindBuffer(self.engine, rewind_moves, rewind_memory)
+        # Whether the game plays backwards, while the rewind key is held
+        self.rewinding = False
+        self.rewind_progress = 0.0
+        self.reset(seed)
+
+    @property
+    def grid_width(self) -> int:
+        """The width of the grid."""
+        return self.engine.grid_width
+
+    @property
+    def grid_height(self) -> int:
+        """The height of the grid."""
+        return self.engine.grid_height
+
+    @property
+    def score(self) -> int:
+        """The current score."""
+        return self.engine.score
+
+    def reset(self, seed: int | None = None) -> None:
+        """
+        Resets the snake to its initial state.
 
-    def reset(self) -> None:
-        """Resets the snake to its initial state."""
-        # Start snake in the center of the grid instead of random position
-        center_x = self.grid_width // 2
-        center_y = self.grid_height // 2
-        self.cells: list[Cell] = [Cell(center_x, center_y)]
-        self.cells[-1].ishead = True
+        Args:
+            seed: The seed of the new game, random if None.
+        """
+        self.engine.reset(seed)
+        self.camera.center(*self.engine.head)
+        # Total progress so far, which drives every cell's pulse
+        self.clock = 0.0
+        self.pulses.reset(self.clock)
         self.progress = 0.0
         self.dead_acc = 0.0
-        self.score = 0
-        self.food = Food.place(self.grid_width, self.grid_height, self.cells)
-        self.direction = (1, 0)  # Start moving right
-        self.directions_queue: list[tuple[int, int]] = []
+        self.food: Food | None = Food(*self.engine.food)
+        if self.rewind is not None:
+            self.rewind.clear()
+            self.rewind.record()
 
     def save_score_and_reset(self) -> None:
         """Saves the current score to high scores and resets the snake."""
+        from config import SETTINGS
         from high_scores import add_score
 
         if self.score > 0:  # Only save non-zero scores
-            add_score(self.score)
+            add_score(
+                self.score,
+                SETTINGS.scores.player,
+                self.grid_width,
+                self.grid_height,
+                SETTINGS.game.move_interval,
+            )
+        if SETTINGS.replays.save:
+            self._save_replay(SETTINGS.replays.dir, SETTINGS.game.move_interval)
         self.reset()
 
+    def _save_replay(self, directory: str, move_interval: int) -> None:
+        """Writes the replay of the current game in the background."""
+        from datetime import datetime
+        from threading import Thread
+
+        from replay import Replay
+
+        replay = Replay.from_engine(self.engine, move_interval)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{self.engine.seed:016x}.snkr"
+        path = os.path.join(directory, name)
+        Thread(target=replay.save, args=(path,), name="replay-writer").start()
+
     def is_dead(self) -> bool:
         """
         Checks if the snake is dead.
@@ -370,7 +464,7 @@ class Snake:
         Args:
             direction: The direction to add.
         """
-        self.directions_queue.append(direction)
+        self.engine.push_direction(direction)
 
     def tick(self, progress_step: float) -> None:
         """
@@ -379,84 +473,30 @@ class Snake:
         Args:
             progress_step: The amount to increment the progress by.
         """
-        for cell in self.cells:
-            cell.tick(progress_step)
-        self.food.tick(progress_step)
-        if self.dead_acc > 0:
+        self.clock += progress_step
+        if self.food is not None:
+            self.food.tick(progress_step)
+        if self.rewinding and self.rewind is not None:
+            # Cells are drawn at rest while the game plays backwards, and the
+            # next move starts as soon as it goes forward again
+            self.progress = 1.0
+            self.rewind_progress += progress_step * REWIND_SPEED
+            while self.rewind_progress >= 1:
+                self.rewind_progress -= 1
+                if not self.step_back():
+                    self.rewind_progress = 0.0
+        elif self.dead_acc > 0:
             self.dead_acc -= progress_step
             if self.dead_acc <= 0:
-                self.save_score_and_reset()
+                self.on_game_over()
         else:
+            # Catch up on every move that is due, so the number of moves only
+            # depends on the time played and not on the frame rate
             self.progress += progress_step
-            if self.progress >= 1:
-                self.progress %= 1
+            while self.progress >= 1 and self.dead_acc <= 0:
+                self.progress -= 1
                 self.move()
 
-    def _update_direction(self) -> None:
-        """Updates the snake's direction from the directions queue."""
-        while self.directions_queue and self.__is_colinear(
-            self.direction, self.directions_queue[0]
-        ):
-            self.directions_queue.pop(0)
-
-        if self.directions_queue:
-            self.direction = self.directions_queue.pop(0)
-
-    def __is_colinear(self, dir1: tuple[int, int], dir2: tuple[int, int]) -> bool:
-        """Checks if two direction vectors are collinear."""
-        return dir1[0] * dir2[1] - dir1[1] * dir2[0] == 0
-
-    def _get_next_head(self) -> Cell:
-        """Calculates the position of the next head cell."""
-        head = self.cells[-1]
-        return Cell(
-            head.x + self.direction[0], head.y + self.direction[1], head.x, head.y
-        )
-
-    def _handle_food_collision(self, next_head: Cell) -> bool:
-        """Checks for and handles food collisions."""
-        if self.food.equal(next_head):
-            self.cells[-1].ishead = False
-            new_cell = Cell(
-                self.cells[0].x,
-                self.cells[0].y,
-                self.cells[0].fromx,
-                self.cells[0].fromy,
-            )
-            self.cells.insert(0, new_cell)
-            n = len(self.cells)
-            for i in range(1, n - 1):
-                next_cell(self.cells[i], self.cells[i + 1])
-            next_cell(self.cells[n - 1], next_head)
-            self.cells[-1].ishead = True
-            self.food = Food.place(self.grid_width, self.grid_height, self.cells)
-            self.score += 1
-            return True
-        return False
-
-    def _check_wall_collision(self, next_head: Cell) -> bool:
-        """Checks for wall collisions."""
-        return (
-            next_head.x < 0
-            or next_head.y < 0
-            or next_head.x >= self.grid_width
-            or next_head.y >= self.grid_height
-        )
-
-    def _check_tail_collision(self, next_head: Cell) -> bool:
-        """Checks for tail collisions."""
-        return any(
-            (next_head.x, next_head.y) == (cell.x, cell.y) for cell in self.cells[1:]
-        )
-
-    def _move_body(self, next_head: Cell) -> None:
-        """Moves the snake's body forward."""
-        self.cells[-1].ishead = False
-        for i in range(len(self.cells) - 1):
-            next_cell(self.cells[i], self.cells[i + 1])
-        next_cell(self.cells[-1], next_head)
-        self.cells[-1].ishead = True
-
     def move(self) -> MoveResult:
         """
         Moves the snake one step forward.
@@ -464,26 +504,145 @@ class Snake:
         Returns:
             The result of the move.
         """
-        self._update_direction()
+        if self.controller is not None:
+            self.controller(self.engine)
+        result = self.engine.step()
+        if self.rewind is not None:
+            self.rewind.record()
 
-        next_head = self._get_next_head()
+        if result in (MoveResult.ATE_FOOD, MoveResult.WON):
+            # The new cell is added at the tail, which stays in place
+            self.pulses.grow(self.clock)
+            self.food = None if self.engine.food is None else Food(*self.engine.food)
 
-        if self._handle_food_collision(next_head):
-            return MoveResult.ATE_FOOD
-
-        if self._check_wall_collision(next_head):
+        if not self.engine.alive:
             self.dead_acc = 10
-            return MoveResult.HIT_BORDER
+        return result
 
-        if self._check_tail_collision(next_head):
-            self.dead_acc = 10
-            return MoveResult.HIT_TAIL
+    def step_back(self) -> bool:
+        """
+        Puts the game back one move, even out of a death.
 
-        self._move_body(next_head)
-        return MoveResult.OK
+        Returns:
+            Whether it went back, False at the start of the rewind window.
+        """
+        engine = self.engine
+        if self.rewind is None or engine.moves <= self.rewind.oldest:
+            return False
+        self.rewind.rewind(engine.moves - 1)
+        # Going back only ever undoes growth, which added cells at the tail
+        self.pulses.shrink(len(self.pulses) - len(engine.body))
+        self.food = None if engine.food is None else Food(*engine.food)
+        self.dead_acc = 0.0
+        return True
+
+    def clear(self, background: Color) -> None:
+        """
+        Fills the board with a color and the rest of the screen around it.
 
-    def draw(self) -> None:
-        """Draws the snake and food on the screen."""
-        self.food.draw(self.progress, self.screen, self.cell_size)
-        for cell in self.cells:
-            cell.draw(self.progress, self.is_dead(), self.screen, self.cell_size)
+        Args:
+            background: The color of the board.
+        """
+        board = self.camera.board_rect()
+        if not board.contains(self.screen.get_rect()):
+            self.screen.fill(OUTSIDE_COLOR)
+        self.screen.fill(background, board)
+
+    def draw(self, follow: bool = True) -> None:
+        """
+        Draws the snake and food on the screen.
+
+        Args:
+            follow: Move the camera to keep the head in view first. Pass
+                False for snakes that share the camera of another one.
+        """
+        camera = self.camera
+        if follow:
+            camera.follow(*self.engine.head)
+        if self.board is not None:
+            self.board.draw(self)
+            return
+
+        origin = (camera.x, camera.y)
+        if self.food is not None:
+            self.food.draw(self.progress, self.screen, self.cell_size, origin)
+        progress = 1 if self.is_dead() else self.progress
+        cell_size = self.cell_size
+        body = self.engine.body
+        ring = body.ring
+        capacity = len(ring)
+        width = body.grid_width
+        tail = self.engine.vacated or body.tail
+        blits = []
+        # Every cell slides into the place of the one before it, and the tail
+        # slides out of the cell it vacated
+        for i, (x, y), sprite in self.visible_sprites():
+            if i > 0:
+                py, px = divmod(ring[(body.start + i - 1) % capacity], width)
+            else:
+                px, py = tail
+            dest = (
+                ((x - px) * progress + px) * cell_size - origin[0],
+                ((y - py) * progress + py) * cell_size - origin[1],
+            )
+            blits.append((sprite, dest))
+        self.screen.blits(blits, doreturn=False)
+
+    def visible_sprites(self) -> list[tuple[int, Position, Surface]]:
+        """
+        Gets the sprite of every cell of the snake near the camera's view.
+
+        A snake longer than the view has its cells looked up in the
+        occupancy grid of the visible area rather than found by walking the
+        body, so the cost is bounded by the size of the screen, not the
+        length of the snake. Cells one cell outside the view are included,
+        since they can slide into it.
+
+        Returns:
+            The (index from the tail, position, sprite) of every cell, tail
+            first.
+        """
+        body = self.engine.body
+        ring = body.ring
+        capacity = len(ring)
+        start = body.start
+        length = len(body)
+        width = body.grid_width
+        x0, y0, x1, y1 = self.camera.visible(1)
+        if length <= (x1 - x0) * (y1 - y0):
+            found = [(i, ring[(start + i) % capacity]) for i in range(length)]
+            if x1 - x0 < width or y1 - y0 < body.grid_height:
+                found = [
+                    (i, index)
+                    for i, index in found
+                    if x0 <= index % width < x1 and y0 <= index // width < y1
+                ]
+        else:
+            occupied = body.occupied
+            where = body.where
+            found = []
+            for row in range(y0 * width, y1 * width, width):
+                index = occupied.find(1, row + x0, row + x1)
+                while index != -1:
+                    found.append(((where[index] - start) % capacity, index))
+                    index = occupied.find(1, index + 1, row + x1)
+            found.sort()
+
+        # A full board also ends the game, but the snake did not die
+        isdead = self.is_dead() and self.engine.outcome != MoveResult.WON
+        cell_size = self.cell_size
+        clock = self.clock
+        offsets = self.pulses.offsets
+        pulse_start = self.pulses.start
+        head = length - 1
+        sprites = []
+        for i, index in found:
+            if isdead:
+                sprite = SPRITES.get("dead", 0, cell_size)
+            else:
+                kind = "head" if i == head else "body"
+                offset = offsets[(pulse_start + i) % capacity]
+                percent = (clock - offset) % CELL_MAX_PROGRESS / CELL_MAX_PROGRESS * 2
+                sprite = SPRITES.get(kind, percent, cell_size)
+            sprites.append((i, (index % width, index // width), sprite))
+        return sprites
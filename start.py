@@ -1,21 +1,125 @@
 """
 This is the main entry point for the application.
+
+The window shows its first frame as soon as pygame is up. The config, the
+menu library and the game modules are imported after that, while the high
+scores load in the background, so a cold start puts something on screen
+within `STARTUP_BUDGET`.
+
+Usage:
+    python start.py [--startup-profile]
 """
 
-import pygame
+import importlib
+import sys
+import threading
+import time
+from types import ModuleType
+
+# Launch to first frame, in seconds
+STARTUP_BUDGET = 0.5
+
+START_TIME = time.perf_counter()
+
+
+class StartupTimer:
+    """Records how long each step of startup takes."""
+
+    __slots__ = ("last", "steps", "first_frame")
+
+    def __init__(self) -> None:
+        """Initializes a StartupTimer object."""
+        self.last = START_TIME
+        self.steps: list[tuple[str, float]] = []
+        self.first_frame: float | None = None
+
+    def mark(self, step: str) -> None:
+        """
+        Ends a step of startup.
+
+        Args:
+            step: What was done since the previous mark.
+        """
+        now = time.perf_counter()
+        self.steps.append((step, now - self.last))
+        self.last = now
+
+    def load(self, name: str) -> ModuleType:
+        """
+        Imports a module as a step of its own, to time it.
 
-from menu import menu
+        Args:
+            name: The name of the module.
+
+        Returns:
+            The module.
+        """
+        module = importlib.import_module(name)
+        self.mark(f"import {name}")
+        return module
+
+    def mark_first_frame(self) -> None:
+        """Ends the first frame and warns if it came later than the budget."""
+        self.mark("first frame")
+        self.first_frame = self.last - START_TIME
+        if self.first_frame > STARTUP_BUDGET:
+            print(
+                f"Startup took {self.first_frame * 1000:.0f} ms to the first"
+                f" frame, over the {STARTUP_BUDGET * 1000:.0f} ms budget",
+                file=sys.stderr,
+            )
+
+    def report(self) -> None:
+        """Prints the duration of every step, and the total so far."""
+        total = 0.0
+        print("Startup profile:", file=sys.stderr)
+        for step, duration in self.steps:
+            total += duration
+            print(
+                f"  {duration * 1000:8.1f} ms  {total * 1000:8.1f} ms  {step}",
+                file=sys.stderr,
+            )
 
 
 def main() -> None:
     """
     Initializes pygame and starts the game menu.
     """
+    profile = "--startup-profile" in sys.argv[1:]
+    timer = StartupTimer()
+
+    import pygame
+
+    timer.mark("import pygame")
     pygame.init()
+    timer.mark("pygame.init")
     pygame.display.set_caption("Snake Game")
     # Increase board size by 1.5 times
     screen = pygame.display.set_mode((1200, 900))
-    menu(screen)
+    timer.mark("open window")
+
+    from colors import SCREEN_BACKGROUND_COLOR
+
+    screen.fill(SCREEN_BACKGROUND_COLOR)
+    pygame.display.flip()
+    timer.mark_first_frame()
+
+    timer.load("config")
+    high_scores = timer.load("high_scores")
+    # Opening the score file or database overlaps with the imports below
+    scores = threading.Thread(target=high_scores.get_store, daemon=True)
+    scores.start()
+
+    timer.load("pygame_menu")
+    build_menu = timer.load("menu").build_menu
+    scores.join()
+    timer.mark("load scores")
+    main_menu = build_menu(screen)
+    timer.mark("build menu")
+
+    if profile:
+        timer.report()
+    main_menu.mainloop(screen)
 
 
 if __name__ == "__main__":
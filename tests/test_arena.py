@@ -0,0 +1,101 @@
+"""Tests for the collision rules of the arena."""
+
+import numpy as np
+import pytest
+
+from arena import ALIVE, EMPTY, FOOD, Arena
+from engine import MoveResult
+
+RIGHT, DOWN, LEFT, UP = range(4)
+OK = MoveResult.OK.value
+ATE = MoveResult.ATE_FOOD.value
+HIT = MoveResult.HIT_TAIL.value
+BORDER = MoveResult.HIT_BORDER.value
+
+
+def board(
+    grid_width: int, grid_height: int, snakes: list[tuple[list[int], int]]
+) -> Arena:
+    """Makes an arena with only the given snakes, as (cells from tail, direction)."""
+    arena = Arena(grid_width, grid_height, len(snakes), 1, seed=0, respawn=False)
+    arena.cells[:] = EMPTY
+    for snake, (cells, direction) in enumerate(snakes):
+        for cell, towards in zip(cells, cells[1:]):
+            arena.links[cell] = towards
+        arena.cells[cells] = snake
+        arena.tails[snake] = cells[0]
+        arena.heads[snake] = cells[-1]
+        arena.lengths[snake] = len(cells)
+        arena.directions[snake] = direction
+    # The food is kept out of the way in the last cell
+    put_food(arena, grid_width * grid_height - 1)
+    return arena
+
+
+def put_food(arena: Arena, cell: int) -> None:
+    """Moves the only food item to a cell."""
+    arena.cells[arena.food_cells[0]] = EMPTY
+    arena.food_cells[0] = cell
+    arena.food_slots[cell] = 0
+    arena.cells[cell] = FOOD
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [([3], [4]), ([3], [5, 4]), ([2, 3], [4]), ([2, 3], [5, 4])],
+    ids=["1-1", "1-2", "2-1", "2-2"],
+)
+def test_heads_that_swap_cells_both_die(first: list[int], second: list[int]) -> None:
+    arena = board(10, 2, [(first, RIGHT), (second, LEFT)])
+    assert arena.step().tolist() == [HIT, HIT]
+    assert (arena.outcomes == HIT).all()
+    assert (arena.cells[:10] == EMPTY).all()
+
+
+@pytest.mark.parametrize("first, second", [([3], [5]), ([1, 2, 3], [5])])
+def test_heads_entering_the_same_cell_both_die(
+    first: list[int], second: list[int]
+) -> None:
+    arena = board(10, 2, [(first, RIGHT), (second, LEFT)])
+    assert arena.step().tolist() == [HIT, HIT]
+
+
+def test_head_may_enter_a_tail_moving_away() -> None:
+    arena = board(10, 2, [([2, 3], RIGHT), ([4, 5, 6], RIGHT)])
+    assert arena.step().tolist() == [OK, OK]
+    assert arena.body(0) == [3, 4]
+    assert arena.body(1) == [5, 6, 7]
+
+
+def test_snake_may_enter_its_own_tail() -> None:
+    # Around a 2x2 board: (0, 0), (1, 0), (1, 1), (0, 1) and back up
+    arena = board(2, 3, [([0, 1, 3, 2], UP)])
+    assert arena.step().tolist() == [OK]
+    assert arena.body(0) == [1, 3, 2, 0]
+
+
+def test_tail_of_a_snake_that_eats_stays() -> None:
+    arena = board(10, 2, [([3], RIGHT), ([4], RIGHT)])
+    put_food(arena, 5)
+    assert arena.step().tolist() == [HIT, ATE]
+    assert arena.body(1) == [4, 5]
+
+
+def test_tail_of_a_snake_that_does_not_move_stays() -> None:
+    # The second snake hits the border, so its tail is still there
+    arena = board(10, 2, [([6, 7], RIGHT), ([8, 9], RIGHT)])
+    assert arena.step().tolist() == [HIT, BORDER]
+
+
+def test_dead_snakes_respawn() -> None:
+    arena = Arena(10, 10, 2, 1, seed=0)
+    arena.cells[:] = EMPTY
+    arena.cells[arena.food_cells[0]] = FOOD
+    for snake, (cell, direction) in enumerate([(3, RIGHT), (4, LEFT)]):
+        arena.cells[cell] = snake
+        arena.tails[snake] = arena.heads[snake] = cell
+        arena.lengths[snake] = 1
+        arena.directions[snake] = direction
+    assert arena.step().tolist() == [HIT, HIT]
+    assert (arena.outcomes == ALIVE).all()
+    assert np.isin(arena.cells, [0, 1]).sum() == 2
@@ -0,0 +1,61 @@
+"""Tests for the autopilot and its Hamiltonian cycles."""
+
+import pytest
+
+from autopilot import Autopilot, hamiltonian_cycle
+from engine import DIRECTIONS, Engine, MoveResult
+
+
+def walk_cycle(grid_width: int, grid_height: int, start: int) -> list[int]:
+    """Follows the cycle from a cell until it comes back to it."""
+    codes = hamiltonian_cycle(grid_width, grid_height)
+    cells = [start]
+    while len(cells) <= len(codes):
+        x, y = cells[-1] % grid_width, cells[-1] // grid_width
+        dx, dy = DIRECTIONS[codes[cells[-1]]]
+        assert 0 <= x + dx < grid_width and 0 <= y + dy < grid_height
+        cell = (y + dy) * grid_width + x + dx
+        if cell == start:
+            return cells
+        cells.append(cell)
+    raise AssertionError("The cycle does not come back to its start")
+
+
+@pytest.mark.parametrize("size", [(2, 2), (4, 4), (6, 3), (3, 6), (10, 7)])
+def test_cycle_covers_grid_with_an_even_side(size: tuple[int, int]) -> None:
+    assert sorted(walk_cycle(*size, 0)) == list(range(size[0] * size[1]))
+
+
+@pytest.mark.parametrize("size", [(3, 3), (5, 3), (3, 5), (9, 9), (7, 11)])
+def test_cycle_of_odd_grid_leaves_out_a_corner(size: tuple[int, int]) -> None:
+    grid_width, grid_height = size
+    corner = (grid_height - 1) * grid_width
+    cells = walk_cycle(grid_width, grid_height, 0)
+    assert sorted(cells + [corner]) == list(range(grid_width * grid_height))
+    # The corner is eaten from the cell to its right and left upwards, which
+    # is two cells along the cycle from there
+    assert hamiltonian_cycle(grid_width, grid_height)[corner] == 3
+    after = cells[(cells.index(corner + 1) + 2) % len(cells)]
+    assert after == corner - grid_width
+
+
+def play(grid_width: int, grid_height: int, seed: int) -> Engine:
+    """Lets the autopilot play a game to the end."""
+    engine = Engine(grid_width, grid_height, seed)
+    autopilot = Autopilot(grid_width, grid_height)
+    while engine.alive and engine.moves < 100 * grid_width * grid_height:
+        autopilot(engine)
+        engine.step()
+    return engine
+
+
+def test_autopilot_wins_on_even_grid() -> None:
+    engine = play(6, 6, 0)
+    assert engine.outcome == MoveResult.WON
+    assert len(engine.body) == 36
+
+
+def test_autopilot_wins_on_odd_grid() -> None:
+    engine = play(5, 5, 0)
+    assert engine.outcome == MoveResult.WON
+    assert len(engine.body) == 25
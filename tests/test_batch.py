@@ -0,0 +1,75 @@
+"""Tests for the batch engine against the single-game rules."""
+
+import numpy as np
+import pytest
+
+from batch import ALIVE, BatchEngine
+from engine import DIRECTIONS, Engine, MoveResult
+
+RIGHT, DOWN, LEFT, UP = range(len(DIRECTIONS))
+# Around a 2x2 grid from the start in the middle, by head cell
+CYCLE = np.array([DOWN, LEFT, RIGHT, UP])
+
+
+def body(batch: BatchEngine, game: int) -> list[int]:
+    """Gets a batch game's cells from tail to head."""
+    capacity = batch.grid_width * batch.grid_height
+    slots = (batch.starts[game] + np.arange(batch.lengths[game])) % capacity
+    return batch.rings[game, slots].tolist()
+
+
+def check_step(batch: BatchEngine, engines: list[Engine], actions: np.ndarray) -> None:
+    """Steps the batch and an engine per game, and compares them."""
+    width = batch.grid_width
+    expected = []
+    for game, engine in enumerate(engines):
+        # Only food placement differs, so the engine is given the batch's
+        food = int(batch.food[game])
+        engine.food = None if food < 0 else (food % width, food // width)
+        if actions[game] >= 0:
+            engine.push_direction(DIRECTIONS[actions[game]])
+        expected.append(engine.step().value)
+    assert batch.step(actions).tolist() == expected
+    for game, engine in enumerate(engines):
+        cells = [y * width + x for x, y in engine.body]
+        assert body(batch, game) == cells
+        assert batch.occupied[game].sum() == len(cells)
+        assert (batch.head_x[game], batch.head_y[game]) == engine.head
+        assert batch.scores[game] == engine.score
+        assert batch.moves[game] == engine.moves
+
+
+@pytest.mark.parametrize("size", [(2, 2), (3, 2), (5, 4)])
+def test_random_moves_follow_the_engine_rules(size: tuple[int, int]) -> None:
+    batch = BatchEngine(64, *size, seed=0, auto_reset=False)
+    engines = [Engine(*size, 0) for _ in range(batch.num_games)]
+    rng = np.random.default_rng(1)
+    while batch.alive.any():
+        check_step(batch, engines, rng.integers(-4, len(DIRECTIONS), batch.num_games))
+    assert set(batch.outcomes.tolist()) <= {
+        MoveResult.HIT_TAIL.value,
+        MoveResult.HIT_BORDER.value,
+    }
+
+
+def test_filling_the_grid_wins_like_the_engine() -> None:
+    batch = BatchEngine(64, 2, 2, seed=3, auto_reset=False)
+    engines = [Engine(2, 2, 0) for _ in range(batch.num_games)]
+    while batch.alive.any():
+        check_step(batch, engines, CYCLE[batch.head_y * 2 + batch.head_x])
+    assert (batch.outcomes == MoveResult.WON.value).all()
+    assert (batch.food == -1).all()
+    assert (batch.scores == 3).all()
+
+
+def test_ended_games_start_again() -> None:
+    batch = BatchEngine(8, 4, 4, seed=2)
+    # Straight to the right from (2, 2), every game hits the border on its
+    # second move
+    batch.step()
+    assert (batch.step() == MoveResult.HIT_BORDER.value).all()
+    assert (batch.outcomes == ALIVE).all()
+    assert (batch.lengths == 1).all()
+    assert (batch.moves == 0).all()
+    assert (batch.head_x == 2).all()
+    assert (batch.food >= 0).all()
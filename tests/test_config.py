@@ -0,0 +1,94 @@
+"""Tests for compiling and caching the settings."""
+
+import json
+from dataclasses import dataclass
+
+import pytest
+
+from config import config
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    """Points the settings cache at a fresh temporary directory."""
+    path = tmp_path / "cache" / "settings.json"
+    monkeypatch.setattr(config, "CACHE_PATH", str(path))
+    return path
+
+
+def test_settings_are_cached_and_read_back(cache_path) -> None:
+    settings = config._load_settings()
+    assert json.loads(cache_path.read_text())["sources"] == config._sources()
+    assert config._load_settings() == settings
+
+
+def test_stale_cache_is_rebuilt(cache_path) -> None:
+    settings = config._load_settings()
+    cached = json.loads(cache_path.read_text())
+    cached["sources"][0][1] += 1
+    cached["config"]["game"]["fps"] = 1
+    cache_path.write_text(json.dumps(cached))
+    assert config._load_settings() == settings
+
+
+def test_unwritable_cache_is_a_miss(tmp_path, monkeypatch) -> None:
+    # A file where the cache directory should be
+    blocker = tmp_path / "cache"
+    blocker.write_text("")
+    monkeypatch.setattr(config, "CACHE_PATH", str(blocker / "settings.json"))
+    assert config._load_settings() == config.SETTINGS
+    assert list(tmp_path.iterdir()) == [blocker]
+
+
+def test_cache_lives_in_the_user_cache_directory(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(config.sys, "platform", "linux")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert config._cache_path().startswith(str(tmp_path / "snake"))
+
+
+@dataclass(frozen=True)
+class Sample:
+    """Settings of every plain type, for the type checks."""
+
+    speed: float
+    count: int
+    sizes: tuple[int, ...]
+    enabled: bool
+    name: str
+
+
+SAMPLE = {"speed": 1.5, "count": 3, "sizes": [1, 2], "enabled": True, "name": "a"}
+
+
+@pytest.mark.parametrize(
+    ("key", "value", "expected"),
+    [
+        ("speed", 2, 2.0),
+        ("count", 4.0, 4),
+        ("sizes", [10.0, 20], (10, 20)),
+    ],
+)
+def test_numbers_are_converted_when_nothing_is_lost(key, value, expected) -> None:
+    sample = config._compile(Sample, SAMPLE | {key: value})
+    assert getattr(sample, key) == expected
+    assert type(getattr(sample, key)) is type(expected)
+
+
+@pytest.mark.parametrize(
+    ("key", "value"),
+    [
+        ("speed", True),
+        ("speed", "1.5"),
+        ("count", 4.5),
+        ("count", False),
+        ("count", "4"),
+        ("sizes", [1, 2.5]),
+        ("sizes", [True]),
+        ("sizes", "1, 2"),
+        ("enabled", 1),
+        ("name", 1),
+    ],
+)
+def test_values_of_the_wrong_type_are_refused(key, value) -> None:
+    with pytest.raises(ValueError, match=key):
+        config._compile(Sample, SAMPLE | {key: value})
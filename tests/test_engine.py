@@ -0,0 +1,184 @@
+"""Tests for the single-player engine."""
+
+import random
+
+import pytest
+
+from engine import (
+    DIRECTIONS,
+    SEED_MASK,
+    Direction,
+    Engine,
+    FreeCells,
+    MoveResult,
+    Position,
+)
+
+RIGHT, DOWN, LEFT, UP = DIRECTIONS
+
+
+def lay(
+    engine: Engine, cells: list[Position], direction: Direction, food: Position
+) -> None:
+    """Puts the snake on the given cells, tail first, and the food on a cell."""
+    engine.body.clear()
+    for cell in cells:
+        engine.body.push_head(cell)
+    engine.direction = direction
+    engine.food = food
+
+
+def play(engine: Engine, moves: int, rng: random.Random) -> list[tuple]:
+    """Pushes random directions and steps, returning the state after each move."""
+    states = []
+    for _ in range(moves):
+        if rng.random() < 0.3:
+            engine.push_direction(rng.choice(DIRECTIONS))
+        engine.step()
+        states.append((engine.body.cells(), engine.food, engine.score, engine.outcome))
+    return states
+
+
+@pytest.mark.parametrize("seed", [-5, -1, 0, 12345, SEED_MASK, 1 << 70])
+def test_any_seed_is_kept_to_64_bits(seed: int) -> None:
+    engine = Engine(10, 10, seed)
+    assert engine.seed == seed & SEED_MASK
+    same = Engine(10, 10, seed & SEED_MASK)
+    assert play(engine, 100, random.Random(0)) == play(same, 100, random.Random(0))
+
+
+@pytest.mark.parametrize("seed", [-5, 7, SEED_MASK])
+def test_snapshot_restores_the_same_game(seed: int) -> None:
+    engine = Engine(10, 10, seed)
+    play(engine, 30, random.Random(1))
+    snapshot = engine.snapshot()
+    ahead = play(engine, 200, random.Random(2))
+
+    restored = Engine(10, 10)
+    restored.restore(snapshot)
+    assert restored.seed == seed & SEED_MASK
+    assert play(restored, 200, random.Random(2)) == ahead
+
+
+def test_clone_plays_like_the_original() -> None:
+    engine = Engine(8, 6, -3)
+    play(engine, 20, random.Random(3))
+    clone = engine.clone()
+    assert clone.snapshot() == engine.snapshot()
+    assert play(clone, 100, random.Random(4)) == play(engine, 100, random.Random(4))
+
+
+def test_restore_refuses_another_grid() -> None:
+    snapshot = Engine(10, 10, 1).snapshot()
+    with pytest.raises(ValueError):
+        Engine(10, 11).restore(snapshot)
+    with pytest.raises(ValueError):
+        Engine(10, 10).restore(b"SNKS")
+
+
+def test_moving_into_the_tail_it_leaves_is_ok() -> None:
+    engine = Engine(5, 5, 0)
+    lay(engine, [(1, 1), (2, 1), (2, 2), (1, 2)], UP, (4, 4))
+    assert engine.step() == MoveResult.OK
+    assert list(engine.body) == [(2, 1), (2, 2), (1, 2), (1, 1)]
+    assert engine.vacated == (1, 1)
+
+
+def test_moving_into_the_body_ends_the_game() -> None:
+    engine = Engine(5, 5, 0)
+    lay(engine, [(0, 1), (1, 1), (2, 1), (2, 2), (1, 2)], UP, (4, 4))
+    cells = engine.body.cells()
+    assert engine.step() == MoveResult.HIT_TAIL
+    assert engine.body.cells() == cells
+    assert not engine.alive
+
+
+def test_a_finished_game_repeats_its_outcome() -> None:
+    engine = Engine(5, 5, 0)
+    lay(engine, [(3, 2), (4, 2)], RIGHT, (0, 0))
+    assert engine.step() == MoveResult.HIT_BORDER
+    assert engine.step() == MoveResult.HIT_BORDER
+    assert engine.moves == 1
+
+
+def test_eating_keeps_the_tail_and_places_new_food() -> None:
+    engine = Engine(5, 5, 0)
+    lay(engine, [(1, 2), (2, 2)], RIGHT, (3, 2))
+    assert engine.step() == MoveResult.ATE_FOOD
+    assert list(engine.body) == [(1, 2), (2, 2), (3, 2)]
+    assert engine.vacated is None
+    assert engine.score == 1
+    assert engine.food is not None and engine.food not in engine.body
+
+
+def test_queued_directions_turn_once_per_move() -> None:
+    engine = Engine(5, 5, 0)
+    lay(engine, [(1, 2), (2, 2)], RIGHT, (0, 0))
+    # Reversing is dropped, and so is repeating the current direction
+    for direction in (LEFT, RIGHT, DOWN, LEFT):
+        engine.push_direction(direction)
+    engine.step()
+    assert engine.head == (2, 3)
+    engine.step()
+    assert engine.head == (1, 3)
+    assert not engine.directions_queue
+
+
+def test_filling_the_grid_wins() -> None:
+    # Around the 2x2 grid from the start in the middle, (1, 1)
+    turns = {(1, 1): UP, (1, 0): LEFT, (0, 0): DOWN, (0, 1): RIGHT}
+    engine = Engine(2, 2, 3)
+    results = []
+    while engine.alive:
+        engine.push_direction(turns[engine.head])
+        results.append(engine.step())
+    assert results[-1] == MoveResult.WON
+    assert results.count(MoveResult.ATE_FOOD) == 2
+    assert engine.score == 3
+    assert engine.food is None
+    assert len(engine.body) == 4
+    assert engine.step() == MoveResult.WON
+
+
+def check_free(free: FreeCells, taken: set[int]) -> None:
+    """Checks the packed cells and their slots against the taken cells."""
+    capacity = len(free.where)
+    cells = free.cells[: free.count]
+    assert sorted(cells) == sorted(set(range(capacity)) - taken)
+    for slot, cell in enumerate(cells):
+        assert free.where[cell] == slot
+    for cell in taken:
+        assert free.where[cell] == -1
+
+
+def test_free_cells_follow_adds_and_removes() -> None:
+    rng = random.Random(0)
+    free = FreeCells(30)
+    taken: set[int] = set()
+    for _ in range(2000):
+        cell = rng.randrange(30)
+        if cell in taken:
+            free.add(cell)
+            taken.remove(cell)
+        else:
+            free.remove(cell)
+            taken.add(cell)
+        check_free(free, taken)
+        choice = free.choice(rng)
+        assert (choice is None) == (len(taken) == 30)
+        assert choice not in taken
+
+
+def test_food_is_only_placed_on_free_cells() -> None:
+    engine = Engine(6, 4, 5)
+    rng = random.Random(6)
+    for _ in range(50):
+        engine.reset(rng.getrandbits(64))
+        while engine.alive and engine.moves < 200:
+            if rng.random() < 0.3:
+                engine.push_direction(rng.choice(DIRECTIONS))
+            engine.step()
+            taken = {y * 6 + x for x, y in engine.body}
+            check_free(engine.body.free, taken)
+            if engine.food is not None:
+                assert engine.food not in engine.body
@@ -0,0 +1,38 @@
+"""Tests for the observations of the batch environment."""
+
+import numpy as np
+import pytest
+
+from engine import MoveResult
+from env import BODY, FOOD, HEAD, BatchSnakeEnv
+
+
+def expected_obs(env: BatchSnakeEnv) -> np.ndarray:
+    """Draws every game's planes from scratch."""
+    batch = env.batch
+    num_games, _, height, width = env.obs.shape
+    obs = np.zeros_like(env.obs)
+    obs[:, BODY] = batch.occupied.reshape(num_games, height, width)
+    obs[np.arange(num_games), HEAD, batch.head_y, batch.head_x] = 1
+    fed = np.flatnonzero(batch.food >= 0)
+    food = batch.food[fed]
+    obs[fed, FOOD, food // width, food % width] = 1
+    return obs
+
+
+@pytest.mark.parametrize("size", [(2, 2), (3, 2), (6, 5)])
+def test_written_cells_match_a_full_redraw(size: tuple[int, int]) -> None:
+    env = BatchSnakeEnv(200, *size, seed=1)
+    rng = np.random.default_rng(0)
+    obs = env.reset()
+    assert (obs == expected_obs(env)).all()
+    results = []
+    for _ in range(500):
+        obs, _, _, result = env.step(rng.integers(-1, 4, 200))
+        assert obs is env.obs
+        assert (obs == expected_obs(env)).all()
+        results.append(result)
+    # Games ended and were started again, and on the smallest board some won
+    assert (np.array(results) >= MoveResult.HIT_TAIL.value).any()
+    if size == (2, 2):
+        assert (np.array(results) == MoveResult.WON.value).any()
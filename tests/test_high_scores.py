@@ -0,0 +1,59 @@
+"""Tests for the SQLite leaderboard."""
+
+import json
+
+import pytest
+
+import high_scores
+from high_scores import SqliteScoreStore
+
+
+@pytest.fixture
+def scores_file(tmp_path, monkeypatch):
+    """Points the JSON backend at a file holding two scores."""
+    path = tmp_path / "high_scores.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"score": 7, "date": "2024-01-02 10:00"},
+                {"score": 3, "date": "2024-01-01 09:00"},
+            ]
+        )
+    )
+    monkeypatch.setattr(high_scores, "SCORES_FILE", str(path))
+    return path
+
+
+def test_json_scores_are_imported_on_first_start(scores_file, tmp_path) -> None:
+    store = SqliteScoreStore(str(tmp_path / "scores.db"))
+    assert [(e["score"], e["date"]) for e in store.top()] == [
+        (7, "2024-01-02 10:00"),
+        (3, "2024-01-01 09:00"),
+    ]
+    assert store.rank(5) == 2
+    store.db.close()
+
+
+def test_json_scores_are_not_read_again(scores_file, tmp_path, monkeypatch) -> None:
+    path = str(tmp_path / "scores.db")
+    store = SqliteScoreStore(path)
+    store.add_many([{"score": 5, "player": "ann", "grid_width": 20}])
+    store.db.close()
+
+    def fail() -> list:
+        raise AssertionError("high_scores.json was read again")
+
+    monkeypatch.setattr(high_scores, "load_high_scores", fail)
+    store = SqliteScoreStore(path)
+    assert [e["score"] for e in store.top()] == [7, 5, 3]
+    assert store.query_top(player="ann")[0]["grid_width"] == 20
+    assert store.rank(5, player="ann") == 1
+    store.db.close()
+
+
+def test_missing_json_file_imports_nothing(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(high_scores, "SCORES_FILE", str(tmp_path / "none.json"))
+    store = SqliteScoreStore(str(tmp_path / "scores.db"))
+    assert store.top() == []
+    assert store.rank(0) == 1
+    store.db.close()
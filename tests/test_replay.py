@@ -0,0 +1,53 @@
+"""Tests for recording and playing back games."""
+
+import random
+from pathlib import Path
+
+import pytest
+
+from engine import DIRECTIONS, SEED_MASK, Engine
+from replay import Replay, simulate
+
+
+def record(seed: int, moves: int) -> Engine:
+    """Plays a game with random pushed directions."""
+    engine = Engine(12, 9, seed)
+    rng = random.Random(seed)
+    for _ in range(moves):
+        if rng.random() < 0.3:
+            engine.push_direction(rng.choice(DIRECTIONS))
+        engine.step()
+        if not engine.alive:
+            break
+    return engine
+
+
+@pytest.mark.parametrize("seed", [-5, 0, 99, SEED_MASK, 1 << 64])
+def test_replay_round_trips_and_plays_the_same_game(
+    seed: int, tmp_path: Path
+) -> None:
+    engine = record(seed, 300)
+    replay = Replay.from_engine(engine, 100)
+    assert replay.seed == seed & SEED_MASK
+
+    path = tmp_path / "runs" / "game.snkr"
+    replay.save(str(path))
+    loaded = Replay.load(str(path))
+    assert loaded.to_bytes() == replay.to_bytes()
+    assert loaded.events == engine.events
+
+    played = simulate(loaded)
+    assert (played.score, played.moves, played.outcome) == (
+        engine.score,
+        engine.moves,
+        engine.outcome,
+    )
+    assert played.body.cells() == engine.body.cells()
+
+
+def test_from_bytes_refuses_other_data() -> None:
+    data = Replay.from_engine(record(1, 10), 100).to_bytes()
+    with pytest.raises(ValueError):
+        Replay.from_bytes(data[:10])
+    with pytest.raises(ValueError):
+        Replay.from_bytes(b"XXXX" + data[4:])
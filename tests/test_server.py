@@ -0,0 +1,147 @@
+"""Tests for the rooms of the multiplayer server."""
+
+import asyncio
+import random
+
+import pytest
+
+from protocol import LENGTH, RoomState, encode_join, frame
+from server import MAX_BACKLOG, Room, Server
+
+
+class FakeTransport:
+    """A transport whose write buffer can be made to look backlogged."""
+
+    def __init__(self) -> None:
+        self.backlog = 0
+        self.closing = False
+
+    def is_closing(self) -> bool:
+        return self.closing
+
+    def get_write_buffer_size(self) -> int:
+        return self.backlog
+
+    def abort(self) -> None:
+        self.closing = True
+
+
+class FakeWriter:
+    """A stream writer that keeps what was written to it."""
+
+    def __init__(self) -> None:
+        self.transport = FakeTransport()
+        self.written = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.written += data
+
+    def close(self) -> None:
+        self.transport.closing = True
+
+
+def messages(writer: FakeWriter) -> list[bytes]:
+    """Takes the framed messages written so far."""
+    data = writer.written
+    found = []
+    pos = 0
+    while pos < len(data):
+        (length,) = LENGTH.unpack_from(data, pos)
+        pos += LENGTH.size
+        found.append(bytes(data[pos : pos + length]))
+        pos += length
+    del data[:]
+    return found
+
+
+async def connect(
+    server: Server, room: str
+) -> tuple[asyncio.StreamReader, asyncio.Task]:
+    """Starts serving a client that joins a room, and waits until it has."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(frame(encode_join(room)))
+    task = asyncio.create_task(server._serve(reader, FakeWriter()))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    return reader, task
+
+
+def test_dropped_client_leaves_newer_room_alone() -> None:
+    async def run() -> None:
+        server = Server(grid_width=10, grid_height=10, snakes=2, food=1)
+        slow_reader, slow = await connect(server, "room")
+        other_reader, other = await connect(server, "room")
+        room = server.rooms["room"]
+        assert len(room.clients) == 2
+
+        # The slow client is dropped by a tick, and then the other one
+        # leaves, which empties and removes the room
+        slow_client = next(c for c in room.clients.values() if c.snake == 0)
+        slow_client.writer.transport.backlog = MAX_BACKLOG + 1
+        room.step()
+        assert list(room.clients) == [1]
+        other_reader.feed_eof()
+        await other
+        assert "room" not in server.rooms
+
+        # A new room is made under the same name before the slow client's
+        # handler ends
+        new_reader, new = await connect(server, "room")
+        new_room = server.rooms["room"]
+        assert new_room is not room
+
+        slow_reader.feed_eof()
+        await slow
+        assert server.rooms["room"] is new_room
+        new_reader.feed_eof()
+        await new
+        assert not server.rooms
+
+    asyncio.run(run())
+
+
+def test_dropped_client_of_removed_room_ends_cleanly() -> None:
+    async def run() -> None:
+        server = Server(grid_width=10, grid_height=10, snakes=2, food=1)
+        slow_reader, slow = await connect(server, "room")
+        other_reader, other = await connect(server, "room")
+        room = server.rooms["room"]
+        room.clients[0].writer.transport.backlog = MAX_BACKLOG + 1
+        room.step()
+        other_reader.feed_eof()
+        await other
+        slow_reader.feed_eof()
+        # Raised KeyError from the cleanup when the room was already gone
+        await slow
+        assert not server.rooms
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    ("grid_width", "grid_height", "snakes", "food"),
+    # Crowded enough that snakes die and some find no room to start again
+    [(20, 15, 6, 4), (6, 5, 12, 2), (3, 3, 8, 1)],
+)
+def test_client_copy_follows_the_server_arena(
+    grid_width: int, grid_height: int, snakes: int, food: int
+) -> None:
+    room = Room("room", grid_width, grid_height, snakes, food, 100)
+    writers = [FakeWriter() for _ in range(2)]
+    clients = [room.join(writer) for writer in writers]
+    states = [RoomState(messages(writer)[0]) for writer in writers]
+    arena = room.arena
+    rng = random.Random(0)
+    for _ in range(300):
+        for client in clients:
+            if rng.random() < 0.3:
+                client.queue.append(rng.randrange(4))
+        room.step()
+        for writer, state in zip(writers, states):
+            (tick,) = messages(writer)
+            state.apply(tick)
+            assert state.tick == room.tick
+            assert state.food.tolist() == arena.food_cells.tolist()
+            for snake, cells in enumerate(state.bodies):
+                assert list(cells) == arena.body(snake)
+    assert [state.snake for state in states] == [0, 1]
@@ -6,7 +6,7 @@ from pygame_menu import Theme
 from pygame_menu.font import FONT_8BIT
 
 from colors import SCREEN_BACKGROUND_COLOR
-from config import CONF
+from config import SETTINGS
 
 
 theme: Theme = Theme(
@@ -16,5 +16,5 @@ theme: Theme = Theme(
     selection_color="green",
     title=False,
     widget_font=FONT_8BIT,
-    widget_font_size=max(20, CONF.game.cell_size // 2),
+    widget_font_size=max(20, SETTINGS.game.cell_size // 2),
 )
@@ -0,0 +1,299 @@
+"""
+This module evaluates autopilot policies over many headless games.
+
+Games run in a process pool across all CPU cores, and the result of each
+seed is appended to a JSONL or CSV file as soon as its batch finishes, so an
+interrupted run can be resumed with `--resume`.
+
+A policy is a callable that receives the `Engine` before each move and
+returns a direction to push, or None to keep going. On the command line a
+policy is either one of the built-in names or `module:factory`, where the
+factory is called once per game with the grid width and height and returns
+the policy.
+
+Usage:
+    python tournament.py [--games N] [--seed S] [--grid W H]
+                         [--policy NAME] [-o results.jsonl] [--resume]
+"""
+
+import argparse
+import csv
+import importlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable
+from random import Random
+
+from autopilot import Autopilot
+from engine import DIRECTIONS, Direction, Engine
+from pool import ResultWriter, batches, run_batches
+
+Policy = Callable[[Engine], Direction | None]
+PolicyFactory = Callable[[int, int], Policy]
+
+FIELDS = ("seed", "score", "length", "moves", "outcome")
+
+# The outcome of a game stopped for going too long without eating
+STALLED = "STALLED"
+
+
+def _safe_directions(engine: Engine) -> list[Direction]:
+    """Gets the directions that do not end the game on the next move."""
+    x, y = engine.head
+    dx, dy = engine.direction
+    body = engine.body
+    safe = []
+    for direction in DIRECTIONS:
+        if direction == (-dx, -dy):
+            continue
+        nx, ny = x + direction[0], y + direction[1]
+        if not (0 <= nx < engine.grid_width and 0 <= ny < engine.grid_height):
+            continue
+        if (nx, ny) in body and (nx, ny) != body.tail:
+            continue
+        safe.append(direction)
+    return safe
+
+
+def straight_policy(grid_width: int, grid_height: int) -> Policy:
+    """Never turns, as a lower bound for other policies."""
+    return lambda engine: None
+
+
+def random_policy(grid_width: int, grid_height: int) -> Policy:
+    """Turns to a random direction that survives the next move."""
+    rng: Random | None = None
+
+    def policy(engine: Engine) -> Direction | None:
+        nonlocal rng
+        if rng is None:
+            # Seeded from the game, so every seed always plays the same
+            rng = Random(engine.seed)
+        safe = _safe_directions(engine)
+        return rng.choice(safe) if safe else None
+
+    return policy
+
+
+def greedy_policy(grid_width: int, grid_height: int) -> Policy:
+    """Moves closer to the food whenever that survives the next move."""
+
+    def policy(engine: Engine) -> Direction | None:
+        safe = _safe_directions(engine)
+        if not safe or engine.food is None:
+            return None
+        x, y = engine.head
+        fx, fy = engine.food
+        return min(safe, key=lambda d: abs(x + d[0] - fx) + abs(y + d[1] - fy))
+
+    return policy
+
+
+def autopilot_policy(grid_width: int, grid_height: int) -> Policy:
+    """Plays like the in-game autopilot."""
+    return Autopilot(grid_width, grid_height).choose
+
+
+POLICIES: dict[str, PolicyFactory] = {
+    "straight": straight_policy,
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "autopilot": autopilot_policy,
+}
+
+
+def load_policy(name: str) -> PolicyFactory:
+    """
+    Finds a policy factory by name.
+
+    Args:
+        name: A built-in policy name, or `module:factory`.
+
+    Returns:
+        The policy factory.
+
+    Raises:
+        ValueError: If the name is not a built-in and has no colon.
+    """
+    if name in POLICIES:
+        return POLICIES[name]
+    module, sep, attr = name.partition(":")
+    if not sep:
+        raise ValueError(
+            f"Unknown policy {name!r}, use one of {', '.join(POLICIES)} or"
+            " module:factory"
+        )
+    return getattr(importlib.import_module(module), attr)
+
+
+def play(
+    engine: Engine, policy: Policy, seed: int, max_stall: int
+) -> dict[str, int | str]:
+    """
+    Plays one game to the end.
+
+    Args:
+        engine: The engine to play on, reset by this call.
+        policy: The policy steering the snake.
+        seed: The seed of the game.
+        max_stall: Stop after this many moves without eating.
+
+    Returns:
+        The seed, score, snake length, moves and outcome of the game.
+    """
+    engine.reset(seed)
+    last_meal = 0
+    score = 0
+    while engine.alive:
+        direction = policy(engine)
+        if direction is not None:
+            engine.push_direction(direction)
+        engine.step()
+        if engine.score != score:
+            score = engine.score
+            last_meal = engine.moves
+        elif engine.moves - last_meal >= max_stall:
+            break
+        # The log of pushed directions is only needed for replays
+        engine.events.clear()
+    return {
+        "seed": seed,
+        "score": engine.score,
+        "length": len(engine.body),
+        "moves": engine.moves,
+        "outcome": engine.outcome.name if engine.outcome is not None else STALLED,
+    }
+
+
+def play_batch(
+    seeds: list[int],
+    grid_width: int,
+    grid_height: int,
+    policy_name: str,
+    max_stall: int,
+) -> list[dict[str, int | str]]:
+    """
+    Plays a batch of games in a worker process.
+
+    Args:
+        seeds: The seeds of the games.
+        grid_width: The width of the grid.
+        grid_height: The height of the grid.
+        policy_name: The policy, as given on the command line.
+        max_stall: Stop a game after this many moves without eating.
+
+    Returns:
+        The result of each game.
+    """
+    factory = load_policy(policy_name)
+    engine = Engine(grid_width, grid_height)
+    return [
+        play(engine, factory(grid_width, grid_height), seed, max_stall)
+        for seed in seeds
+    ]
+
+
+def read_done(path: str) -> set[int]:
+    """
+    Gets the seeds already in a results file, and drops a torn last line.
+
+    Args:
+        path: The JSONL or CSV results file.
+
+    Returns:
+        The seeds of the finished games.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb") as f:
+        data = f.read()
+    # A run that was killed mid-write can leave half a line at the end
+    complete = data.rfind(b"\n") + 1
+    if complete < len(data):
+        with open(path, "r+b") as f:
+            f.truncate(complete)
+    lines = data[:complete].decode().splitlines()
+    if path.endswith(".csv"):
+        return {int(row["seed"]) for row in csv.DictReader(lines)}
+    return {json.loads(line)["seed"] for line in lines if line}
+
+
+def main() -> None:
+    """Runs the tournament given on the command line."""
+    parser = argparse.ArgumentParser(description="Evaluate a snake policy.")
+    parser.add_argument("--games", type=int, default=10000, help="games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument(
+        "--grid", type=int, nargs=2, default=(20, 20), metavar=("W", "H")
+    )
+    parser.add_argument(
+        "--policy", default="greedy", help=f"{', '.join(POLICIES)} or module:factory"
+    )
+    parser.add_argument("-o", "--output", default="tournament.jsonl")
+    parser.add_argument(
+        "--resume", action="store_true", help="skip the seeds already in the output"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=500, help="games per task")
+    parser.add_argument(
+        "--max-stall",
+        type=int,
+        help="moves without eating before a game is stopped, default 4x the grid",
+    )
+    args = parser.parse_args()
+
+    grid_width, grid_height = args.grid
+    max_stall = args.max_stall or 4 * grid_width * grid_height
+    load_policy(args.policy)
+
+    if not args.resume and os.path.exists(args.output):
+        parser.error(f"{args.output} exists, pass --resume to continue it")
+    done = read_done(args.output) if args.resume else set()
+    seeds = [
+        seed for seed in range(args.seed, args.seed + args.games) if seed not in done
+    ]
+    print(f"{len(done)} games already done, {len(seeds)} to play", file=sys.stderr)
+
+    writer = ResultWriter(args.output, FIELDS)
+    outcomes: Counter[str] = Counter()
+    total_score = 0
+    played = 0
+    start = time.perf_counter()
+    for _, future in run_batches(
+        play_batch,
+        batches(seeds, args.batch),
+        args.workers,
+        grid_width,
+        grid_height,
+        args.policy,
+        max_stall,
+    ):
+        results = future.result()
+        writer.write(results)
+        played += len(results)
+        total_score += sum(r["score"] for r in results)
+        outcomes.update(r["outcome"] for r in results)
+        elapsed = time.perf_counter() - start
+        rate = played / elapsed
+        eta = (len(seeds) - played) / rate if rate else 0
+        print(
+            f"\r{played}/{len(seeds)} games, {rate:.0f}/s,"
+            f" mean score {total_score / played:.2f}, eta {eta:.0f} s ",
+            end="",
+            file=sys.stderr,
+        )
+    writer.close()
+    print(file=sys.stderr)
+    if played:
+        print(
+            f"mean score {total_score / played:.3f} over {played} games, "
+            + ", ".join(f"{name} {count}" for name, count in outcomes.most_common()),
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+This module checks recorded runs by playing them again.
+
+A replay holds the seed, grid and pushed directions of a game along with
+the score, moves and outcome it claims. Since the engine is deterministic,
+playing the directions again from the seed must give back exactly those,
+so a run that was edited, or recorded by a different version of the rules,
+shows up as a mismatch. Replays are read and played in a process pool
+across all CPU cores, and every run gets a line in a JSONL or CSV report.
+
+Usage:
+    python verify.py PATH [PATH ...] [-o report.jsonl] [--workers N]
+
+Paths are replay files, or directories searched for `.snkr` files.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+from engine import Engine
+from pool import ResultWriter, batches, run_batches
+from replay import HEADER, Replay, simulate
+
+REPLAY_SUFFIX = ".snkr"
+
+FIELDS = (
+    "file",
+    "status",
+    "seed",
+    "claimed_score",
+    "score",
+    "claimed_outcome",
+    "outcome",
+    "claimed_moves",
+    "moves",
+    "error",
+)
+
+OK = "ok"
+MISMATCH = "mismatch"
+UNREADABLE = "unreadable"
+# The replay was read but playing it failed, or its worker died
+ERROR = "error"
+
+# Larger replays are refused before an engine is made for them, so a corrupt
+# or hostile file cannot run a worker out of memory. The largest board of
+# the game is 1000x1000
+MAX_GRID_CELLS = 1 << 20
+MAX_EVENTS = 1 << 20
+# An event takes at most five bytes
+MAX_REPLAY_BYTES = HEADER.size + 5 * MAX_EVENTS
+
+# Mismatched runs listed at the end of a run, the rest are in the report
+SHOWN_MISMATCHES = 20
+
+
+def find_replays(paths: list[str]) -> list[str]:
+    """
+    Lists the replay files among paths, searching directories.
+
+    Args:
+        paths: Replay files and directories.
+
+    Returns:
+        The files, in a stable order.
+    """
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for directory, _, names in os.walk(path):
+            found.extend(
+                os.path.join(directory, name)
+                for name in names
+                if name.endswith(REPLAY_SUFFIX)
+            )
+    return sorted(found)
+
+
+def load(path: str) -> Replay:
+    """
+    Reads a replay file, refusing files too large to play.
+
+    Args:
+        path: The replay file.
+
+    Returns:
+        The replay.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not a replay or is too large.
+        IndexError: If the file is cut short in the middle of an event.
+    """
+    with open(path, "rb") as f:
+        data = f.read(MAX_REPLAY_BYTES + 1)
+    if len(data) > MAX_REPLAY_BYTES:
+        raise ValueError(f"Larger than {MAX_REPLAY_BYTES} bytes")
+    if len(data) < HEADER.size:
+        raise ValueError("Not a replay: too short")
+    _, _, _, grid_width, grid_height, _, _, _, _, count = HEADER.unpack_from(data)
+    if min(grid_width, grid_height) < 2 or grid_width * grid_height > MAX_GRID_CELLS:
+        raise ValueError(f"Bad grid {grid_width}x{grid_height}")
+    if count > MAX_EVENTS:
+        raise ValueError(f"{count} events, more than {MAX_EVENTS}")
+    return Replay.from_bytes(data)
+
+
+def failure(path: str, status: str, error: BaseException) -> dict:
+    """Makes the report line of a run that could not be verified."""
+    result = dict.fromkeys(FIELDS)
+    result["file"] = path
+    result["status"] = status
+    result["error"] = str(error) or type(error).__name__
+    return result
+
+
+def verify(path: str, engines: dict[tuple[int, int], Engine]) -> dict:
+    """
+    Plays one recorded run again and compares it with what it claims.
+
+    Args:
+        path: The replay file.
+        engines: Engines to reuse by grid size, added to by this call.
+
+    Returns:
+        The report line of the run.
+    """
+    try:
+        replay = load(path)
+    except (OSError, ValueError, IndexError) as error:
+        return failure(path, UNREADABLE, error)
+
+    size = (replay.grid_width, replay.grid_height)
+    engine = engines.get(size)
+    if engine is None:
+        engine = engines[size] = Engine(*size)
+    simulate(replay, engine)
+
+    outcome = engine.outcome
+    result = dict.fromkeys(FIELDS)
+    result.update(
+        file=path,
+        seed=replay.seed,
+        claimed_score=replay.score,
+        score=engine.score,
+        claimed_outcome=replay.outcome.name if replay.outcome is not None else None,
+        outcome=outcome.name if outcome is not None else None,
+        claimed_moves=replay.moves,
+        moves=engine.moves,
+    )
+    matches = (
+        replay.score == engine.score
+        and replay.outcome == outcome
+        and replay.moves == engine.moves
+    )
+    result["status"] = OK if matches else MISMATCH
+    return result
+
+
+def verify_batch(paths: list[str]) -> list[dict]:
+    """
+    Verifies a batch of runs in a worker process.
+
+    Args:
+        paths: The replay files.
+
+    Returns:
+        The report line of each run.
+    """
+    engines: dict[tuple[int, int], Engine] = {}
+    results = []
+    for path in paths:
+        try:
+            results.append(verify(path, engines))
+        except Exception as error:
+            # One bad run must not lose the rest of the batch. The engine it
+            # broke may be left in any state, so none are kept
+            engines.clear()
+            results.append(failure(path, ERROR, error))
+    return results
+
+
+def describe(result: dict) -> str:
+    """Summarizes a run that did not verify in one line."""
+    if result["status"] in (UNREADABLE, ERROR):
+        return f"{result['file']}: {result['status']}, {result['error']}"
+    return (
+        f"{result['file']}: claims score {result['claimed_score']},"
+        f" {result['claimed_outcome']} after {result['claimed_moves']} moves,"
+        f" plays out as score {result['score']},"
+        f" {result['outcome']} after {result['moves']} moves"
+    )
+
+
+def main() -> None:
+    """Verifies the runs given on the command line."""
+    parser = argparse.ArgumentParser(description="Verify recorded runs.")
+    parser.add_argument("paths", nargs="+", help="replay files or directories")
+    parser.add_argument(
+        "-o", "--output", default="verification.jsonl", help="the report, replaced"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=200, help="runs per task")
+    args = parser.parse_args()
+
+    paths = find_replays(args.paths)
+    print(f"{len(paths)} runs to verify", file=sys.stderr)
+    if os.path.exists(args.output):
+        os.remove(args.output)
+    writer = ResultWriter(args.output, FIELDS)
+    statuses: Counter[str] = Counter()
+    failed = []
+    start = time.perf_counter()
+    for batch, future in run_batches(
+        verify_batch, batches(paths, args.batch), args.workers
+    ):
+        try:
+            results = future.result()
+        except Exception as error:
+            # The worker died, and took the batch down with it
+            results = [failure(path, ERROR, error) for path in batch]
+        writer.write(results)
+        statuses.update(r["status"] for r in results)
+        failed.extend(r for r in results if r["status"] != OK)
+        done = statuses.total()
+        rate = done / (time.perf_counter() - start)
+        print(
+            f"\r{done}/{len(paths)} runs, {rate:.0f}/s,"
+            f" {statuses[MISMATCH]} mismatched,"
+            f" {statuses[UNREADABLE]} unreadable,"
+            f" {statuses[ERROR]} failed ",
+            end="",
+            file=sys.stderr,
+        )
+    writer.close()
+    print(file=sys.stderr)
+
+    failed.sort(key=lambda r: r["file"])
+    for result in failed[:SHOWN_MISMATCHES]:
+        print(describe(result), file=sys.stderr)
+    if len(failed) > SHOWN_MISMATCHES:
+        print(
+            f"and {len(failed) - SHOWN_MISMATCHES} more in {args.output}",
+            file=sys.stderr,
+        )
+    print(
+        f"{statuses[OK]} of {len(paths)} runs verified"
+        f" in {time.perf_counter() - start:.1f} s",
+        file=sys.stderr,
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()